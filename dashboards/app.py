@@ -1,36 +1,58 @@
 from __future__ import annotations
 
-import os
+import sys
+import time
+from pathlib import Path
 
 import altair as alt
 import pandas as pd
 import streamlit as st
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 
+# `streamlit run dashboards/app.py` only puts dashboards/ on sys.path.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dashboards.granularity import GRANULARITIES, MAX_CHART_POINTS, pick_granularity  # noqa: E402
+from ingestion import db  # noqa: E402
+
+
+UNTRACKED_REFRESH_SECONDS = 300
 
 st.set_page_config(page_title="Wearable Baseline Trends", layout="wide")
 st.title("Baseline Engagement Trend")
 st.caption("Cohort-level activity vs per-user baselines.")
 
 
-def build_engine():
-    host = os.getenv("DB_HOST", "localhost")
-    port = os.getenv("DB_PORT", "5432")
-    dbname = os.getenv("DB_NAME", "wearable")
-    user = os.getenv("DB_USER", "wearable")
-    password = os.getenv("DB_PASSWORD", "wearable")
-    url = f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{dbname}"
-    return create_engine(url)
-
-
-def load_date_bounds(engine) -> tuple[pd.Timestamp | None, pd.Timestamp | None]:
+@st.cache_data(ttl=5, show_spinner=False)
+def latest_pipeline_run(_engine) -> str:
+    """Marker of the newest successful ops.pipeline_runs row; cached query results are keyed on it."""
+    query = text(
+        """
+        select count(*), max(finished_at)
+        from ops.pipeline_runs
+        where status = 'success'
+        """
+    )
+    try:
+        with _engine.connect() as conn:
+            runs, finished_at = conn.execute(query).one()
+    except Exception:  # noqa: BLE001 - run tracking is optional (e.g. dbt run by hand)
+        # Without ops.pipeline_runs, fall back to refreshing every UNTRACKED_REFRESH_SECONDS.
+        return f"untracked:{int(time.time() // UNTRACKED_REFRESH_SECONDS)}"
+    return f"{runs}:{finished_at}"
+
+
+# Results are shared across sessions and only recomputed when run_marker changes, i.e. after a new
+# successful pipeline run; _engine is excluded from the cache key.
+@st.cache_data(max_entries=1024, show_spinner=False)
+def load_date_bounds(_engine, run_marker: str) -> tuple[pd.Timestamp | None, pd.Timestamp | None]:
     query = """
         select
             min(activity_date) as min_date,
             max(activity_date) as max_date
-        from user_activity_deviation
+        from mart_cohort_daily_deviation
     """
-    bounds = pd.read_sql(query, engine)
+    bounds = pd.read_sql(query, _engine)
     if bounds.empty:
         return None, None
     min_date = bounds.loc[0, "min_date"]
@@ -38,27 +60,36 @@ def load_date_bounds(engine) -> tuple[pd.Timestamp | None, pd.Timestamp | None]:
     return min_date, max_date
 
 
-def load_deviation_data(engine, start_date, end_date, min_baseline_days: int) -> pd.DataFrame:
+@st.cache_data(max_entries=1024, show_spinner=False)
+def load_cohort_series(
+    _engine,
+    run_marker: str,
+    granularity: str,
+    start_date,
+    end_date,
+    min_baseline_days: int,
+) -> pd.DataFrame:
+    """One pre-aggregated row per period from the granularity's rollup mart."""
+    table, period_column, unit, _ = GRANULARITIES[granularity]
     query = text(
-        """
+        f"""
         select
-            activity_date,
-            user_id,
-            total_steps,
-            baseline_steps,
-            baseline_active_days,
-            steps_pct_of_baseline
-        from user_activity_deviation
-        where activity_date between :start_date and :end_date
-          and baseline_active_days >= :min_baseline_days
-          and baseline_steps is not null
-          and baseline_steps > 0
-          and steps_pct_of_baseline is not null
+            {period_column} as activity_date,
+            median_pct,
+            p25,
+            p75,
+            active_users,
+            pct_user_days_below_0_8
+        from {table}
+        where {period_column} >= date_trunc('{unit}', cast(:start_date as date))
+          and {period_column} <= :end_date
+          and min_baseline_days = :min_baseline_days
+        order by {period_column}
         """
     )
     return pd.read_sql(
         query,
-        engine,
+        _engine,
         params={
             "start_date": start_date,
             "end_date": end_date,
@@ -67,16 +98,17 @@ def load_deviation_data(engine, start_date, end_date, min_baseline_days: int) ->
     )
 
 
-engine = build_engine()
+engine = db.get_engine()
 
 try:
-    min_date, max_date = load_date_bounds(engine)
+    run_marker = latest_pipeline_run(engine)
+    min_date, max_date = load_date_bounds(engine, run_marker)
 except Exception as exc:  # pragma: no cover - streamlit runtime
     st.error(f"Failed to connect to Postgres: {exc}")
     st.stop()
 
 if min_date is None or max_date is None:
-    st.info("No data found in user_activity_deviation.")
+    st.info("No data found in mart_cohort_daily_deviation.")
     st.stop()
 
 with st.sidebar:
@@ -100,37 +132,28 @@ else:
     start_date = date_range
     end_date = date_range
 
-df = load_deviation_data(engine, start_date, end_date, min_baseline_days)
-if df.empty:
+granularity = pick_granularity(start_date, end_date)
+st.sidebar.caption(f"Granularity: {granularity} (auto, at most {MAX_CHART_POINTS} points)")
+
+daily = load_cohort_series(engine, run_marker, granularity, start_date, end_date, min_baseline_days)
+if daily.empty:
     st.info("No rows match the selected filters.")
     st.stop()
 
-df["activity_date"] = pd.to_datetime(df["activity_date"], errors="coerce")
-
-daily = (
-    df.groupby("activity_date")
-    .agg(
-        median_pct=("steps_pct_of_baseline", "median"),
-        p25=("steps_pct_of_baseline", lambda s: s.quantile(0.25)),
-        p75=("steps_pct_of_baseline", lambda s: s.quantile(0.75)),
-        active_users=("user_id", "nunique"),
-        pct_users_below_0_8=("steps_pct_of_baseline", lambda s: (s < 0.8).mean()),
-    )
-    .reset_index()
-    .sort_values("activity_date")
-)
+daily["activity_date"] = pd.to_datetime(daily["activity_date"], errors="coerce")
 
 latest = daily.iloc[-1]
 st.subheader("Cohort KPIs")
 kpi1, kpi2 = st.columns(2)
-kpi1.metric("Active users (latest day)", f"{int(latest['active_users'])}")
+period = {"daily": "day", "weekly": "week", "monthly": "month"}[granularity]
+kpi1.metric(f"Active users (latest {period})", f"{int(latest['active_users'])}")
 kpi2.metric(
-    "% below 0.8 baseline (latest day)",
-    f"{latest['pct_users_below_0_8'] * 100:.1f}%",
+    f"% of user-days below 0.8 baseline (latest {period})",
+    f"{latest['pct_user_days_below_0_8'] * 100:.1f}%",
 )
 
-kpi_chart = daily.set_index("activity_date")[["active_users", "pct_users_below_0_8"]]
-kpi_chart["pct_users_below_0_8"] = kpi_chart["pct_users_below_0_8"] * 100
+kpi_chart = daily.set_index("activity_date")[["active_users", "pct_user_days_below_0_8"]]
+kpi_chart["pct_user_days_below_0_8"] = kpi_chart["pct_user_days_below_0_8"] * 100
 st.line_chart(kpi_chart, height=220)
 
 st.subheader("Cohort deviation trend")
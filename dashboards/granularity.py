@@ -0,0 +1,22 @@
+"""Chart granularity for the dashboard: which cohort rollup mart serves a date range."""
+
+from __future__ import annotations
+
+from datetime import date
+
+MAX_CHART_POINTS = 180
+# name -> (rollup mart, period column, date_trunc unit, approx days per point), finest first.
+GRANULARITIES = {
+    "daily": ("mart_cohort_daily_deviation", "activity_date", "day", 1),
+    "weekly": ("mart_cohort_weekly_deviation", "week_start", "week", 7),
+    "monthly": ("mart_cohort_monthly_deviation", "month_start", "month", 30),
+}
+
+
+def pick_granularity(start_date: date, end_date: date) -> str:
+    """Finest granularity whose point count for the range stays within MAX_CHART_POINTS."""
+    days = (end_date - start_date).days + 1
+    for name, (_, _, _, days_per_point) in GRANULARITIES.items():
+        if days / days_per_point <= MAX_CHART_POINTS:
+            return name
+    return name
@@ -0,0 +1,75 @@
+{#
+  Cohort percentiles of steps_pct_of_baseline per period and per "minimum baseline days"
+  threshold (1-14). period_expr buckets activity_date; for week/month rollups the percentiles
+  and below-0.8 share are over all user-days in the period and active_users counts distinct users.
+
+  Incremental models rebuild every period holding a user_activity_deviation row that the last run
+  may have rewritten: rows from the model's latest period minus `incremental_lookback_days`, and
+  all rows of users whose baseline window reaches into that span (their earlier rows moved with the
+  baseline). Each such period is recomputed from all of its user-days and replaces every threshold
+  row of the period, so their unique_key is the period column alone.
+#}
+{% macro cohort_deviation_rollup(period_expr, period_column) %}
+-- depends_on: {{ ref('user_baseline_activity') }}
+{% if is_incremental() %}
+with rebuild_start as (
+    select {{ incremental_lookback_start(period_column) }} as start_date
+),
+
+changed_periods as (
+    select distinct {{ period_expr }} as period
+    from {{ ref('user_activity_deviation') }}
+    where activity_date >= (select start_date from rebuild_start)
+       or user_id in (
+           select user_id
+           from {{ ref('user_baseline_activity') }}
+           where baseline_end_date >= (select start_date from rebuild_start)
+       )
+),
+
+deviation as (
+{% else %}
+with deviation as (
+{% endif %}
+    select
+        {{ period_expr }} as {{ period_column }},
+        user_id,
+        baseline_active_days,
+        steps_pct_of_baseline
+    from {{ ref('user_activity_deviation') }}
+    where baseline_steps is not null
+      and baseline_steps > 0
+      and steps_pct_of_baseline is not null
+      {% if is_incremental() %}
+      and activity_date >= (select min(period) from changed_periods)
+      and {{ period_expr }} in (select period from changed_periods)
+      {% endif %}
+),
+
+thresholds as (
+    select generate_series(1, 14) as min_baseline_days
+),
+
+cohort as (
+    select
+        thresholds.min_baseline_days,
+        deviation.{{ period_column }},
+        deviation.user_id,
+        deviation.steps_pct_of_baseline
+    from deviation
+    inner join thresholds
+        on deviation.baseline_active_days >= thresholds.min_baseline_days
+)
+
+select
+    {{ period_column }},
+    min_baseline_days,
+    percentile_cont(0.5) within group (order by steps_pct_of_baseline) as median_pct,
+    percentile_cont(0.25) within group (order by steps_pct_of_baseline) as p25,
+    percentile_cont(0.75) within group (order by steps_pct_of_baseline) as p75,
+    count(distinct user_id) as active_users,
+    avg(case when steps_pct_of_baseline < 0.8 then 1.0 else 0.0 end)::double precision as pct_user_days_below_0_8,
+    {{ period_column }}::text || '-' || min_baseline_days::text as cohort_period_id
+from cohort
+group by {{ period_column }}, min_baseline_days
+{% endmacro %}
@@ -0,0 +1,35 @@
+{#
+  Post-hook creating the indexes a model declares under `config.meta.indexes` (see marts/schema.yml):
+
+      meta:
+        indexes:
+          - columns: [activity_date, user_id]   # B-tree unless `type` says otherwise
+          - columns: [activity_date]
+            type: brin
+
+  Index names are derived from the model and columns, so incremental runs keep the indexes they
+  already have (IF NOT EXISTS). A full build first drops same-named indexes, which still sit on
+  the table it replaces until dbt drops that table at the end of the run.
+#}
+{% macro declared_index_name(identifier, columns, index_type) %}
+    {%- set suffix = '_brin' if index_type == 'brin' else '_idx' -%}
+    {%- set name = identifier ~ '_' ~ (columns | join('_')) ~ suffix -%}
+    {#- Postgres truncates identifiers at 63 bytes; keep long names unique instead. -#}
+    {%- if name | length > 63 -%}
+        {%- set name = identifier[:40] ~ '_' ~ local_md5(name)[:12] ~ suffix -%}
+    {%- endif -%}
+    {{ return(name) }}
+{% endmacro %}
+
+{% macro create_declared_indexes() %}
+    {%- set indexes = (config.get('meta') or {}).get('indexes', []) -%}
+    {%- set keep_existing = is_incremental() -%}
+    {%- for index in indexes -%}
+        {%- set index_type = index.get('type', 'btree') -%}
+        {%- set name = declared_index_name(this.identifier, index['columns'], index_type) -%}
+        {%- if not keep_existing %}
+drop index if exists "{{ this.schema }}"."{{ name }}";
+        {%- endif %}
+create index if not exists "{{ name }}" on {{ this }} using {{ index_type }} ({{ index['columns'] | join(', ') }});
+    {%- endfor -%}
+{% endmacro %}
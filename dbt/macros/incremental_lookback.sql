@@ -0,0 +1,12 @@
+{#
+  Lower bound of the activity_date window an incremental mart rebuilds: the latest date already in
+  the model minus `incremental_lookback_days` (default 3), so sleep rows that land a few days after
+  their activity rows are still merged in. Only call inside `{% if is_incremental() %}`.
+#}
+{% macro incremental_lookback_start(date_column='activity_date') %}
+    (
+        select coalesce(max({{ date_column }}), date '0001-01-01')
+            - {{ var('incremental_lookback_days', 3) }}
+        from {{ this }}
+    )
+{% endmacro %}
@@ -1,3 +1,11 @@
+{{
+    config(
+        materialized='incremental',
+        unique_key=['user_id', 'activity_date'],
+        incremental_strategy='delete+insert'
+    )
+}}
+
 with activity as (
     select
         user_id,
@@ -10,6 +18,9 @@ with activity as (
         sum(sedentary_minutes) as sedentary_minutes,
         sum(calories) as calories
     from {{ ref('stg_daily_activity') }}
+    {% if is_incremental() %}
+    where activity_date >= {{ incremental_lookback_start() }}
+    {% endif %}
     group by 1, 2
 ),
 
@@ -21,6 +32,9 @@ sleep as (
         sum(total_minutes_asleep) as total_minutes_asleep,
         sum(total_time_in_bed) as total_time_in_bed
     from {{ ref('stg_sleep') }}
+    {% if is_incremental() %}
+    where sleep_date >= {{ incremental_lookback_start() }}
+    {% endif %}
     group by 1, 2
 ),
 
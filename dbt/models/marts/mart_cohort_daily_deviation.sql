@@ -0,0 +1,11 @@
+-- Per-day cohort deviation from baseline for every dashboard "minimum baseline days" setting (1-14),
+-- so the dashboard reads one row per day instead of every user-day.
+{{
+    config(
+        materialized='incremental',
+        unique_key='activity_date',
+        incremental_strategy='delete+insert'
+    )
+}}
+
+{{ cohort_deviation_rollup('activity_date', 'activity_date') }}
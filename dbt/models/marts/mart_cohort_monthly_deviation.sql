@@ -0,0 +1,10 @@
+-- Monthly rollup of the cohort deviation metrics for multi-year dashboard ranges.
+{{
+    config(
+        materialized='incremental',
+        unique_key='month_start',
+        incremental_strategy='delete+insert'
+    )
+}}
+
+{{ cohort_deviation_rollup("date_trunc('month', activity_date)::date", 'month_start') }}
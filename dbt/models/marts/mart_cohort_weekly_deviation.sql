@@ -0,0 +1,10 @@
+-- Weekly (Monday-start) rollup of the cohort deviation metrics for long dashboard ranges.
+{{
+    config(
+        materialized='incremental',
+        unique_key='week_start',
+        incremental_strategy='delete+insert'
+    )
+}}
+
+{{ cohort_deviation_rollup("date_trunc('week', activity_date)::date", 'week_start') }}
@@ -1,4 +1,12 @@
 -- Daily user metrics: steps and sleep efficiency (minutes asleep / time in bed).
+{{
+    config(
+        materialized='incremental',
+        unique_key=['user_id', 'activity_date'],
+        incremental_strategy='delete+insert'
+    )
+}}
+
 select
     user_id,
     activity_date,
@@ -18,3 +26,6 @@ select
     end as sleep_efficiency_ratio,
     user_day_id
 from {{ ref('daily_user_summary') }}
+{% if is_incremental() %}
+where activity_date >= {{ incremental_lookback_start() }}
+{% endif %}
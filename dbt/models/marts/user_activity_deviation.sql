@@ -1,3 +1,11 @@
+{{
+    config(
+        materialized='incremental',
+        unique_key=['user_id', 'activity_date'],
+        incremental_strategy='delete+insert'
+    )
+}}
+
 with activity as (
     select *
     from {{ ref('user_daily_activity') }}
@@ -8,6 +16,20 @@ baseline as (
     from {{ ref('user_baseline_activity') }}
 ),
 
+{% if is_incremental() %}
+-- A user's baseline moves until they have 14 active days, or when days inside its window are
+-- backfilled or corrected; every row of such a user is rebuilt, not just the lookback window.
+-- Upstream rows only change inside the lookback window, so a baseline that changed this run
+-- still ends inside it (or is short of 14 days): one pass over the per-user baseline, none over
+-- this model's history.
+rebaselined_users as (
+    select user_id
+    from baseline
+    where baseline_end_date >= {{ incremental_lookback_start() }}
+       or baseline_active_days < 14
+),
+{% endif %}
+
 joined as (
     select
         activity.user_id,
@@ -40,6 +62,10 @@ joined as (
     from activity
     left join baseline
         on activity.user_id = baseline.user_id
+    {% if is_incremental() %}
+    where activity.activity_date >= {{ incremental_lookback_start() }}
+        or activity.user_id in (select user_id from rebaselined_users)
+    {% endif %}
 )
 
 select *
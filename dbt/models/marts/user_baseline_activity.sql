@@ -1,4 +1,21 @@
-with activity as (
+{{
+    config(
+        materialized='incremental',
+        unique_key='user_id',
+        incremental_strategy='delete+insert',
+        on_schema_change='append_new_columns'
+    )
+}}
+
+{#- A mart built before baseline_steps_total existed cannot be compared against: rebuild every
+    user once (the column is appended first), then run incrementally again. -#}
+{%- set incremental = is_incremental() -%}
+{%- if incremental -%}
+    {%- set existing_columns = adapter.get_columns_in_relation(this) | map(attribute='name') | map('lower') | list -%}
+    {%- set incremental = 'baseline_steps_total' in existing_columns -%}
+{%- endif %}
+
+with all_activity as (
     select
         user_id,
         activity_date,
@@ -8,6 +25,58 @@ with activity as (
       and total_steps > 0
 ),
 
+{% if incremental %}
+-- A baseline only moves while a user has fewer than 14 active days, or when rows inside the
+-- first 14 active days are backfilled or corrected; every other user's baseline is frozen.
+current_window as (
+    select
+        all_activity.user_id,
+        min(all_activity.activity_date) as baseline_start_date,
+        count(*) as baseline_active_days,
+        sum(all_activity.total_steps) as baseline_steps_total
+    from all_activity
+    inner join {{ this }} as existing
+        on all_activity.user_id = existing.user_id
+        and all_activity.activity_date <= existing.baseline_end_date
+    group by all_activity.user_id
+),
+
+users_to_rebuild as (
+    select user_id
+    from {{ this }}
+    where baseline_active_days < 14
+
+    union
+
+    select all_activity.user_id
+    from all_activity
+    where not exists (
+        select 1
+        from {{ this }} as existing
+        where existing.user_id = all_activity.user_id
+    )
+
+    union
+
+    select existing.user_id
+    from {{ this }} as existing
+    left join current_window
+        on existing.user_id = current_window.user_id
+    where current_window.user_id is null
+       or current_window.baseline_start_date is distinct from existing.baseline_start_date
+       or current_window.baseline_active_days is distinct from existing.baseline_active_days
+       or current_window.baseline_steps_total is distinct from existing.baseline_steps_total
+),
+{% endif %}
+
+activity as (
+    select *
+    from all_activity
+    {% if incremental %}
+    where user_id in (select user_id from users_to_rebuild)
+    {% endif %}
+),
+
 ranked as (
     select
         user_id,
@@ -35,7 +104,8 @@ baseline_summary as (
         min(activity_date) as baseline_start_date,
         max(activity_date) as baseline_end_date,
         count(*) as baseline_active_days,
-        percentile_cont(0.5) within group (order by total_steps) as baseline_steps
+        percentile_cont(0.5) within group (order by total_steps) as baseline_steps,
+        sum(total_steps) as baseline_steps_total
     from baseline_window
     group by user_id
 )
@@ -1,3 +1,11 @@
+{{
+    config(
+        materialized='incremental',
+        unique_key=['user_id', 'activity_date'],
+        incremental_strategy='delete+insert'
+    )
+}}
+
 with activity as (
     select
         user_id,
@@ -11,6 +19,9 @@ with activity as (
         calories,
         user_id::text || '-' || activity_date::text as user_day_id
     from {{ ref('stg_daily_activity') }}
+    {% if is_incremental() %}
+    where activity_date >= {{ incremental_lookback_start() }}
+    {% endif %}
 )
 
 select *
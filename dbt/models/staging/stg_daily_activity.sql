@@ -3,17 +3,18 @@ with source as (
     from {{ source('staging', 'daily_activity') }}
 ),
 
+-- The loaders land typed columns (DATE, INTEGER, BIGINT); only renames and rounding remain.
 renamed as (
     select
-        cast("Id" as bigint) as user_id,
-        to_date("ActivityDate", 'MM/DD/YYYY') as activity_date,
-        cast("TotalSteps" as integer) as total_steps,
+        "Id" as user_id,
+        "ActivityDate" as activity_date,
+        "TotalSteps" as total_steps,
         cast("TotalDistance" as numeric(10, 2)) as total_distance,
-        cast("VeryActiveMinutes" as integer) as very_active_minutes,
-        cast("FairlyActiveMinutes" as integer) as fairly_active_minutes,
-        cast("LightlyActiveMinutes" as integer) as lightly_active_minutes,
-        cast("SedentaryMinutes" as integer) as sedentary_minutes,
-        cast("Calories" as integer) as calories
+        "VeryActiveMinutes" as very_active_minutes,
+        "FairlyActiveMinutes" as fairly_active_minutes,
+        "LightlyActiveMinutes" as lightly_active_minutes,
+        "SedentaryMinutes" as sedentary_minutes,
+        "Calories" as calories
     from source
 )
 
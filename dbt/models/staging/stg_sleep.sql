@@ -3,13 +3,14 @@ with source as (
     from {{ source('staging', 'sleep') }}
 ),
 
+-- The loaders land typed columns; SleepDay is already the calendar date of the night.
 renamed as (
     select
-        cast("Id" as bigint) as user_id,
-        to_timestamp("SleepDay", 'MM/DD/YYYY HH12:MI:SS AM')::date as sleep_date,
-        cast("TotalSleepRecords" as integer) as total_sleep_records,
-        cast("TotalMinutesAsleep" as integer) as total_minutes_asleep,
-        cast("TotalTimeInBed" as integer) as total_time_in_bed
+        "Id" as user_id,
+        "SleepDay" as sleep_date,
+        "TotalSleepRecords" as total_sleep_records,
+        "TotalMinutesAsleep" as total_minutes_asleep,
+        "TotalTimeInBed" as total_time_in_bed
     from source
 )
 
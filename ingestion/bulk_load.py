@@ -0,0 +1,115 @@
+"""Bulk-load DataFrames into Postgres staging tables via COPY FROM STDIN (or plain INSERTs)."""
+
+from __future__ import annotations
+
+import io
+import os
+
+import pandas as pd
+from sqlalchemy.engine import Connection
+
+from ingestion.schemas import sql_dtypes
+
+LOADERS = ("copy", "insert")
+DEFAULT_LOADER = "copy"
+DEFAULT_BATCH_SIZE = 50_000
+# NULL marker in COPY text, so an empty string stays "" as it does with INSERTs.
+_COPY_NULL = r"\N"
+
+
+def default_loader() -> str:
+    loader = (os.getenv("STAGING_LOADER") or DEFAULT_LOADER).strip().lower()
+    if loader not in LOADERS:
+        raise ValueError(f"Unknown STAGING_LOADER: {loader}. Use copy or insert.")
+    return loader
+
+
+def default_batch_size() -> int:
+    return int(os.getenv("STAGING_BATCH_SIZE") or DEFAULT_BATCH_SIZE)
+
+
+def _quote_ident(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def ensure_table_for_frame(
+    conn: Connection,
+    df: pd.DataFrame,
+    schema: str,
+    table: str,
+    if_exists: str = "append",
+) -> None:
+    """Create schema.table from the frame's columns/dtypes (same DDL as to_sql) without writing rows.
+
+    Registered dataset columns get their staging types when the frame's dtype fits them.
+    """
+    df.head(0).to_sql(
+        name=table, con=conn, schema=schema, if_exists=if_exists, index=False, dtype=sql_dtypes(df)
+    )
+
+
+def copy_frame(
+    conn: Connection,
+    df: pd.DataFrame,
+    schema: str,
+    table: str,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> int:
+    """Stream rows into an existing table with COPY ... FROM STDIN, batch_size rows per COPY."""
+    if df.empty:
+        return 0
+    columns = ", ".join(_quote_ident(c) for c in df.columns)
+    sql = (
+        f"COPY {_quote_ident(schema)}.{_quote_ident(table)} ({columns}) "
+        f"FROM STDIN WITH (FORMAT csv, NULL '{_COPY_NULL}')"
+    )
+    # Raw psycopg2 connection behind the SQLAlchemy Connection: COPY shares its transaction.
+    cursor = conn.connection.cursor()
+    try:
+        for start in range(0, len(df), batch_size):
+            buf = io.StringIO()
+            df.iloc[start : start + batch_size].to_csv(buf, index=False, header=False, na_rep=_COPY_NULL)
+            buf.seek(0)
+            cursor.copy_expert(sql, buf)
+    finally:
+        cursor.close()
+    return len(df)
+
+
+def _widen_float32(df: pd.DataFrame) -> pd.DataFrame:
+    """float32 columns as float64 parsed from their shortest decimal text (5.63, not 5.630000114440918).
+
+    COPY already sends that text; INSERT parameters would carry the widened binary value instead.
+    """
+    widened = {c: df[c].astype(str).astype("float64") for c in df.columns if df[c].dtype == "float32"}
+    return df.assign(**widened) if widened else df
+
+
+def write_frame(
+    conn: Connection,
+    df: pd.DataFrame,
+    schema: str,
+    table: str,
+    loader: str = DEFAULT_LOADER,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    if_exists: str = "append",
+) -> int:
+    """Create the table if needed and append df with the selected loader. Returns rows written."""
+    if loader not in LOADERS:
+        raise ValueError(f"Unknown loader: {loader}. Use copy or insert.")
+    ensure_table_for_frame(conn, df, schema, table, if_exists=if_exists)
+    if loader == "copy":
+        return copy_frame(conn, df, schema, table, batch_size=batch_size)
+    _widen_float32(df).to_sql(
+        name=table,
+        con=conn,
+        schema=schema,
+        if_exists="append",
+        index=False,
+        chunksize=batch_size,
+    )
+    return len(df)
+
+
+def rows_per_second(row_count: int, seconds: float) -> float:
+    return row_count / seconds if seconds > 0 else float(row_count)
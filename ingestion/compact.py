@@ -0,0 +1,249 @@
+"""Merge the small objects of each lake date= partition into one compacted object, with lineage."""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import sys
+import time
+from pathlib import Path
+
+_REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(_REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(_REPO_ROOT))
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from ingestion import db
+from ingestion.compression import COMPRESSIONS, compress, default_compression
+from ingestion.config import get_logger
+from ingestion.lake_format import (
+    LAKE_FORMATS,
+    compacted_object_name,
+    default_lake_format,
+    format_of_key,
+    frame_to_parquet_bytes,
+    is_compacted_key,
+)
+from ingestion.load_s3_to_staging import (
+    DEFAULT_DOWNLOAD_WORKERS,
+    _iter_prefetched,
+    _list_lake_objects,
+    _object_versions,
+    _prefix_for_dataset,
+    _read_object,
+)
+from ingestion.manifest import (
+    ensure_compaction_table,
+    ensure_s3_manifest_table,
+    get_compaction_lineage,
+    record_compaction,
+)
+from ingestion.s3io import bucket_name, download_object_bytes, get_s3_client, put_object_with_checksum, s3_prefix
+
+log = get_logger(__name__)
+
+DEFAULT_MIN_OBJECTS = 2
+
+
+def compaction_digest(sources: dict[str, str]) -> str:
+    """Stable name component for a set of source objects at given versions."""
+    payload = "\n".join(f"{key}={sources[key]}" for key in sorted(sources))
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def merge_csv_bodies(bodies: list[bytes]) -> bytes:
+    """Concatenate CSV texts under the first header, byte for byte; headers must all match."""
+    header = bodies[0].split(b"\n", 1)[0]
+    parts = [bodies[0] if bodies[0].endswith(b"\n") else bodies[0] + b"\n"]
+    for body in bodies[1:]:
+        first, _, rows = body.partition(b"\n")
+        if first.rstrip(b"\r") != header.rstrip(b"\r"):
+            raise ValueError(f"header mismatch: {first[:80]!r} vs {header[:80]!r}")
+        if rows and not rows.endswith(b"\n"):
+            rows += b"\n"
+        parts.append(rows)
+    return b"".join(parts)
+
+
+def _group_by_partition(keys: list[str]) -> dict[str, list[str]]:
+    partitions: dict[str, list[str]] = {}
+    for key in sorted(keys):
+        partitions.setdefault(key.rsplit("/", 1)[0], []).append(key)
+    return partitions
+
+
+def compact_dataset(
+    engine,
+    client,
+    bucket: str,
+    prefix: str,
+    table: str,
+    min_objects: int,
+    lake_format: str,
+    compression: str,
+    download_workers: int,
+    dry_run: bool = False,
+) -> dict[str, int]:
+    """Compact every partition of one dataset holding at least min_objects source objects.
+
+    Sources are left in place: the loader reads a compacted object instead of its sources only
+    while lineage shows every source unchanged, so a later edit to any of them is never lost.
+    This saves GETs, not LISTs: a compacted partition lists one object more than before.
+    """
+    pfx = _prefix_for_dataset(prefix, table)
+    objects = _list_lake_objects(client, bucket, pfx)
+    versions = _object_versions(engine, objects)
+    lineage = get_compaction_lineage(engine, pfx)
+    sources_by_partition = _group_by_partition([k for k in objects if not is_compacted_key(k)])
+    compacted_by_partition = _group_by_partition([k for k in objects if is_compacted_key(k)])
+
+    counts = {"compacted": 0, "up_to_date": 0, "skipped": 0, "source_objects": 0}
+    for partition, keys in sources_by_partition.items():
+        existing = compacted_by_partition.get(partition, [])
+        sources = {k: versions[k] for k in keys}
+        if len(keys) < min_objects:
+            continue
+        if any(lineage.get(c) == sources for c in existing):
+            counts["up_to_date"] += 1
+            continue
+        if dry_run:
+            log.info("Would compact %s objects in s3://%s/%s/", len(keys), bucket, partition)
+            counts["compacted"] += 1
+            counts["source_objects"] += len(keys)
+            continue
+
+        fetch = lambda key: download_object_bytes(client, bucket, key)  # noqa: E731
+        bodies = dict(_iter_prefetched(keys, fetch, download_workers))
+        out_format = "csv"
+        if lake_format == "parquet" or any(format_of_key(k) == "parquet" for k in keys):
+            out_format = "parquet"
+        try:
+            if out_format == "csv":
+                body = merge_csv_bodies([bodies[k] for k in keys])
+            else:
+                body = frame_to_parquet_bytes(
+                    pd.concat([_read_object(k, bodies[k]) for k in keys], ignore_index=True)
+                )
+        except ValueError as e:
+            log.warning("Not compacting s3://%s/%s/: %s", bucket, partition, e)
+            counts["skipped"] += 1
+            continue
+
+        key = f"{partition}/{compacted_object_name(compaction_digest(sources), out_format)}"
+        encoding = compression if out_format == "csv" else "none"
+        put_object_with_checksum(
+            client, bucket, key, compress(body, encoding), hashlib.sha256(body).hexdigest(), log, encoding=encoding
+        )
+        superseded = [c for c in existing if c != key]
+        with engine.begin() as conn:
+            record_compaction(conn, key, sources, replaces=superseded)
+        for old in superseded:
+            client.delete_object(Bucket=bucket, Key=old)
+        log.info(
+            "Compacted %s objects into s3://%s/%s (%s bytes, replaced %s compacted objects)",
+            len(keys),
+            bucket,
+            key,
+            len(body),
+            len(superseded),
+        )
+        counts["compacted"] += 1
+        counts["source_objects"] += len(keys)
+    return counts
+
+
+def run_compaction(
+    min_objects: int = DEFAULT_MIN_OBJECTS,
+    lake_format: str | None = None,
+    compression: str | None = None,
+    download_workers: int = DEFAULT_DOWNLOAD_WORKERS,
+    dry_run: bool = False,
+) -> int:
+    try:
+        engine = db.get_engine()
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except OperationalError as e:
+        log.error("Postgres required for compaction lineage: %s", e)
+        return 1
+
+    ensure_s3_manifest_table(engine)
+    ensure_compaction_table(engine)
+    download_workers = max(1, download_workers)
+    client = get_s3_client(max_pool_connections=download_workers + 1)
+    bucket = bucket_name()
+    prefix = s3_prefix()
+    for table in ("daily_activity", "sleep"):
+        t0 = time.perf_counter()
+        counts = compact_dataset(
+            engine,
+            client,
+            bucket,
+            prefix,
+            table,
+            max(2, min_objects),
+            lake_format or default_lake_format(),
+            compression or default_compression(),
+            download_workers,
+            dry_run=dry_run,
+        )
+        log.info(
+            "%s: %s partitions %scompacted from %s objects, %s already compacted, %s skipped (%.2fs)",
+            table,
+            counts["compacted"],
+            "would be " if dry_run else "",
+            counts["source_objects"],
+            counts["up_to_date"],
+            counts["skipped"],
+            time.perf_counter() - t0,
+        )
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compact small lake objects per date= partition.")
+    parser.add_argument(
+        "--min-objects",
+        type=int,
+        default=int(os.getenv("COMPACT_MIN_OBJECTS") or DEFAULT_MIN_OBJECTS),
+        help="Only compact partitions holding at least this many source objects (minimum 2).",
+    )
+    parser.add_argument(
+        "--format",
+        default=default_lake_format(),
+        choices=LAKE_FORMATS,
+        help="Compacted object format; Parquet sources always compact to Parquet.",
+    )
+    parser.add_argument(
+        "--compression",
+        default=default_compression(),
+        choices=COMPRESSIONS,
+        help="Content encoding for compacted CSV objects.",
+    )
+    parser.add_argument(
+        "--download-workers",
+        type=int,
+        default=int(os.getenv("LOAD_DOWNLOAD_WORKERS") or DEFAULT_DOWNLOAD_WORKERS),
+        help="Concurrent S3 GETs while reading a partition's sources.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Report the partitions that would be compacted without writing anything.",
+    )
+    args = parser.parse_args()
+    return run_compaction(
+        min_objects=args.min_objects,
+        lake_format=args.format,
+        compression=args.compression,
+        download_workers=args.download_workers,
+        dry_run=args.dry_run,
+    )
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
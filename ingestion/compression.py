@@ -0,0 +1,86 @@
+"""Content encodings for lake objects: gzip (stdlib) or zstd (zstandard), decoded as a stream on read."""
+
+from __future__ import annotations
+
+import gzip
+import io
+import os
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+COMPRESSIONS = ("none", "gzip", "zstd")
+DEFAULT_COMPRESSION = "none"
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def default_compression() -> str:
+    compression = (os.getenv("LAKE_COMPRESSION") or DEFAULT_COMPRESSION).strip().lower()
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown LAKE_COMPRESSION: {compression}. Use none, gzip or zstd.")
+    return compression
+
+
+def _require_zstandard() -> None:
+    if zstandard is None:
+        raise RuntimeError("zstd compression requires zstandard (pip install zstandard).")
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        # mtime=0 keeps the output (and its ETag) stable for identical input.
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding == "zstd":
+        _require_zstandard()
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    if encoding in ("", "none"):
+        return body
+    raise ValueError(f"Unknown content encoding: {encoding}")
+
+
+def decompress(body: bytes, encoding: str | None) -> bytes:
+    if not encoding or encoding == "none":
+        return body
+    with open_decoded(io.BytesIO(body), encoding) as stream:
+        return stream.read()
+
+
+class _DecodedStream(io.RawIOBase):
+    """Readable view of a decoder over a source stream; closing it closes both."""
+
+    def __init__(self, decoded, source) -> None:
+        self._decoded = decoded
+        self._source = source
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._decoded.read(len(buffer))
+        n = len(data)
+        buffer[:n] = data
+        return n
+
+    def close(self) -> None:
+        if not self.closed:
+            try:
+                self._decoded.close()
+            finally:
+                self._source.close()
+        super().close()
+
+
+def open_decoded(source, encoding: str | None):
+    """Wrap a readable binary stream so reads return decoded bytes without buffering the object."""
+    if not encoding or encoding == "none":
+        return source
+    if encoding == "gzip":
+        return io.BufferedReader(_DecodedStream(gzip.GzipFile(fileobj=source, mode="rb"), source))
+    if encoding == "zstd":
+        _require_zstandard()
+        reader = zstandard.ZstdDecompressor().stream_reader(source, closefd=False)
+        return io.BufferedReader(_DecodedStream(reader, source))
+    raise ValueError(f"Unknown content encoding: {encoding}")
@@ -2,11 +2,23 @@
 
 from __future__ import annotations
 
+import hashlib
+import io
+import os
 import re
+import threading
+from dataclasses import dataclass
+from datetime import date
 from pathlib import Path
 
 import pandas as pd
 
+from ingestion.lake_format import object_name
+from ingestion.schemas import parse_date_series, pyarrow_csv_available, read_column_arrow, read_csv
+
+# Rows of the date column parsed per chunk while fingerprinting.
+_FINGERPRINT_CHUNK_ROWS = 100_000
+
 
 def list_candidate_files(data_dir: Path) -> list[Path]:
     if not data_dir.exists():
@@ -31,32 +43,175 @@ def table_name_from_path(path: Path) -> str:
 
 
 def _parse_activity_series(series: pd.Series) -> pd.Series:
-    return pd.to_datetime(series, format="%m/%d/%Y", errors="coerce")
+    return parse_date_series(series, "ActivityDate")
 
 
 def _parse_sleep_day_series(series: pd.Series) -> pd.Series:
-    return pd.to_datetime(series, format="%m/%d/%Y %I:%M:%S %p", errors="coerce")
+    return parse_date_series(series, "SleepDay")
+
+
+_DATE_COLUMNS = {
+    "daily_activity": ("ActivityDate", _parse_activity_series),
+    "sleep": ("SleepDay", _parse_sleep_day_series),
+}
+
+
+@dataclass(frozen=True)
+class FileFingerprint:
+    """SHA-256 (and MD5, to compare with S3 ETags), row count and date range of one drop file, from a single read."""
+
+    sha256: str
+    md5: str
+    size: int
+    mtime_ns: int
+    table: str | None
+    row_count: int | None
+    date_column_found: bool
+    min_date: date | None
+    max_date: date | None
+
+
+class _HashingReader(io.RawIOBase):
+    """Binary reader that feeds every byte it hands to the CSV parser into SHA-256 and MD5."""
+
+    def __init__(self, raw) -> None:
+        self._raw = raw
+        self.hash = hashlib.sha256()
+        self.md5 = hashlib.md5()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = self._raw.readinto(buffer)
+        if n:
+            view = memoryview(buffer)[:n]
+            self.hash.update(view)
+            self.md5.update(view)
+        return n
+
+
+_FINGERPRINTS: dict[tuple[str, int, int], FileFingerprint] = {}
+_FINGERPRINTS_LOCK = threading.Lock()
+
+
+def _scan_dates_arrow(reader, column: str, parse) -> tuple[bool, int, date | None, date | None]:
+    """(found, rows, min, max) of the date column via pyarrow; only its distinct values are parsed."""
+    values = read_column_arrow(reader, column)
+    if values is None:
+        return False, 0, None, None
+    parsed = values.dropna()
+    if parsed.empty:
+        return True, len(values), None, None
+    return True, len(values), parsed.min().date(), parsed.max().date()
+
+
+def _scan_dates_pandas(reader, column: str, parse) -> tuple[bool, int, date | None, date | None]:
+    found = False
+    row_count = 0
+    min_date = max_date = None
+    with pd.read_csv(
+        reader,
+        usecols=lambda c: c == column,
+        dtype=str,
+        chunksize=_FINGERPRINT_CHUNK_ROWS,
+    ) as chunks:
+        for chunk in chunks:
+            if column not in chunk.columns:
+                break
+            found = True
+            row_count += len(chunk)
+            parsed = parse(chunk[column]).dropna()
+            if parsed.empty:
+                continue
+            lo, hi = parsed.min().date(), parsed.max().date()
+            min_date = lo if min_date is None else min(min_date, lo)
+            max_date = hi if max_date is None else max(max_date, hi)
+    return found, row_count, min_date, max_date
+
+
+def _hash_and_scan(path: Path, table: str | None, scan) -> tuple[_HashingReader, bool, int | None, date | None, date | None]:
+    """Hash the whole file while `scan` parses its date column in the same read."""
+    with open(path, "rb") as f:
+        reader = _HashingReader(f)
+        found, row_count, min_date, max_date = False, None, None, None
+        if table is not None:
+            column, parse = _DATE_COLUMNS[table]
+            found, row_count, min_date, max_date = scan(reader, column, parse)
+        # Drain whatever the parser did not consume so the hash covers the whole file.
+        while reader.read(1 << 16):
+            pass
+    return reader, found, row_count, min_date, max_date
+
+
+def _compute_fingerprint(path: Path, size: int, mtime_ns: int) -> FileFingerprint:
+    try:
+        table = table_name_from_path(path)
+    except ValueError:
+        table = None
+
+    result = None
+    if pyarrow_csv_available():
+        try:
+            result = _hash_and_scan(path, table, _scan_dates_arrow)
+        except ValueError:
+            pass  # pyarrow rejected the file; read it again with the pandas parser.
+    if result is None:
+        result = _hash_and_scan(path, table, _scan_dates_pandas)
+    reader, found, row_count, min_date, max_date = result
+
+    return FileFingerprint(
+        sha256=reader.hash.hexdigest(),
+        md5=reader.md5.hexdigest(),
+        size=size,
+        mtime_ns=mtime_ns,
+        table=table,
+        row_count=row_count if found else None,
+        date_column_found=found,
+        min_date=min_date,
+        max_date=max_date,
+    )
+
+
+def _memo_key(path: Path, size: int, mtime_ns: int) -> tuple[str, int, int]:
+    return (str(path.resolve()), size, mtime_ns)
+
+
+def fingerprint_file(path: Path, force: bool = False) -> FileFingerprint:
+    """Fingerprint path in one streaming pass, parsing only its date column.
+
+    Results are memoized per (path, size, mtime) for the process lifetime, so detect, key
+    building and upload share one read of each file. force=True re-reads and refreshes the memo.
+    """
+    st = path.stat()
+    memo_key = _memo_key(path, st.st_size, st.st_mtime_ns)
+    if not force:
+        with _FINGERPRINTS_LOCK:
+            cached = _FINGERPRINTS.get(memo_key)
+        if cached is not None:
+            return cached
+    fp = _compute_fingerprint(path, st.st_size, st.st_mtime_ns)
+    with _FINGERPRINTS_LOCK:
+        _FINGERPRINTS[memo_key] = fp
+    return fp
+
+
+def remember_fingerprint(path: Path, fp: FileFingerprint) -> None:
+    """Seed the process memo with a fingerprint obtained elsewhere (e.g. the persistent cache)."""
+    with _FINGERPRINTS_LOCK:
+        _FINGERPRINTS[_memo_key(path, fp.size, fp.mtime_ns)] = fp
 
 
 def partition_date_for_file(path: Path) -> str:
     """Return YYYY-MM-DD partition derived from file content (min calendar date in file)."""
     table = table_name_from_path(path)
-    df = pd.read_csv(path)
-    if table == "daily_activity":
-        if "ActivityDate" not in df.columns:
-            raise ValueError(f"{path.name}: missing ActivityDate column")
-        dt = _parse_activity_series(df["ActivityDate"]).dropna()
-        if dt.empty:
-            raise ValueError(f"{path.name}: no parseable ActivityDate values")
-        d = dt.min().date()
-        return d.isoformat()
-    if "SleepDay" not in df.columns:
-        raise ValueError(f"{path.name}: missing SleepDay column")
-    dt = _parse_sleep_day_series(df["SleepDay"]).dropna()
-    if dt.empty:
-        raise ValueError(f"{path.name}: no parseable SleepDay values")
-    d = dt.min().date()
-    return d.isoformat()
+    column, _ = _DATE_COLUMNS[table]
+    fp = fingerprint_file(path)
+    if not fp.date_column_found:
+        raise ValueError(f"{path.name}: missing {column} column")
+    if fp.min_date is None:
+        raise ValueError(f"{path.name}: no parseable {column} values")
+    return fp.min_date.isoformat()
 
 
 def dataset_folder(table: str) -> str:
@@ -67,11 +222,67 @@ def dataset_folder(table: str) -> str:
     raise ValueError(f"Unknown table for S3 layout: {table}")
 
 
-def build_s3_key(prefix: str, path: Path) -> str:
-    """raw/activity/date=YYYY-MM-DD/<filename>"""
+def _safe_name(path: Path) -> str:
+    return re.sub(r"[^a-zA-Z0-9._-]", "_", path.name)
+
+
+def build_s3_key(prefix: str, path: Path, lake_format: str = "csv") -> str:
+    """raw/activity/date=YYYY-MM-DD/<filename> (<stem>.parquet for lake_format="parquet")."""
     table = table_name_from_path(path)
     folder = dataset_folder(table)
     part = partition_date_for_file(path)
-    safe_name = re.sub(r"[^a-zA-Z0-9._-]", "_", path.name)
+    safe_name = _safe_name(path)
+    if lake_format != "csv":
+        safe_name = object_name(safe_name, lake_format)
     p = prefix.strip("/")
     return f"{p}/{folder}/date={part}/{safe_name}"
+
+
+def split_by_date_default() -> bool:
+    return (os.getenv("LAKE_SPLIT_BY_DATE") or "").strip().lower() in ("1", "true", "yes")
+
+
+def split_s3_key(prefix: str, path: Path, day: date, lake_format: str = "csv") -> str:
+    """raw/activity/date=YYYY-MM-DD/<stem>.YYYY-MM-DD.<csv|parquet>: one calendar day of a drop file."""
+    folder = dataset_folder(table_name_from_path(path))
+    name = object_name(f"{Path(_safe_name(path)).stem}.{day.isoformat()}.csv", lake_format)
+    return f"{prefix.strip('/')}/{folder}/date={day.isoformat()}/{name}"
+
+
+_SPLIT_KEY = re.compile(r"/date=(\d{4}-\d{2}-\d{2})/[^/]+\.\1\.[a-z]+$")
+
+
+def is_split_key(key: str) -> bool:
+    return bool(_SPLIT_KEY.search(key))
+
+
+def split_by_date(path: Path, typed: bool = False) -> dict[date, pd.DataFrame]:
+    """Rows of a drop file grouped by the calendar date in its date column, from one vectorized parse.
+
+    Columns stay verbatim text unless typed (then in dataset schema registry dtypes).
+    Rows whose date does not parse stay with the file's earliest date, as whole-file mode files them.
+    """
+    table = table_name_from_path(path)
+    column, parse = _DATE_COLUMNS[table]
+    if typed:
+        df = read_csv(path)
+    else:
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    if column not in df.columns:
+        raise ValueError(f"{path.name}: missing {column} column")
+    days = df[column] if pd.api.types.is_datetime64_any_dtype(df[column]) else parse(df[column])
+    if days.isna().all():
+        raise ValueError(f"{path.name}: no parseable {column} values")
+    days = days.fillna(days.min())
+    return {day.date(): group for day, group in df.groupby(days, sort=True)}
+
+
+_KEY_DATE = re.compile(r"/date=(\d{4}-\d{2}-\d{2})/")
+
+
+def partition_date_from_key(key: str) -> date:
+    """Inverse of build_s3_key's partition: the date=YYYY-MM-DD segment of a lake key."""
+    m = _KEY_DATE.search(key)
+    if not m:
+        raise ValueError(f"no date=YYYY-MM-DD segment in {key!r}")
+    return date.fromisoformat(m.group(1))
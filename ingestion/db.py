@@ -1,12 +1,28 @@
-"""Shared database connection: supports DATABASE_URL or DB_* env vars (e.g. cloud Postgres)."""
+"""Shared database connection: supports DATABASE_URL or DB_* env vars (e.g. cloud Postgres).
+
+Engines are pooled and cached per process by URL, so every module reuses one warm pool.
+"""
 
 from __future__ import annotations
 
+import logging
 import os
+import threading
 from urllib.parse import urlparse
 
 from sqlalchemy import create_engine
 from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+
+log = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 5
+DEFAULT_MAX_OVERFLOW = 10
+# Seconds before a pooled connection is replaced (below typical server/LB idle cutoffs).
+DEFAULT_POOL_RECYCLE = 1800
+
+_engines: dict[str, tuple[int, float, Engine]] = {}
+_engines_lock = threading.Lock()
 
 
 def get_connection_url() -> str:
@@ -31,9 +47,80 @@ def get_connection_url() -> str:
     return f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{dbname}"
 
 
-def get_engine() -> Engine:
-    """Create SQLAlchemy engine from DATABASE_URL or DB_* env vars."""
-    return create_engine(get_connection_url())
+def _env_flag(name: str, default: bool) -> bool:
+    value = (os.getenv(name) or "").strip().lower()
+    if not value:
+        return default
+    return value in ("1", "true", "yes")
+
+
+def engine_options(min_connections: int = 0) -> dict:
+    """create_engine() keyword arguments from the DB_POOL_* / DB_STATEMENT_TIMEOUT_MS / DB_PGBOUNCER env vars.
+
+    min_connections: connections the caller may hold at once (one per worker thread); the overflow
+    is raised to cover them when DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW would leave threads waiting.
+    """
+    statement_timeout_ms = int(os.getenv("DB_STATEMENT_TIMEOUT_MS") or 0)
+    if _env_flag("DB_PGBOUNCER", False):
+        # Transaction pooling: PgBouncer owns the pool and server sessions are shared between
+        # clients, so hold no client-side pool and send no startup options (PgBouncer rejects
+        # unknown ones). psycopg2 never creates server-side prepared statements.
+        if statement_timeout_ms:
+            log.warning(
+                "DB_STATEMENT_TIMEOUT_MS is ignored with DB_PGBOUNCER; set statement_timeout on the database role"
+            )
+        return {"poolclass": NullPool}
+    pool_size = int(os.getenv("DB_POOL_SIZE") or DEFAULT_POOL_SIZE)
+    options: dict = {
+        "pool_size": pool_size,
+        "max_overflow": max(int(os.getenv("DB_POOL_MAX_OVERFLOW") or DEFAULT_MAX_OVERFLOW), min_connections - pool_size),
+        "pool_pre_ping": _env_flag("DB_POOL_PRE_PING", True),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE") or DEFAULT_POOL_RECYCLE),
+    }
+    if statement_timeout_ms:
+        options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout_ms}"}
+    return options
+
+
+def _capacity(options: dict) -> float:
+    """Connections an engine built from options can hand out at once."""
+    if options.get("poolclass") is NullPool:
+        return float("inf")
+    return options["pool_size"] + options["max_overflow"]
+
+
+def get_engine(url: str | None = None, min_connections: int = 0) -> Engine:
+    """Return this process's pooled engine for url (default: DATABASE_URL or DB_* env vars).
+
+    The first call per URL creates the engine; later calls reuse it unless it cannot hand out
+    min_connections at once, in which case a larger one replaces it in the registry and the old
+    one's idle pooled connections are closed (engines already returned keep working, opening
+    connections on demand). A forked child (e.g. an Airflow task) gets its own engine and
+    leaves the parent's pooled sockets alone.
+    """
+    url = url or get_connection_url()
+    pid = os.getpid()
+    with _engines_lock:
+        cached = _engines.get(url)
+        if cached is not None:
+            owner, capacity, engine = cached
+            if owner == pid and capacity >= min_connections:
+                return engine
+            # A parent's pooled sockets belong to the parent: drop them here without closing.
+            engine.dispose(close=owner == pid)
+        options = engine_options(min_connections)
+        engine = create_engine(url, **options)
+        _engines[url] = (pid, _capacity(options), engine)
+        return engine
+
+
+def dispose_engines() -> None:
+    """Close every cached engine's pooled connections and forget them."""
+    with _engines_lock:
+        for owner, _, engine in _engines.values():
+            if owner == os.getpid():
+                engine.dispose()
+        _engines.clear()
 
 
 def get_connection_info() -> tuple[str, str, str]:
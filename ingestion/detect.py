@@ -13,71 +13,217 @@ if str(_REPO_ROOT) not in sys.path:
 
 from sqlalchemy.exc import OperationalError
 
+from ingestion.compression import COMPRESSIONS, DEFAULT_COMPRESSION, default_compression
 from ingestion.config import data_drop_dir, get_logger
-from ingestion.csv_partition import build_s3_key, list_candidate_files, table_name_from_path
+from ingestion.csv_partition import (
+    build_s3_key,
+    fingerprint_file,
+    list_candidate_files,
+    split_by_date_default,
+    table_name_from_path,
+)
 from ingestion import db
+from ingestion.fingerprint_cache import prime_fingerprints
+from ingestion.lake_format import DEFAULT_LAKE_FORMAT, LAKE_FORMATS, default_lake_format
 from ingestion.manifest import (
+    ManifestBatch,
     ensure_manifest_table,
     ensure_s3_manifest_table,
-    file_checksum,
     get_manifest_row,
+    get_manifest_rows,
     get_s3_manifest_row,
+    get_s3_manifest_rows,
+    get_s3_manifest_rows_by_source,
     upsert_s3_manifest,
+    upsert_s3_manifest_rows,
+)
+from ingestion.s3io import (
+    bucket_name,
+    get_s3_client,
+    head_object_meta,
+    list_object_index,
+    s3_prefix,
 )
-from ingestion.s3io import bucket_name, get_s3_client, head_object_meta, s3_prefix
+from ingestion.upload_to_s3 import split_objects_current
 
 
 log = get_logger(__name__)
 
 
-def needs_s3_upload(path: Path, engine) -> bool:
-    key = build_s3_key(s3_prefix(), path)
-    checksum = file_checksum(path)
-    row = get_s3_manifest_row(engine, key)
+class RemoteIndex:
+    """In-memory view of the lake: one paginated list_objects_v2 walk per dataset prefix, HEAD on demand.
+
+    requests counts the S3 calls made so detect can report them.
+    """
+
+    def __init__(self, client, bucket: str, use_listing: bool = True) -> None:
+        self.client = client
+        self.bucket = bucket
+        self.use_listing = use_listing
+        self.requests = {"list_objects_v2": 0, "head_object": 0}
+        self._objects: dict[str, dict[str, dict]] = {}
+
+    def listed_object(self, key: str) -> tuple[bool, dict | None]:
+        """Return (covered, entry); covered is False when listing is disabled."""
+        if not self.use_listing:
+            return False, None
+        # Keys look like <prefix>/<dataset>/date=YYYY-MM-DD/<file>; list each dataset prefix once.
+        dataset_prefix = key.split("/date=", 1)[0] + "/"
+        if dataset_prefix not in self._objects:
+            index, pages = list_object_index(self.client, self.bucket, dataset_prefix)
+            self._objects[dataset_prefix] = index
+            self.requests["list_objects_v2"] += pages
+        return True, self._objects[dataset_prefix].get(key)
+
+    def head(self, key: str) -> dict | None:
+        self.requests["head_object"] += 1
+        return head_object_meta(self.client, self.bucket, key)
+
+
+def _sync_manifest(
+    engine,
+    manifest_batch: ManifestBatch | None,
+    key: str,
+    path: Path,
+    checksum: str,
+    etag: str | None,
+    byte_size: int,
+) -> None:
+    if manifest_batch is None:
+        upsert_s3_manifest(engine, key, path.name, checksum, etag, byte_size)
+        return
+    manifest_batch.add(
+        {
+            "s3_key": key,
+            "source_filename": path.name,
+            "checksum": checksum,
+            "etag": etag,
+            "byte_size": byte_size,
+        }
+    )
+
+
+def needs_s3_upload(
+    path: Path,
+    engine,
+    manifest_rows: dict[str, dict] | None = None,
+    manifest_batch: ManifestBatch | None = None,
+    remote: RemoteIndex | None = None,
+    lake_format: str = DEFAULT_LAKE_FORMAT,
+    compression: str = DEFAULT_COMPRESSION,
+    split: bool = False,
+    recorded: dict[str, dict] | None = None,
+) -> bool:
+    """manifest_rows: prefetched {s3_key: row}; manifest_batch: defer manifest syncs to a batched upsert.
+
+    remote: shared RemoteIndex; without one, a fresh client HEADs the key. With split (per-date
+    objects), only the manifest rows recorded for the file can show it is current.
+    """
+    if split:
+        checksum = fingerprint_file(path).sha256
+        if recorded is None:
+            recorded = get_s3_manifest_rows_by_source(engine, [path.name], s3_prefix()).get(path.name, {})
+        return not split_objects_current(recorded, checksum, [lake_format])
+    key = build_s3_key(s3_prefix(), path, lake_format)
+    fp = fingerprint_file(path)
+    checksum = fp.sha256
+    row = manifest_rows.get(key) if manifest_rows is not None else get_s3_manifest_row(engine, key)
     if row and row["checksum"] == checksum:
         log.debug("Skip S3 (manifest match): %s", key)
         return False
     try:
-        client = get_s3_client()
-        bucket = bucket_name()
-        head = head_object_meta(client, bucket, key)
+        if remote is None:
+            remote = RemoteIndex(get_s3_client(), bucket_name(), use_listing=False)
+        covered, listed = remote.listed_object(key)
+        if covered:
+            if listed is None:
+                return True
+            # Converted or compressed objects never match the drop's size or MD5; only sha256
+            # metadata can decide.
+            if lake_format == "csv" and compression == "none":
+                if listed["Size"] != fp.size:
+                    return True
+                if listed["ETag"] == fp.md5:
+                    # Single-part PUT ETags are the body MD5, so the lake already holds these bytes.
+                    log.info("S3 object ETag matches local MD5; syncing manifest only: %s", key)
+                    _sync_manifest(engine, manifest_batch, key, path, checksum, listed["ETag"], fp.size)
+                    return False
+                if "-" not in listed["ETag"]:
+                    return True
+                # Multipart ETag: only the sha256 metadata can decide.
+        head = remote.head(key)
     except Exception as e:  # noqa: BLE001
-        log.warning("S3 head_object failed for %s; treating as upload needed: %s", key, e)
+        log.warning("S3 lookup failed for %s; treating as upload needed: %s", key, e)
         return True
     if head:
         meta = (head.get("Metadata") or {}) if isinstance(head, dict) else {}
-        remote = (meta.get("sha256") or "").lower()
-        if remote == checksum.lower():
+        remote_sha = (meta.get("sha256") or "").lower()
+        if remote_sha == checksum.lower():
             log.info("S3 object already has matching sha256 metadata; syncing manifest only: %s", key)
             etag = head.get("ETag")
             if isinstance(etag, str):
                 etag = etag.strip('"')
             sz = int(head.get("ContentLength") or path.stat().st_size)
-            upsert_s3_manifest(engine, key, path.name, checksum, etag, sz)
+            _sync_manifest(engine, manifest_batch, key, path, checksum, etag, sz)
             return False
     return True
 
 
-def needs_postgres_reload(path: Path, engine, use_manifest: bool) -> bool:
+def needs_postgres_reload(
+    path: Path,
+    engine,
+    use_manifest: bool,
+    manifest_rows: dict[str, dict] | None = None,
+) -> bool:
     if not use_manifest:
         return True
-    row = get_manifest_row(engine, path.name)
-    checksum = file_checksum(path)
+    if manifest_rows is not None:
+        row = manifest_rows.get(path.name)
+    else:
+        row = get_manifest_row(engine, path.name)
+    checksum = fingerprint_file(path).sha256
     if row and row["checksum"] == checksum:
         return False
     return True
 
 
+def _s3_keys_for(files: list[Path], lake_format: str) -> list[str]:
+    keys: list[str] = []
+    for path in files:
+        try:
+            keys.append(build_s3_key(s3_prefix(), path, lake_format))
+        except ValueError:
+            continue  # surfaced per file by needs_s3_upload
+    return keys
+
+
 def detect_files(
     data_dir: Path | None = None,
     engine=None,
     check_s3: bool = True,
     check_pg: bool = False,
     use_manifest_pg: bool = True,
+    verify: bool = False,
+    fast_hash: bool = False,
+    list_remote: bool = True,
+    lake_format: str | None = None,
+    compression: str | None = None,
+    split: bool | None = None,
 ) -> dict:
-    """Return JSON-serializable summary of pending work."""
+    """Return JSON-serializable summary of pending work.
+
+    Checksums come from the persistent fingerprint cache unless a file's stat tuple changed;
+    verify=True forces a full re-hash of every candidate. For manifest misses, the lake is listed
+    once per dataset prefix (list_remote) and HEAD is only issued when size/ETag cannot decide.
+    lake_format and compression (default LAKE_FORMAT, LAKE_COMPRESSION) describe how the upload
+    step stores each drop file; split (default LAKE_SPLIT_BY_DATE) checks per-date objects.
+    """
+    lake_format = lake_format or default_lake_format()
+    compression = compression or default_compression()
+    split = split_by_date_default() if split is None else split
     root = data_dir or data_drop_dir()
     files = list_candidate_files(root)
+    prime_fingerprints(files, root, verify=verify, use_fast_hash=fast_hash)
     pending_s3: list[str] = []
     pending_pg: list[str] = []
     errors: list[str] = []
@@ -93,24 +239,53 @@ def detect_files(
             log.warning("Postgres unavailable; manifest checks skipped: %s", e)
             engine = None
 
+    s3_rows: dict[str, dict] = {}
+    recorded: dict[str, dict[str, dict]] = {}
+    pg_rows: dict[str, dict] = {}
+    s3_batch = None
+    remote = None
     if engine is not None:
         ensure_manifest_table(engine)
         ensure_s3_manifest_table(engine)
+        # One query per manifest for every candidate instead of one round trip per file.
+        if check_s3:
+            if split:
+                recorded = get_s3_manifest_rows_by_source(engine, [p.name for p in files], s3_prefix())
+            else:
+                s3_rows = get_s3_manifest_rows(engine, _s3_keys_for(files, lake_format))
+            s3_batch = ManifestBatch(engine, upsert_s3_manifest_rows)
+            remote = RemoteIndex(get_s3_client(), bucket_name(), use_listing=list_remote)
+        if check_pg and use_manifest_pg:
+            pg_rows = get_manifest_rows(engine, [p.name for p in files])
 
-    for path in files:
-        try:
-            if check_s3 and engine is not None:
-                if needs_s3_upload(path, engine):
+    try:
+        for path in files:
+            try:
+                if check_s3 and engine is not None:
+                    if needs_s3_upload(
+                        path,
+                        engine,
+                        manifest_rows=s3_rows,
+                        manifest_batch=s3_batch,
+                        remote=remote,
+                        lake_format=lake_format,
+                        compression=compression,
+                        split=split,
+                        recorded=recorded.get(path.name, {}),
+                    ):
+                        pending_s3.append(path.name)
+                elif check_s3:
                     pending_s3.append(path.name)
-            elif check_s3:
-                pending_s3.append(path.name)
-            if check_pg and engine is not None:
-                if needs_postgres_reload(path, engine, use_manifest_pg):
-                    pending_pg.append(path.name)
-        except Exception as e:  # noqa: BLE001
-            msg = f"{path.name}: {e}"
-            log.error("Detect failed for %s: %s", path.name, e)
-            errors.append(msg)
+                if check_pg and engine is not None:
+                    if needs_postgres_reload(path, engine, use_manifest_pg, manifest_rows=pg_rows):
+                        pending_pg.append(path.name)
+            except Exception as e:  # noqa: BLE001
+                msg = f"{path.name}: {e}"
+                log.error("Detect failed for %s: %s", path.name, e)
+                errors.append(msg)
+    finally:
+        if s3_batch is not None:
+            s3_batch.flush()
 
     summary = {
         "data_dir": str(root.resolve()),
@@ -120,6 +295,7 @@ def detect_files(
         "errors": errors,
         "has_pending_s3": bool(pending_s3),
         "has_pending_postgres": bool(pending_pg),
+        "s3_requests": dict(remote.requests) if remote is not None else {},
     }
     return summary
 
@@ -133,18 +309,61 @@ def main() -> int:
         action="store_true",
         help="Include postgres manifest delta in pending_postgres.",
     )
+    parser.add_argument(
+        "--head-only",
+        action="store_true",
+        help="Skip the per-prefix listing and HEAD every manifest miss (previous behaviour).",
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Ignore the fingerprint cache and re-hash every candidate.",
+    )
+    parser.add_argument(
+        "--fast-hash",
+        action="store_true",
+        help="When a file's stat changed, reuse its cached fingerprint if a whole-file BLAKE2b still matches.",
+    )
+    parser.add_argument(
+        "--format",
+        default=default_lake_format(),
+        choices=LAKE_FORMATS,
+        help="Lake object format the upload step writes (csv or parquet).",
+    )
+    parser.add_argument(
+        "--compression",
+        default=default_compression(),
+        choices=COMPRESSIONS,
+        help="Content encoding the upload step applies to CSV objects.",
+    )
+    parser.add_argument(
+        "--split-by-date",
+        action="store_true",
+        default=split_by_date_default(),
+        help="The upload step writes one object per calendar date (upload_to_s3 --split-by-date).",
+    )
     args = parser.parse_args()
     data = Path(args.data_dir) if args.data_dir else data_drop_dir()
-    summary = detect_files(data_dir=data, check_pg=args.check_postgres)
+    summary = detect_files(
+        data_dir=data,
+        check_pg=args.check_postgres,
+        verify=args.verify,
+        fast_hash=args.fast_hash,
+        list_remote=not args.head_only,
+        lake_format=args.format,
+        compression=args.compression,
+        split=args.split_by_date,
+    )
     if args.json:
         print(json.dumps(summary, indent=2))
     else:
         log.info(
-            "candidates=%s pending_s3=%s pending_pg=%s errors=%s",
+            "candidates=%s pending_s3=%s pending_pg=%s errors=%s s3_requests=%s",
             summary["candidates"],
             summary["pending_s3_upload"],
             summary["pending_postgres"],
             summary["errors"],
+            summary["s3_requests"],
         )
     return 1 if summary["errors"] else 0
 
@@ -0,0 +1,513 @@
+"""Pipelined ingestion: hash, upload, parse and write drop files as concurrent stages joined by bounded queues.
+
+detect -> upload_to_s3 -> load_s3_to_staging each touch every file before the next starts. Here a
+file flows through the stages on its own, so it can be committed to staging while later files
+are still hashing or uploading, and a full queue stalls the stages feeding it (backpressure).
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable
+
+_REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(_REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(_REPO_ROOT))
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from ingestion import db
+from ingestion.bulk_load import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_LOADER,
+    LOADERS,
+    default_batch_size,
+    default_loader,
+    rows_per_second,
+    write_frame,
+)
+from ingestion.compression import COMPRESSIONS, DEFAULT_COMPRESSION, default_compression
+from ingestion.config import data_drop_dir, get_logger
+from ingestion.csv_partition import (
+    fingerprint_file,
+    list_candidate_files,
+    partition_date_from_key,
+    remember_fingerprint,
+    split_by_date_default,
+    table_name_from_path,
+)
+from ingestion.fingerprint_cache import FingerprintCache, default_cache_path
+from ingestion.ingest import _sanitize_identifier
+from ingestion.lake_format import (
+    DEFAULT_LAKE_FORMAT,
+    LAKE_FORMATS,
+    default_lake_format,
+    format_of_key,
+    is_compacted_key,
+    keep_raw_csv_default,
+)
+from ingestion.load_s3_to_staging import (
+    DEFAULT_DOWNLOAD_WORKERS,
+    DEFAULT_MEMORY_BUDGET_MB,
+    _full_refresh_reason,
+    _load_table,
+    _prefix_for_dataset,
+    _read_object,
+    _record_bulk_manifest,
+    _with_lineage,
+)
+from ingestion.manifest import (
+    ManifestBatch,
+    ensure_compaction_table,
+    ensure_manifest_table,
+    ensure_s3_manifest_table,
+    ensure_staging_load_table,
+    get_compaction_lineage,
+    get_s3_manifest_rows_by_source,
+    get_staging_load_rows,
+    get_staging_row_total,
+    replace_staging_load_rows,
+    upsert_s3_manifest_rows,
+)
+from ingestion.partitions import SOURCE_KEY_COLUMN, ensure_partition, month_start
+from ingestion.s3io import bucket_name, download_object_bytes, ensure_bucket, get_s3_client, s3_prefix
+from ingestion.upload_to_s3 import DEFAULT_WORKERS, upload_file
+
+log = get_logger(__name__)
+
+# Files allowed to wait between two stages; bounds the parsed frames held in memory.
+DEFAULT_QUEUE_SIZE = 4
+# Ends a queue: every worker of the reading stage sees it and passes it on.
+_DONE = object()
+
+
+@dataclass
+class FileWork:
+    """One drop file as it moves through the stages."""
+
+    path: Path
+    table: str
+    # Set by upload: lake objects to stage, and objects whose staged rows must go.
+    keys: list[str] = field(default_factory=list)
+    drop_keys: list[str] = field(default_factory=list)
+    version: str = ""
+    # Set by parse: {s3_key: frame with lineage columns}.
+    frames: dict[str, pd.DataFrame] = field(default_factory=dict)
+
+
+class Stage:
+    """`workers` threads mapping `work` over inbox items into outbox, closing outbox when all finish.
+
+    work returns the item to pass on, or None to stop it here. A per-item exception is logged and
+    the file recorded in `failed`; the rest of the pipeline keeps flowing.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        work: Callable[[FileWork], FileWork | None],
+        inbox: queue.Queue,
+        outbox: queue.Queue,
+        workers: int,
+        failed: list[str],
+    ) -> None:
+        self.name = name
+        self.busy_seconds = 0.0
+        self._work = work
+        self._inbox = inbox
+        self._outbox = outbox
+        self._failed = failed
+        self._lock = threading.Lock()
+        self._running = max(1, workers)
+        self._threads = [
+            threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True) for i in range(self._running)
+        ]
+
+    def start(self) -> "Stage":
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def _run(self) -> None:
+        while True:
+            item = self._inbox.get()
+            if item is _DONE:
+                self._inbox.put(_DONE)
+                break
+            t0 = time.perf_counter()
+            try:
+                out = self._work(item)
+            except Exception as e:  # noqa: BLE001
+                log.error("%s failed for %s: %s", self.name, item.path.name, e)
+                with self._lock:
+                    self._failed.append(item.path.name)
+                out = None
+            with self._lock:
+                self.busy_seconds += time.perf_counter() - t0
+            if out is not None:
+                self._outbox.put(out)
+        with self._lock:
+            self._running -= 1
+            last = self._running == 0
+        if last:
+            self._outbox.put(_DONE)
+
+
+def _feed(inbox: queue.Queue, items: Iterable[FileWork]) -> threading.Thread:
+    def run() -> None:
+        for item in items:
+            inbox.put(item)
+        inbox.put(_DONE)
+
+    thread = threading.Thread(target=run, name="feed", daemon=True)
+    thread.start()
+    return thread
+
+
+def _drain(inbox: queue.Queue) -> Iterable[FileWork]:
+    while True:
+        item = inbox.get()
+        if item is _DONE:
+            return
+        yield item
+
+
+def _direct_write_ready(engine, schema: str, table: str) -> bool:
+    """Rows can be written per file only into a partitioned table with lineage and current column types."""
+    with engine.connect() as conn:
+        return _full_refresh_reason(conn, schema, table) is None
+
+
+def _compacted_partitions(engine, prefix: str, table: str, loaded: dict[str, dict]) -> set[str]:
+    """date= partitions holding compacted objects, which only the closing incremental pass resolves."""
+    compacted = set(get_compaction_lineage(engine, _prefix_for_dataset(prefix, table)))
+    compacted.update(k for k in loaded if is_compacted_key(k))
+    return {k.rsplit("/", 1)[0] for k in compacted}
+
+
+def write_file(conn, work: FileWork, schema: str, loader: str, batch_size: int) -> int:
+    """Replace one drop file's staged rows with work.frames inside the caller's transaction."""
+    months = {month_start(partition_date_from_key(k)) for k in work.frames}
+    for month in sorted(months):
+        ensure_partition(conn, schema, work.table, month)
+    replaced = sorted(set(work.drop_keys) | set(work.frames))
+    conn.execute(
+        text(f'DELETE FROM "{schema}"."{work.table}" WHERE "{SOURCE_KEY_COLUMN}" = ANY(:keys)'),
+        {"keys": replaced},
+    )
+    counts = {
+        key: write_frame(conn, frame, schema, work.table, loader=loader, batch_size=batch_size)
+        for key, frame in work.frames.items()
+    }
+    replace_staging_load_rows(
+        conn,
+        schema,
+        work.table,
+        [{"s3_key": k, "version": work.version, "row_count": n} for k, n in counts.items()],
+        forget_keys=replaced,
+    )
+    return sum(counts.values())
+
+
+def run_engine(
+    data_dir: Path | None = None,
+    schema: str = "staging",
+    workers: int = DEFAULT_WORKERS,
+    download_workers: int = DEFAULT_DOWNLOAD_WORKERS,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    verify: bool = False,
+    fast_hash: bool = False,
+    lake_format: str = DEFAULT_LAKE_FORMAT,
+    keep_csv: bool = False,
+    compression: str = DEFAULT_COMPRESSION,
+    split: bool = False,
+    loader: str = DEFAULT_LOADER,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    update_manifest: bool = True,
+) -> int:
+    """Hash, upload and stage every drop file in one pipelined pass, then reconcile staging with the lake.
+
+    Each file is committed to staging in its own transaction as soon as it is parsed. A closing
+    incremental load then picks up what per-file writes leave alone: objects removed from the
+    lake, partitions with compacted objects, tables not yet partitioned, and failed files.
+    """
+    schema = _sanitize_identifier(schema)
+    root = data_dir or data_drop_dir()
+    files = list_candidate_files(root)
+    if not files:
+        log.warning("No wearable CSV files found under %s", root)
+        return 0
+
+    workers = max(1, workers)
+    download_workers = max(1, download_workers)
+    queue_size = max(1, queue_size)
+    try:
+        # Upload workers look up and delete manifest rows while the writer and batch flushes run.
+        engine = db.get_engine(min_connections=workers + 2)
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except OperationalError as e:
+        log.error("Postgres required for the ingestion engine: %s", e)
+        return 1
+
+    if update_manifest:
+        ensure_manifest_table(engine)
+    ensure_s3_manifest_table(engine)
+    ensure_staging_load_table(engine)
+    ensure_compaction_table(engine)
+    client = get_s3_client(max_pool_connections=workers + download_workers + 1)
+    bucket = bucket_name()
+    ensure_bucket(client, bucket, log)
+    prefix = s3_prefix()
+
+    tables = ("daily_activity", "sleep")
+    direct = {t for t in tables if _direct_write_ready(engine, schema, t)}
+    for table in sorted(set(tables) - direct):
+        log.info("%s.%s needs a full refresh; it is loaded after the pipeline", schema, table)
+    loaded = {t: get_staging_load_rows(engine, schema, t) for t in tables}
+    compacted = {t: _compacted_partitions(engine, prefix, t, loaded[t]) for t in tables}
+    # Every object a file was stored under, keyed by source: the upload manifest prefetch per file.
+    recorded = get_s3_manifest_rows_by_source(engine, [p.name for p in files], prefix)
+    manifest_batch = ManifestBatch(engine, upsert_s3_manifest_rows)
+    cache_path = default_cache_path(root)
+    try:
+        cache: FingerprintCache | None = FingerprintCache(cache_path)
+    except sqlite3.Error as e:
+        log.warning("Fingerprint cache unavailable at %s; hashing every file: %s", cache_path, e)
+        cache = None
+
+    def hash_file(work: FileWork) -> FileWork:
+        if cache is None:
+            fp = fingerprint_file(work.path, force=verify)
+        else:
+            fp = cache.fingerprint(work.path, verify=verify, use_fast_hash=fast_hash)
+            remember_fingerprint(work.path, fp)
+        work.version = fp.sha256
+        return work
+
+    def upload(work: FileWork) -> FileWork | None:
+        previous = recorded.get(work.path.name, {})
+        _, keys = upload_file(
+            work.path,
+            engine,
+            client,
+            bucket,
+            prefix,
+            previous,
+            manifest_batch,
+            lake_format,
+            keep_csv,
+            compression,
+            split,
+            previous,
+        )
+        if work.table not in direct:
+            return None
+        # A CSV kept beside its Parquet conversion is never staged; superseded objects are gone.
+        work.keys = [k for k in keys if format_of_key(k) == lake_format]
+        work.drop_keys = sorted((set(previous) | set(keys)) - set(work.keys))
+        return work
+
+    def parse(work: FileWork) -> FileWork | None:
+        staged = loaded[work.table]
+        if any(k.rsplit("/", 1)[0] in compacted[work.table] for k in work.keys):
+            return None
+        stale = [k for k in work.drop_keys if k in staged]
+        if not stale and all(staged.get(k, {}).get("version") == work.version for k in work.keys):
+            return None
+        for key in work.keys:
+            work.frames[key] = _with_lineage(_read_object(key, download_object_bytes(client, bucket, key)), key)
+        return work
+
+    failed: list[str] = []
+    hashed: queue.Queue = queue.Queue(maxsize=queue_size)
+    uploaded: queue.Queue = queue.Queue(maxsize=queue_size)
+    parsed: queue.Queue = queue.Queue(maxsize=queue_size)
+    inbox: queue.Queue = queue.Queue(maxsize=queue_size)
+
+    t0 = time.perf_counter()
+    staged_files = staged_rows = 0
+    write_seconds = 0.0
+    stages: list[Stage] = []
+    try:
+        _feed(inbox, [FileWork(p, table_name_from_path(p)) for p in files])
+        stages = [
+            Stage("hash", hash_file, inbox, hashed, workers, failed).start(),
+            Stage("upload", upload, hashed, uploaded, workers, failed).start(),
+            Stage("parse", parse, uploaded, parsed, download_workers, failed).start(),
+        ]
+        # One writer: each file is its own short transaction, in the order files finish parsing.
+        for work in _drain(parsed):
+            w0 = time.perf_counter()
+            try:
+                with engine.begin() as conn:
+                    rows = write_file(conn, work, schema, loader, batch_size)
+            except Exception as e:  # noqa: BLE001
+                log.error("write failed for %s: %s", work.path.name, e)
+                failed.append(work.path.name)
+                continue
+            finally:
+                write_seconds += time.perf_counter() - w0
+            staged_files += 1
+            staged_rows += rows
+            log.info("Staged %s rows from %s into %s.%s", rows, work.path.name, schema, work.table)
+    finally:
+        if cache is not None:
+            cache.close()
+        manifest_batch.flush()
+    pipeline_seconds = time.perf_counter() - t0
+    busy = {s.name: s.busy_seconds for s in stages}
+    busy["write"] = write_seconds
+    log.info(
+        "Pipeline staged %s rows from %s of %s files in %.2fs (%.0f rows/s, %s failed); "
+        "stage busy seconds: %s (format=%s, compression=%s, split=%s)",
+        staged_rows,
+        staged_files,
+        len(files),
+        pipeline_seconds,
+        rows_per_second(staged_rows, pipeline_seconds),
+        len(failed),
+        ", ".join(f"{name} {seconds:.2f}" for name, seconds in busy.items()),
+        lake_format,
+        compression,
+        split,
+    )
+
+    # Reconcile: a no-op listing per table unless the pipeline left something for it. The bulk
+    # manifest row is recorded here, since the load skips it when per-file writes staged everything.
+    for table in tables:
+        _load_table(
+            engine,
+            client,
+            bucket,
+            prefix,
+            schema,
+            table,
+            False,
+            loader,
+            batch_size,
+            True,
+            DEFAULT_MEMORY_BUDGET_MB * 1024 * 1024,
+            download_workers,
+            False,
+        )
+        if update_manifest:
+            staged = sorted(get_staging_load_rows(engine, schema, table))
+            _record_bulk_manifest(engine, table, staged, get_staging_row_total(engine, schema, table))
+    log.info("Engine run complete in %.2fs", time.perf_counter() - t0)
+    if failed:
+        log.error("Failed files: %s", sorted(set(failed)))
+        return 1
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Hash, upload and stage CSV drops as one pipelined pass (bounded queues between stages)."
+    )
+    parser.add_argument("--data-dir", default=None, help="Override DATA_DROP_DIR")
+    parser.add_argument(
+        "--schema",
+        default=os.getenv("STAGING_SCHEMA", "staging"),
+        help="Postgres schema for landed tables (default staging).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("UPLOAD_WORKERS") or DEFAULT_WORKERS),
+        help="Threads in each of the hash and upload stages.",
+    )
+    parser.add_argument(
+        "--download-workers",
+        type=int,
+        default=int(os.getenv("LOAD_DOWNLOAD_WORKERS") or DEFAULT_DOWNLOAD_WORKERS),
+        help="Threads downloading and parsing uploaded objects for the writer.",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=int(os.getenv("ENGINE_QUEUE_SIZE") or DEFAULT_QUEUE_SIZE),
+        help="Files allowed to wait between two stages before the upstream stage blocks.",
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Ignore the fingerprint cache and re-hash every candidate.",
+    )
+    parser.add_argument(
+        "--fast-hash",
+        action="store_true",
+        help="When a file's stat changed, reuse its cached fingerprint if a whole-file BLAKE2b still matches.",
+    )
+    parser.add_argument(
+        "--format",
+        default=default_lake_format(),
+        choices=LAKE_FORMATS,
+        help="Lake object format: csv as dropped (default) or typed Parquet converted on upload.",
+    )
+    parser.add_argument(
+        "--keep-csv",
+        action="store_true",
+        default=keep_raw_csv_default(),
+        help="With --format parquet, also upload the raw CSV beside each Parquet object for audit.",
+    )
+    parser.add_argument(
+        "--compression",
+        default=default_compression(),
+        choices=COMPRESSIONS,
+        help="Content encoding for CSV objects (Parquet is compressed internally).",
+    )
+    parser.add_argument(
+        "--split-by-date",
+        action="store_true",
+        default=split_by_date_default(),
+        help="Write one object per calendar date in each file instead of filing it under its earliest date.",
+    )
+    parser.add_argument(
+        "--loader",
+        default=default_loader(),
+        choices=LOADERS,
+        help="copy: COPY FROM STDIN bulk load (default); insert: DataFrame.to_sql INSERTs.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=default_batch_size(),
+        help="Rows per COPY batch / INSERT chunk.",
+    )
+    parser.add_argument(
+        "--no-manifest",
+        action="store_true",
+        help="Do not update ops.raw_ingest_manifest bulk rows.",
+    )
+    args = parser.parse_args()
+    return run_engine(
+        data_dir=Path(args.data_dir) if args.data_dir else data_drop_dir(),
+        schema=args.schema,
+        workers=args.workers,
+        download_workers=args.download_workers,
+        queue_size=args.queue_size,
+        verify=args.verify,
+        fast_hash=args.fast_hash,
+        lake_format=args.format,
+        keep_csv=args.keep_csv,
+        compression=args.compression,
+        split=args.split_by_date,
+        loader=args.loader,
+        batch_size=args.batch_size,
+        update_manifest=not args.no_manifest,
+    )
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
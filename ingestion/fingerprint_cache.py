@@ -0,0 +1,190 @@
+"""Persistent stat-keyed cache of drop-file fingerprints (one SQLite file per data dir, in the user cache dir)."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+
+from ingestion.config import get_logger
+from ingestion.csv_partition import FileFingerprint, fingerprint_file, remember_fingerprint
+
+log = get_logger(__name__)
+
+# Read size for the fast-hash tier.
+_FAST_HASH_CHUNK = 1024 * 1024
+# Bump when the fingerprints table changes; older cache files are discarded and rebuilt.
+_SCHEMA_VERSION = 3
+
+DDL_FINGERPRINTS = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    path              TEXT PRIMARY KEY,
+    inode             INTEGER NOT NULL,
+    size              INTEGER NOT NULL,
+    mtime_ns          INTEGER NOT NULL,
+    fast_hash         TEXT,
+    sha256            TEXT NOT NULL,
+    md5               TEXT NOT NULL,
+    table_name        TEXT,
+    row_count         INTEGER,
+    date_column_found INTEGER NOT NULL,
+    min_date          TEXT,
+    max_date          TEXT
+)
+"""
+
+
+def default_cache_path(data_dir: Path) -> Path:
+    """FINGERPRINT_CACHE_PATH, else <name>-<path digest>.fingerprints.sqlite under $XDG_CACHE_HOME/wearable-ingest.
+
+    Never inside the checkout; the digest keeps two data dirs of the same name apart.
+    """
+    override = (os.getenv("FINGERPRINT_CACHE_PATH") or "").strip()
+    if override:
+        return Path(override)
+    data_dir = data_dir.resolve()
+    cache_home = (os.getenv("XDG_CACHE_HOME") or "").strip()
+    base = Path(cache_home) if cache_home else Path.home() / ".cache"
+    digest = hashlib.sha256(str(data_dir).encode()).hexdigest()[:12]
+    return base / "wearable-ingest" / f"{data_dir.name}-{digest}.fingerprints.sqlite"
+
+
+def fast_hash(path: Path) -> str:
+    """BLAKE2b of the whole file: one pass, no MD5, CSV parsing or date scan as a full fingerprint needs."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(_FAST_HASH_CHUNK):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class FingerprintCache:
+    """Maps (path, inode, size, mtime_ns) to a known FileFingerprint so unchanged files are never re-read."""
+
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = db_path
+        try:
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            pass  # sqlite3 reports the unusable path below
+        self._conn = sqlite3.connect(str(db_path), timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            (version,) = self._conn.execute("PRAGMA user_version").fetchone()
+            if version != _SCHEMA_VERSION:
+                self._conn.execute("DROP TABLE IF EXISTS fingerprints")
+                self._conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            self._conn.execute(DDL_FINGERPRINTS)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _get(self, path: Path) -> tuple | None:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT inode, size, mtime_ns, fast_hash, sha256, md5, table_name, row_count, "
+                "date_column_found, min_date, max_date FROM fingerprints WHERE path = ?",
+                (str(path),),
+            ).fetchone()
+
+    def _put(self, path: Path, st: os.stat_result, fp: FileFingerprint, fhash: str | None) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    str(path),
+                    st.st_ino,
+                    st.st_size,
+                    st.st_mtime_ns,
+                    fhash,
+                    fp.sha256,
+                    fp.md5,
+                    fp.table,
+                    fp.row_count,
+                    int(fp.date_column_found),
+                    fp.min_date.isoformat() if fp.min_date else None,
+                    fp.max_date.isoformat() if fp.max_date else None,
+                ),
+            )
+
+    def fingerprint(self, path: Path, verify: bool = False, use_fast_hash: bool = False) -> FileFingerprint:
+        """Return path's fingerprint, re-hashing only when its stat tuple changed (or verify=True).
+
+        With use_fast_hash, a changed stat tuple first compares a whole-file BLAKE2b against the
+        cached one and reuses the cached fingerprint on a match (e.g. a touched or re-copied file);
+        any content change, wherever it is, misses and is fully re-fingerprinted.
+        """
+        path = path.resolve()
+        st = path.stat()
+        row = None if verify else self._get(path)
+        if row is not None:
+            inode, size, mtime_ns, cached_fast = row[0], row[1], row[2], row[3]
+            if (inode, size, mtime_ns) == (st.st_ino, st.st_size, st.st_mtime_ns):
+                return _row_to_fingerprint(row, st)
+            if use_fast_hash and cached_fast and size == st.st_size:
+                fhash = fast_hash(path)
+                if fhash == cached_fast:
+                    fp = _row_to_fingerprint(row, st)
+                    self._put(path, st, fp, fhash)
+                    log.debug("Fast hash unchanged; reusing SHA-256 for %s", path.name)
+                    return fp
+
+        fp = fingerprint_file(path, force=verify)
+        self._put(path, st, fp, fast_hash(path) if use_fast_hash else None)
+        return fp
+
+
+def _row_to_fingerprint(row: tuple, st: os.stat_result) -> FileFingerprint:
+    return FileFingerprint(
+        sha256=row[4],
+        md5=row[5],
+        size=st.st_size,
+        mtime_ns=st.st_mtime_ns,
+        table=row[6],
+        row_count=row[7],
+        date_column_found=bool(row[8]),
+        min_date=date.fromisoformat(row[9]) if row[9] else None,
+        max_date=date.fromisoformat(row[10]) if row[10] else None,
+    )
+
+
+def prime_fingerprints(
+    files: list[Path],
+    data_dir: Path,
+    verify: bool = False,
+    use_fast_hash: bool = False,
+    workers: int = 1,
+) -> None:
+    """Load or compute every file's fingerprint through the persistent cache into the process memo.
+
+    Later fingerprint_file / build_s3_key calls then hit the memo. Per-file errors are left for
+    the caller's own per-file handling to surface.
+    """
+    cache_path = default_cache_path(data_dir)
+    try:
+        cache = FingerprintCache(cache_path)
+    except sqlite3.Error as e:
+        log.warning("Fingerprint cache unavailable at %s; hashing every file: %s", cache_path, e)
+        return
+
+    def prime(path: Path) -> None:
+        try:
+            remember_fingerprint(path, cache.fingerprint(path, verify=verify, use_fast_hash=use_fast_hash))
+        except (OSError, ValueError) as e:
+            log.debug("Fingerprint skipped for %s: %s", path.name, e)
+
+    try:
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fingerprint") as pool:
+                list(pool.map(prime, files))
+        else:
+            for path in files:
+                prime(path)
+    finally:
+        cache.close()
+
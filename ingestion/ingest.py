@@ -6,6 +6,7 @@ import argparse
 import os
 import re
 import sys
+import time
 from pathlib import Path
 
 # Allow running as script: python ingestion/ingest.py
@@ -13,17 +14,30 @@ _REPO_ROOT = Path(__file__).resolve().parent.parent
 if str(_REPO_ROOT) not in sys.path:
     sys.path.insert(0, str(_REPO_ROOT))
 
-import pandas as pd
 from sqlalchemy import text
 from sqlalchemy.exc import OperationalError
 
 from ingestion import db
+from ingestion.csv_partition import fingerprint_file
+from ingestion.bulk_load import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_LOADER,
+    LOADERS,
+    default_batch_size,
+    default_loader,
+    rows_per_second,
+    write_frame,
+)
 from ingestion.manifest import (
+    ManifestBatch,
     ensure_manifest_table,
-    file_checksum,
     get_manifest_row,
+    get_manifest_rows,
     upsert_manifest,
+    upsert_manifest_rows,
 )
+from ingestion.schemas import read_csv
+from ingestion.table_swap import finalize_shadow, prepare_shadow, swap_in_shadow, views_to_rebuild
 
 
 def _sanitize_identifier(value: str) -> str:
@@ -55,8 +69,15 @@ def _ingest_csv(
     if_exists: str,
     use_manifest: bool,
     engine=None,
+    loader: str = DEFAULT_LOADER,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    manifest_rows: dict[str, dict] | None = None,
+    manifest_batch: ManifestBatch | None = None,
 ) -> bool:
-    """Load one CSV into raw schema. Returns True if loaded, False if skipped (manifest idempotent)."""
+    """Load one CSV into raw schema. Returns True if loaded, False if skipped (manifest idempotent).
+
+    manifest_rows: prefetched {source_filename: row}; manifest_batch: defer the manifest upsert.
+    """
     if engine is None:
         engine, dbname, host, port = _build_engine()
     else:
@@ -65,36 +86,62 @@ def _ingest_csv(
     source_filename = path.name
 
     if use_manifest:
-        ensure_manifest_table(engine)
-        checksum = file_checksum(path)
-        existing = get_manifest_row(engine, source_filename)
+        checksum = fingerprint_file(path).sha256
+        if manifest_rows is not None:
+            existing = manifest_rows.get(source_filename)
+        else:
+            ensure_manifest_table(engine)
+            existing = get_manifest_row(engine, source_filename)
         if existing and existing["checksum"] == checksum:
             print(f"Skipping '{source_filename}' (unchanged checksum {checksum[:16]}...)")
             return False
 
     print(f"Loading '{path.name}' into {schema}.{table_name} ({host}:{port}/{dbname})")
-    dataframe = pd.read_csv(path)
-
-    with engine.begin() as connection:
-        connection.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
-        if if_exists == "replace":
-            connection.execute(
-                text(f"DROP TABLE IF EXISTS {schema}.{table_name} CASCADE")
+    dataframe = read_csv(path)
+
+    t0 = time.perf_counter()
+    if if_exists == "replace":
+        # Load into a shadow table and swap it in, so readers never see a missing or partial table.
+        with engine.begin() as connection:
+            shadow = prepare_shadow(connection, schema, table_name)
+            row_count = write_frame(
+                connection, dataframe, schema, shadow, loader=loader, batch_size=batch_size
             )
-
-    dataframe.to_sql(
-        name=table_name,
-        con=engine,
-        schema=schema,
-        if_exists=if_exists,
-        index=False,
+            finalize_shadow(connection, schema, shadow)
+        with engine.begin() as connection:
+            swap_in_shadow(
+                connection, schema, table_name, shadow, drop_views=views_to_rebuild(connection, schema, table_name)
+            )
+    else:
+        with engine.begin() as connection:
+            connection.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+            row_count = write_frame(
+                connection,
+                dataframe,
+                schema,
+                table_name,
+                loader=loader,
+                batch_size=batch_size,
+                if_exists=if_exists,
+            )
+    elapsed = time.perf_counter() - t0
+    print(
+        f"Loaded {row_count} rows into {schema}.{table_name} "
+        f"in {elapsed:.2f}s ({rows_per_second(row_count, elapsed):.0f} rows/s, loader={loader})"
     )
-    row_count = len(dataframe)
-    print(f"Loaded {row_count} rows into {schema}.{table_name}")
 
     if use_manifest:
-        checksum = file_checksum(path)
-        upsert_manifest(engine, source_filename, checksum, row_count, "success")
+        if manifest_batch is not None:
+            manifest_batch.add(
+                {
+                    "source_filename": source_filename,
+                    "checksum": checksum,
+                    "row_count": row_count,
+                    "status": "success",
+                }
+            )
+        else:
+            upsert_manifest(engine, source_filename, checksum, row_count, "success")
 
     return True
 
@@ -118,6 +165,18 @@ def main() -> None:
         action="store_true",
         help="Use raw_ingest_manifest for idempotency; skip files with same checksum.",
     )
+    parser.add_argument(
+        "--loader",
+        default=default_loader(),
+        choices=LOADERS,
+        help="copy: COPY FROM STDIN bulk load (default); insert: DataFrame.to_sql INSERTs.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=default_batch_size(),
+        help="Rows per COPY batch / INSERT chunk.",
+    )
     args = parser.parse_args()
 
     data_dir = Path(args.data_dir)
@@ -141,8 +200,30 @@ def main() -> None:
         )
         sys.exit(1)
 
-    for csv_path in csv_files:
-        _ingest_csv(csv_path, schema, args.if_exists, args.use_manifest, engine=engine)
+    manifest_rows = None
+    manifest_batch = None
+    if args.use_manifest:
+        ensure_manifest_table(engine)
+        manifest_rows = get_manifest_rows(engine, [p.name for p in csv_files])
+        manifest_batch = ManifestBatch(engine, upsert_manifest_rows)
+
+    try:
+        for csv_path in csv_files:
+            _ingest_csv(
+                csv_path,
+                schema,
+                args.if_exists,
+                args.use_manifest,
+                engine=engine,
+                loader=args.loader,
+                batch_size=args.batch_size,
+                manifest_rows=manifest_rows,
+                manifest_batch=manifest_batch,
+            )
+    finally:
+        # Record every file that did load, even if a later one failed.
+        if manifest_batch is not None:
+            manifest_batch.flush()
 
 
 if __name__ == "__main__":
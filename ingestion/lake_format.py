@@ -0,0 +1,98 @@
+"""Lake object formats: raw CSV as dropped, or typed Parquet converted at upload time (pyarrow)."""
+
+from __future__ import annotations
+
+import io
+import os
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+import pandas as pd
+
+from ingestion.schemas import apply_schema, read_csv
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = pq = None
+
+LAKE_FORMATS = ("csv", "parquet")
+DEFAULT_LAKE_FORMAT = "csv"
+# Rows per Parquet row group; each carries its own min/max statistics.
+PARQUET_ROW_GROUP_ROWS = 128_000
+
+_SUFFIXES = {"csv": ".csv", "parquet": ".parquet"}
+# File-name prefix of objects written by ingestion.compact.
+COMPACTED_PREFIX = "compacted-"
+
+
+def default_lake_format() -> str:
+    lake_format = (os.getenv("LAKE_FORMAT") or DEFAULT_LAKE_FORMAT).strip().lower()
+    if lake_format not in LAKE_FORMATS:
+        raise ValueError(f"Unknown LAKE_FORMAT: {lake_format}. Use csv or parquet.")
+    return lake_format
+
+
+def keep_raw_csv_default() -> bool:
+    return (os.getenv("LAKE_KEEP_CSV") or "").strip().lower() in ("1", "true", "yes")
+
+
+def object_name(filename: str, lake_format: str) -> str:
+    """Lake object name for a drop file in lake_format (data.csv -> data.parquet)."""
+    return str(Path(filename).with_suffix(_SUFFIXES[lake_format]))
+
+
+def format_of_key(key: str) -> str | None:
+    for lake_format, suffix in _SUFFIXES.items():
+        if key.lower().endswith(suffix):
+            return lake_format
+    return None
+
+
+def compacted_object_name(digest: str, lake_format: str) -> str:
+    return f"{COMPACTED_PREFIX}{digest}{_SUFFIXES[lake_format]}"
+
+
+def is_compacted_key(key: str) -> bool:
+    return key.rsplit("/", 1)[-1].startswith(COMPACTED_PREFIX)
+
+
+def _require_pyarrow() -> None:
+    if pq is None:
+        raise RuntimeError("LAKE_FORMAT=parquet requires pyarrow (pip install pyarrow).")
+
+
+def csv_to_parquet_bytes(path: Path) -> bytes:
+    """Convert a drop file to Parquet, typed by the dataset schema registry as CSV objects load.
+
+    Date columns are stored parsed; older objects holding date text are parsed again on load.
+    """
+    return frame_to_parquet_bytes(read_csv(path))
+
+
+def frame_to_parquet_bytes(df: pd.DataFrame) -> bytes:
+    _require_pyarrow()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = io.BytesIO()
+    pq.write_table(
+        table,
+        sink,
+        row_group_size=PARQUET_ROW_GROUP_ROWS,
+        compression="snappy",
+        write_statistics=True,
+    )
+    return sink.getvalue()
+
+
+def read_parquet_bytes(data: bytes) -> pd.DataFrame:
+    _require_pyarrow()
+    return apply_schema(pq.read_table(io.BytesIO(data)).to_pandas())
+
+
+def iter_parquet_frames(source: bytes | BinaryIO, rows: int) -> Iterator[pd.DataFrame]:
+    """Yield DataFrames of at most `rows` rows from Parquet bytes or a seekable file, one record batch at a time."""
+    _require_pyarrow()
+    parquet = pq.ParquetFile(io.BytesIO(source) if isinstance(source, bytes) else source)
+    for batch in parquet.iter_batches(batch_size=max(1, rows)):
+        yield apply_schema(batch.to_pandas())
@@ -1,4 +1,4 @@
-"""Download partitioned CSVs from S3 (or MinIO) and reload Postgres staging tables."""
+"""Download partitioned CSV/Parquet objects from S3 (or MinIO) and load new/changed ones into Postgres staging tables."""
 
 from __future__ import annotations
 
@@ -6,7 +6,13 @@ import argparse
 import io
 import os
 import sys
+import time
+from collections import deque
+from datetime import date
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
+from typing import Callable, Iterator, TypeVar
 
 import pandas as pd
 from sqlalchemy import text
@@ -16,21 +22,78 @@ _REPO_ROOT = Path(__file__).resolve().parent.parent
 if str(_REPO_ROOT) not in sys.path:
     sys.path.insert(0, str(_REPO_ROOT))
 
+from ingestion.bulk_load import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_LOADER,
+    LOADERS,
+    default_batch_size,
+    default_loader,
+    rows_per_second,
+    write_frame,
+)
 from ingestion.config import get_logger
-from ingestion.csv_partition import dataset_folder
+from ingestion.csv_partition import dataset_folder, partition_date_from_key
 from ingestion.ingest import _sanitize_identifier
+from ingestion.lake_format import (
+    format_of_key,
+    is_compacted_key,
+    iter_parquet_frames,
+    object_name,
+    read_parquet_bytes,
+)
 from ingestion import db
-from ingestion.manifest import ensure_manifest_table, upsert_manifest
+from ingestion.manifest import (
+    ensure_compaction_table,
+    ensure_manifest_table,
+    ensure_s3_manifest_table,
+    ensure_staging_load_table,
+    get_compaction_lineage,
+    get_s3_manifest_rows,
+    get_staging_load_rows,
+    get_staging_row_total,
+    replace_staging_load_rows,
+    upsert_manifest,
+)
+from ingestion.partitions import (
+    PARTITION_COLUMN,
+    SOURCE_KEY_COLUMN,
+    build_partition_shadow,
+    create_partitioned_table,
+    ensure_indexes,
+    ensure_partition,
+    index_columns,
+    is_partitioned,
+    month_start,
+    swap_partition,
+)
+from ingestion.schemas import apply_schema, read_csv, stale_staging_columns
 from ingestion.s3io import (
     bucket_name,
     download_object_bytes,
     get_s3_client,
-    iter_objects_under,
+    list_object_index,
+    open_object_stream,
     s3_prefix,
+    spool_object,
+)
+from ingestion.table_swap import (
+    column_types,
+    finalize_shadow,
+    prepare_shadow,
+    swap_in_shadow,
+    table_exists,
+    views_to_rebuild,
 )
 
 log = get_logger(__name__)
 
+DEFAULT_MEMORY_BUDGET_MB = 256
+DEFAULT_DOWNLOAD_WORKERS = 8
+# Rows parsed from each object before its per-row footprint is known.
+_PROBE_ROWS = 1_000
+
+T = TypeVar("T")
+
 
 def _prefix_for_dataset(prefix: str, table: str) -> str:
     base = prefix.strip("/")
@@ -45,10 +108,394 @@ def _checksum_for_keys_and_shape(keys: list[str], row_count: int) -> str:
     return hashlib.sha256(payload.encode()).hexdigest()
 
 
+def _has_lineage_column(conn, schema: str, table: str) -> bool:
+    return bool(
+        conn.execute(
+            text(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_schema = :s AND table_name = :t AND column_name = :c"
+            ),
+            {"s": schema, "t": table, "c": SOURCE_KEY_COLUMN},
+        ).first()
+    )
+
+
+def _full_refresh_reason(conn, schema: str, table: str) -> str | None:
+    """Why rows cannot be replaced per object in schema.table, or None when they can."""
+    if not (_has_lineage_column(conn, schema, table) and is_partitioned(conn, schema, table)):
+        return f"not yet partitioned with a {SOURCE_KEY_COLUMN} column"
+    stale = stale_staging_columns(column_types(conn, schema, table))
+    if stale:
+        return f"typed before the dataset schema registry ({', '.join(stale)})"
+    return None
+
+
+def _list_lake_objects(client, bucket: str, pfx: str) -> dict[str, dict]:
+    """CSV and Parquet objects under pfx; a CSV kept beside its Parquet conversion is skipped."""
+    index, _ = list_object_index(client, bucket, pfx)
+    objects: dict[str, dict] = {}
+    for key, obj in index.items():
+        lake_format = format_of_key(key)
+        if lake_format is None:
+            continue
+        if lake_format == "csv" and object_name(key, "parquet") in index:
+            continue
+        try:
+            partition_date_from_key(key)
+        except ValueError:
+            log.warning("Skipping s3://%s/%s: not under a date= partition", bucket, key)
+            continue
+        objects[key] = obj
+    return objects
+
+
+def _by_month(keys: list[str]) -> dict[date, list[str]]:
+    months: dict[date, list[str]] = {}
+    for key in keys:
+        months.setdefault(month_start(partition_date_from_key(key)), []).append(key)
+    return months
+
+
+def _object_versions(engine, objects: dict[str, dict]) -> dict[str, str]:
+    """Version of each lake object: its upload-manifest checksum, else the listed ETag."""
+    uploaded = get_s3_manifest_rows(engine, list(objects))
+    return {
+        key: uploaded[key]["checksum"] if key in uploaded else f"etag:{obj['ETag']}"
+        for key, obj in objects.items()
+    }
+
+
+def _apply_compaction(versions: dict[str, str], lineage: dict[str, dict[str, str]]) -> dict[str, str]:
+    """Read each valid compacted object instead of its sources.
+
+    A compacted object is valid while every source it recorded is still listed at the same
+    version; otherwise (or with no lineage at all) it is ignored and its sources are read.
+    """
+    effective = dict(versions)
+    for key in versions:
+        if not is_compacted_key(key):
+            continue
+        sources = lineage.get(key)
+        if sources and all(versions.get(k) == v for k, v in sources.items()):
+            for source_key in sources:
+                effective.pop(source_key, None)
+        else:
+            effective.pop(key)
+    return effective
+
+
+def _plan_incremental(
+    versions: dict[str, str],
+    loaded: dict[str, dict],
+) -> tuple[list[str], list[str]]:
+    """Return (keys to load, keys whose staged rows must be deleted first).
+
+    New and changed keys are loaded; changed keys and keys gone from the lake are deleted.
+    """
+    to_load = sorted(k for k, v in versions.items() if loaded.get(k, {}).get("version") != v)
+    stale = sorted(k for k in loaded if k not in versions or k in to_load)
+    return to_load, stale
+
+
+def _iter_prefetched(
+    keys: list[str],
+    fetch: Callable[[str], T],
+    workers: int,
+) -> Iterator[tuple[str, T]]:
+    """Yield (key, fetch(key)) in key order while up to `workers` fetches run ahead of the consumer."""
+    if workers <= 1:
+        for key in keys:
+            yield key, fetch(key)
+        return
+    remaining = iter(keys)
+    pending: deque[tuple[str, Future]] = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="s3-get") as pool:
+        try:
+            for key in islice(remaining, workers):
+                pending.append((key, pool.submit(fetch, key)))
+            while pending:
+                key, future = pending.popleft()
+                result = future.result()
+                nxt = next(remaining, None)
+                if nxt is not None:
+                    pending.append((nxt, pool.submit(fetch, nxt)))
+                yield key, result
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+def _rows_within_budget(chunk: pd.DataFrame, memory_budget_bytes: int) -> int:
+    """Rows per parsed chunk so the frame (plus its COPY text buffer) stays inside the budget."""
+    if chunk.empty:
+        return _PROBE_ROWS
+    bytes_per_row = max(1, int(chunk.memory_usage(deep=True).sum()) // len(chunk))
+    return max(1, (memory_budget_bytes // 2) // bytes_per_row)
+
+
+def _iter_streamed_chunks(body, memory_budget_bytes: int) -> Iterator[pd.DataFrame]:
+    """Parse one object straight from its response body, yielding budget-sized DataFrames."""
+    try:
+        with pd.read_csv(body, iterator=True) as reader:
+            rows = _PROBE_ROWS
+            while True:
+                try:
+                    chunk = reader.get_chunk(rows)
+                except StopIteration:
+                    return
+                yield apply_schema(chunk)
+                if chunk.empty:
+                    return
+                rows = _rows_within_budget(chunk, memory_budget_bytes)
+    finally:
+        body.close()
+
+
+def _read_object(key: str, data: bytes) -> pd.DataFrame:
+    if format_of_key(key) == "parquet":
+        return read_parquet_bytes(data)
+    return read_csv(io.BytesIO(data))
+
+
+def _iter_parquet_chunks(spool, memory_budget_bytes: int) -> Iterator[pd.DataFrame]:
+    """Budget-sized DataFrames from one spooled Parquet object, sized from a probe batch."""
+    try:
+        probes = iter_parquet_frames(spool, _PROBE_ROWS)
+        probe = next(probes, None)
+        probes.close()
+        if probe is None:
+            return
+        yield from iter_parquet_frames(spool, _rows_within_budget(probe, memory_budget_bytes))
+    finally:
+        spool.close()
+
+
+def _with_lineage(df: pd.DataFrame, key: str) -> pd.DataFrame:
+    df[SOURCE_KEY_COLUMN] = key
+    df[PARTITION_COLUMN] = partition_date_from_key(key).isoformat()
+    return df
+
+
+def _download_buffered(
+    client,
+    bucket: str,
+    keys: list[str],
+    download_workers: int,
+) -> dict[str, pd.DataFrame]:
+    def fetch(key: str) -> pd.DataFrame:
+        return _read_object(key, download_object_bytes(client, bucket, key))
+
+    frames: dict[str, pd.DataFrame] = {}
+    for key, df in _iter_prefetched(keys, fetch, download_workers):
+        frames[key] = _with_lineage(df, key)
+        log.info("Downloaded %s rows from s3://%s/%s", len(df), bucket, key)
+    return frames
+
+
+def _probe_frame(client, bucket: str, key: str) -> pd.DataFrame:
+    """First rows of one object, enough to type the columns of a new staging table."""
+    if format_of_key(key) == "parquet":
+        with spool_object(client, bucket, key) as spool:
+            return _with_lineage(next(iter_parquet_frames(spool, _PROBE_ROWS)), key)
+    body = open_object_stream(client, bucket, key)
+    try:
+        return _with_lineage(apply_schema(pd.read_csv(body, nrows=_PROBE_ROWS)), key)
+    finally:
+        body.close()
+
+
+def _write_streaming(
+    conn,
+    client,
+    bucket: str,
+    keys: list[str],
+    schema: str,
+    table: str,
+    loader: str,
+    batch_size: int,
+    download_workers: int,
+    memory_budget_bytes: int,
+) -> dict[str, int]:
+    # Workers only issue the GETs; bodies are consumed here so at most `download_workers`
+    # responses are open ahead of the parser and memory stays within the budget. Parquet needs a
+    # seekable file, so those objects are spooled to a temporary file and decoded batch by batch.
+    def fetch(key: str):
+        if format_of_key(key) == "parquet":
+            return spool_object(client, bucket, key)
+        return open_object_stream(client, bucket, key)
+
+    per_key: dict[str, int] = {}
+    for key, body in _iter_prefetched(keys, fetch, download_workers):
+        object_rows = 0
+        if format_of_key(key) == "parquet":
+            chunks = _iter_parquet_chunks(body, memory_budget_bytes)
+        else:
+            chunks = _iter_streamed_chunks(body, memory_budget_bytes)
+        for chunk in chunks:
+            object_rows += write_frame(
+                conn, _with_lineage(chunk, key), schema, table, loader=loader, batch_size=batch_size
+            )
+        log.info("Streamed %s rows from s3://%s/%s", object_rows, bucket, key)
+        per_key[key] = object_rows
+    return per_key
+
+
+def _load_table(
+    engine,
+    client,
+    bucket: str,
+    prefix: str,
+    schema: str,
+    table: str,
+    update_manifest: bool,
+    loader: str,
+    batch_size: int,
+    stream: bool,
+    memory_budget_bytes: int,
+    download_workers: int,
+    full_refresh: bool,
+) -> None:
+    pfx = _prefix_for_dataset(prefix, table)
+    versions = _apply_compaction(
+        _object_versions(engine, _list_lake_objects(client, bucket, pfx)),
+        get_compaction_lineage(engine, pfx),
+    )
+    keys = sorted(versions)
+
+    if not full_refresh:
+        with engine.begin() as conn:
+            reason = _full_refresh_reason(conn, schema, table)
+            if not reason:
+                ensure_indexes(conn, schema, table, column_types(conn, schema, table))
+        if reason:
+            log.info("%s.%s is %s; doing a full refresh", schema, table, reason)
+            full_refresh = True
+    if full_refresh:
+        to_load, stale = keys, []
+    else:
+        to_load, stale = _plan_incremental(versions, get_staging_load_rows(engine, schema, table))
+        if not to_load and not stale:
+            log.info("%s.%s is up to date with s3://%s/%s (%s objects)", schema, table, bucket, pfx, len(keys))
+            return
+
+    if not keys:
+        log.warning("No CSV or Parquet objects under s3://%s/%s", bucket, pfx)
+
+    t0 = time.perf_counter()
+    frames = None
+    if to_load and not stream:
+        # Download before opening the transaction so table locks are held only for the write.
+        frames = _download_buffered(client, bucket, to_load, download_workers)
+
+    def write(conn, target: str, target_keys: list[str]) -> dict[str, int]:
+        if frames is not None:
+            combined = pd.concat([frames[k] for k in target_keys], ignore_index=True)
+            write_frame(conn, combined, schema, target, loader=loader, batch_size=batch_size)
+            return {k: len(frames[k]) for k in target_keys}
+        return _write_streaming(
+            conn,
+            client,
+            bucket,
+            target_keys,
+            schema,
+            target,
+            loader,
+            batch_size,
+            download_workers,
+            memory_budget_bytes,
+        )
+
+    per_key: dict[str, int] = {}
+    if full_refresh:
+        if to_load:
+            # Build the replacement off to the side; the live table keeps serving readers until the swap.
+            with engine.begin() as conn:
+                shadow = prepare_shadow(conn, schema, table)
+                probe = frames[to_load[0]] if frames is not None else _probe_frame(client, bucket, to_load[0])
+                create_partitioned_table(conn, probe, schema, shadow)
+                for month in _by_month(to_load):
+                    ensure_partition(conn, schema, shadow, month)
+                per_key = write(conn, shadow, to_load)
+                finalize_shadow(conn, schema, shadow, index_columns=index_columns(probe.columns))
+        with engine.begin() as conn:
+            if to_load:
+                swap_in_shadow(conn, schema, table, shadow, drop_views=views_to_rebuild(conn, schema, table))
+            elif table_exists(conn, schema, table):
+                conn.execute(text(f'DELETE FROM "{schema}"."{table}"'))
+            replace_staging_load_rows(
+                conn,
+                schema,
+                table,
+                [{"s3_key": k, "version": versions[k], "row_count": n} for k, n in per_key.items()],
+            )
+        touched_months = len(_by_month(to_load))
+    else:
+        # Rebuild only the months touched by new, changed or removed objects, each as a standalone
+        # copy of its partition, then swap them all in with DETACH/ATTACH in one short transaction.
+        load_by_month = _by_month(to_load)
+        stale_by_month = _by_month(stale)
+        shadows: dict[date, str] = {}
+        for month in sorted(set(load_by_month) | set(stale_by_month)):
+            with engine.begin() as conn:
+                shadow = build_partition_shadow(conn, schema, table, month, stale_by_month.get(month, []))
+                if month in load_by_month:
+                    per_key.update(write(conn, shadow, load_by_month[month]))
+                finalize_shadow(conn, schema, shadow, index_columns=index_columns(column_types(conn, schema, table)))
+            shadows[month] = shadow
+        with engine.begin() as conn:
+            for month, shadow in shadows.items():
+                swap_partition(conn, schema, table, month, shadow)
+            replace_staging_load_rows(
+                conn,
+                schema,
+                table,
+                [{"s3_key": k, "version": versions[k], "row_count": n} for k, n in per_key.items()],
+                forget_keys=stale,
+            )
+        touched_months = len(shadows)
+    total_rows = get_staging_row_total(engine, schema, table)
+
+    row_count = sum(per_key.values())
+    elapsed = time.perf_counter() - t0
+    log.info(
+        "Loaded %s rows from %s objects into %s.%s in %.2fs (%.0f rows/s, loader=%s, mode=%s, "
+        "replaced %s objects, %s monthly partitions rebuilt, %s rows total)",
+        row_count,
+        len(per_key),
+        schema,
+        table,
+        elapsed,
+        rows_per_second(row_count, elapsed),
+        loader,
+        "full-refresh" if full_refresh else "incremental",
+        len(stale),
+        touched_months,
+        total_rows,
+    )
+
+    if update_manifest:
+        _record_bulk_manifest(engine, table, keys, total_rows)
+
+
+def _record_bulk_manifest(engine, table: str, keys: list[str], total_rows: int) -> None:
+    """Upsert the s3_bulk::<table> row of ops.raw_ingest_manifest for the objects now staged."""
+    if keys:
+        chk = _checksum_for_keys_and_shape(keys, total_rows)
+        upsert_manifest(engine, f"s3_bulk::{table}", chk, total_rows, "success")
+
+
 def load_staging(
     schema: str = "staging",
     update_manifest: bool = True,
+    loader: str = DEFAULT_LOADER,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    stream: bool = False,
+    memory_budget_mb: int = DEFAULT_MEMORY_BUDGET_MB,
+    download_workers: int = DEFAULT_DOWNLOAD_WORKERS,
+    parallel_datasets: bool = False,
+    full_refresh: bool = False,
 ) -> int:
+    """Load lake objects into staging; only new/changed objects unless full_refresh (or no lineage yet)."""
     schema = _sanitize_identifier(schema)
     try:
         engine = db.get_engine()
@@ -58,53 +505,45 @@ def load_staging(
         log.error("Cannot connect to Postgres: %s", e)
         return 1
 
-    client = get_s3_client()
+    download_workers = max(1, download_workers)
+    tables = ("daily_activity", "sleep")
+    client = get_s3_client(
+        max_pool_connections=download_workers * (len(tables) if parallel_datasets else 1) + 1
+    )
     bucket = bucket_name()
     prefix = s3_prefix()
 
     if update_manifest:
         ensure_manifest_table(engine)
+    ensure_s3_manifest_table(engine)
+    ensure_staging_load_table(engine)
+    ensure_compaction_table(engine)
 
-    for table in ("daily_activity", "sleep"):
-        pfx = _prefix_for_dataset(prefix, table)
-        dfs: list[pd.DataFrame] = []
-        keys: list[str] = []
-        for obj in iter_objects_under(client, bucket, pfx):
-            key = obj["Key"]
-            if not key.lower().endswith(".csv"):
-                continue
-            raw = download_object_bytes(client, bucket, key)
-            df = pd.read_csv(io.BytesIO(raw))
-            dfs.append(df)
-            keys.append(key)
-            log.info("Downloaded %s rows from s3://%s/%s", len(df), bucket, key)
-
-        if not dfs:
-            log.warning("No CSV objects under s3://%s/%s", bucket, pfx)
-            with engine.begin() as conn:
-                conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{schema}"'))
-                conn.execute(text(f'DROP TABLE IF EXISTS "{schema}"."{table}" CASCADE'))
-            continue
-
-        combined = pd.concat(dfs, ignore_index=True)
-        with engine.begin() as conn:
-            conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{schema}"'))
-            conn.execute(text(f'DROP TABLE IF EXISTS "{schema}"."{table}" CASCADE'))
-
-        combined.to_sql(
-            name=table,
-            con=engine,
-            schema=schema,
-            if_exists="append",
-            index=False,
+    def load(table: str) -> None:
+        _load_table(
+            engine,
+            client,
+            bucket,
+            prefix,
+            schema,
+            table,
+            update_manifest,
+            loader,
+            batch_size,
+            stream,
+            memory_budget_mb * 1024 * 1024,
+            download_workers,
+            full_refresh,
         )
-        row_count = len(combined)
-        log.info("Loaded %s rows into %s.%s", row_count, schema, table)
 
-        if update_manifest:
-            pseudo_name = f"s3_bulk::{table}"
-            chk = _checksum_for_keys_and_shape(keys, row_count)
-            upsert_manifest(engine, pseudo_name, chk, row_count, "success")
+    if parallel_datasets:
+        # daily_activity and sleep land in independent tables, so their loads can overlap.
+        with ThreadPoolExecutor(max_workers=len(tables), thread_name_prefix="dataset") as pool:
+            for future in [pool.submit(load, table) for table in tables]:
+                future.result()
+    else:
+        for table in tables:
+            load(table)
 
     return 0
 
@@ -121,8 +560,57 @@ def main() -> int:
         action="store_true",
         help="Do not update ops.raw_ingest_manifest bulk rows.",
     )
+    parser.add_argument(
+        "--loader",
+        default=default_loader(),
+        choices=LOADERS,
+        help="copy: COPY FROM STDIN bulk load (default); insert: DataFrame.to_sql INSERTs.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=default_batch_size(),
+        help="Rows per COPY batch / INSERT chunk.",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Parse each object from its response body in chunks and write as it goes (bounded memory).",
+    )
+    parser.add_argument(
+        "--memory-budget-mb",
+        type=int,
+        default=int(os.getenv("LOAD_MEMORY_BUDGET_MB") or DEFAULT_MEMORY_BUDGET_MB),
+        help="Peak DataFrame memory per parsed chunk in --stream mode.",
+    )
+    parser.add_argument(
+        "--download-workers",
+        type=int,
+        default=int(os.getenv("LOAD_DOWNLOAD_WORKERS") or DEFAULT_DOWNLOAD_WORKERS),
+        help="Concurrent S3 GETs per dataset; rows are still written in key order.",
+    )
+    parser.add_argument(
+        "--parallel-datasets",
+        action="store_true",
+        help="Load daily_activity and sleep concurrently (independent tables).",
+    )
+    parser.add_argument(
+        "--full-refresh",
+        action="store_true",
+        help="Drop and reload every staging table from all lake objects instead of only new/changed ones.",
+    )
     args = parser.parse_args()
-    return load_staging(schema=args.schema, update_manifest=not args.no_manifest)
+    return load_staging(
+        schema=args.schema,
+        update_manifest=not args.no_manifest,
+        loader=args.loader,
+        batch_size=args.batch_size,
+        stream=args.stream,
+        memory_budget_mb=args.memory_budget_mb,
+        download_workers=args.download_workers,
+        parallel_datasets=args.parallel_datasets,
+        full_refresh=args.full_refresh,
+    )
 
 
 if __name__ == "__main__":
@@ -3,7 +3,9 @@
 from __future__ import annotations
 
 import hashlib
+import threading
 from pathlib import Path
+from typing import Callable
 
 from sqlalchemy import text
 from sqlalchemy.engine import Engine
@@ -11,6 +13,8 @@ from sqlalchemy.engine import Engine
 OPS_SCHEMA = "ops"
 MANIFEST_TABLE = "raw_ingest_manifest"
 S3_MANIFEST_TABLE = "s3_upload_manifest"
+STAGING_LOAD_TABLE = "staging_load_state"
+COMPACTION_TABLE = "lake_compaction"
 
 DDL_RAW_INGEST_MANIFEST = f"""
 CREATE SCHEMA IF NOT EXISTS {OPS_SCHEMA};
@@ -37,48 +41,131 @@ CREATE TABLE IF NOT EXISTS {OPS_SCHEMA}.{S3_MANIFEST_TABLE} (
 );
 """
 
+DDL_STAGING_LOAD_STATE = f"""
+CREATE SCHEMA IF NOT EXISTS {OPS_SCHEMA};
+CREATE TABLE IF NOT EXISTS {OPS_SCHEMA}.{STAGING_LOAD_TABLE} (
+    schema_name TEXT NOT NULL,
+    s3_key      TEXT NOT NULL,
+    table_name  TEXT NOT NULL,
+    version     TEXT NOT NULL,
+    row_count   INTEGER NOT NULL,
+    loaded_at   TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (schema_name, s3_key)
+);
+-- State recorded before it was kept per schema belongs to the default staging schema.
+ALTER TABLE {OPS_SCHEMA}.{STAGING_LOAD_TABLE} ADD COLUMN IF NOT EXISTS schema_name TEXT NOT NULL DEFAULT 'staging';
+ALTER TABLE {OPS_SCHEMA}.{STAGING_LOAD_TABLE} ALTER COLUMN schema_name DROP DEFAULT;
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+        WHERE i.indrelid = '{OPS_SCHEMA}.{STAGING_LOAD_TABLE}'::regclass
+          AND i.indisprimary
+          AND a.attname = 'schema_name'
+    ) THEN
+        ALTER TABLE {OPS_SCHEMA}.{STAGING_LOAD_TABLE} DROP CONSTRAINT {STAGING_LOAD_TABLE}_pkey;
+        ALTER TABLE {OPS_SCHEMA}.{STAGING_LOAD_TABLE} ADD PRIMARY KEY (schema_name, s3_key);
+    END IF;
+END $$;
+"""
+
+DDL_LAKE_COMPACTION = f"""
+CREATE SCHEMA IF NOT EXISTS {OPS_SCHEMA};
+CREATE TABLE IF NOT EXISTS {OPS_SCHEMA}.{COMPACTION_TABLE} (
+    compacted_key  TEXT NOT NULL,
+    source_key     TEXT NOT NULL,
+    source_version TEXT NOT NULL,
+    compacted_at   TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (compacted_key, source_key)
+);
+"""
+
 
 def ensure_s3_manifest_table(engine: Engine) -> None:
     with engine.begin() as conn:
         conn.execute(text(DDL_S3_UPLOAD_MANIFEST))
 
 
-def get_s3_manifest_row(engine: Engine, s3_key: str) -> dict | None:
+_S3_MANIFEST_COLUMNS = ("s3_key", "source_filename", "checksum", "etag", "uploaded_at", "byte_size")
+_MANIFEST_COLUMNS = ("source_filename", "checksum", "ingested_at", "row_count", "status")
+
+
+def _dedupe_last(rows: list[dict], key: str) -> list[dict]:
+    # ON CONFLICT DO UPDATE cannot touch the same row twice in one statement; last write wins.
+    return list({r[key]: r for r in rows}.values())
+
+
+def get_s3_manifest_rows(engine: Engine, s3_keys: list[str]) -> dict[str, dict]:
+    """Return {s3_key: row} for every key present in the S3 upload manifest (one query)."""
+    if not s3_keys:
+        return {}
     with engine.connect() as conn:
-        row = conn.execute(
+        rows = conn.execute(
             text(
-                f"SELECT s3_key, source_filename, checksum, etag, uploaded_at, byte_size "
-                f"FROM {OPS_SCHEMA}.{S3_MANIFEST_TABLE} WHERE s3_key = :k"
+                f"SELECT {', '.join(_S3_MANIFEST_COLUMNS)} "
+                f"FROM {OPS_SCHEMA}.{S3_MANIFEST_TABLE} WHERE s3_key = ANY(:keys)"
             ),
-            {"k": s3_key},
-        ).fetchone()
-    if row is None:
-        return None
-    return {
-        "s3_key": row[0],
-        "source_filename": row[1],
-        "checksum": row[2],
-        "etag": row[3],
-        "uploaded_at": row[4],
-        "byte_size": row[5],
-    }
+            {"keys": list(s3_keys)},
+        ).fetchall()
+    return {row[0]: dict(zip(_S3_MANIFEST_COLUMNS, row)) for row in rows}
 
 
-def upsert_s3_manifest(
+def get_s3_manifest_row(engine: Engine, s3_key: str) -> dict | None:
+    return get_s3_manifest_rows(engine, [s3_key]).get(s3_key)
+
+
+def get_s3_manifest_rows_by_source(
     engine: Engine,
-    s3_key: str,
-    source_filename: str,
-    checksum: str,
-    etag: str | None,
-    byte_size: int,
-) -> None:
+    source_filenames: list[str],
+    prefix: str = "",
+) -> dict[str, dict[str, dict]]:
+    """Return {source_filename: {s3_key: row}}: every lake object recorded for each drop file under prefix."""
+    if not source_filenames:
+        return {}
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text(
+                f"SELECT {', '.join(_S3_MANIFEST_COLUMNS)} "
+                f"FROM {OPS_SCHEMA}.{S3_MANIFEST_TABLE} "
+                "WHERE source_filename = ANY(:names) AND starts_with(s3_key, :p)"
+            ),
+            {"names": list(source_filenames), "p": f"{prefix.strip('/')}/" if prefix.strip("/") else ""},
+        ).fetchall()
+    by_source: dict[str, dict[str, dict]] = {}
+    for row in rows:
+        by_source.setdefault(row[1], {})[row[0]] = dict(zip(_S3_MANIFEST_COLUMNS, row))
+    return by_source
+
+
+def delete_s3_manifest_rows(engine: Engine, s3_keys: list[str]) -> None:
+    if not s3_keys:
+        return
+    with engine.begin() as conn:
+        conn.execute(
+            text(f"DELETE FROM {OPS_SCHEMA}.{S3_MANIFEST_TABLE} WHERE s3_key = ANY(:keys)"),
+            {"keys": list(s3_keys)},
+        )
+
+
+def upsert_s3_manifest_rows(engine: Engine, rows: list[dict]) -> None:
+    """Upsert many S3 manifest rows (keys: s3_key, source_filename, checksum, etag, byte_size) in one transaction."""
+    rows = _dedupe_last(rows, "s3_key")
+    if not rows:
+        return
     with engine.begin() as conn:
         conn.execute(
             text(
                 f"""
                 INSERT INTO {OPS_SCHEMA}.{S3_MANIFEST_TABLE}
                     (s3_key, source_filename, checksum, etag, byte_size)
-                VALUES (:s3_key, :source_filename, :checksum, :etag, :byte_size)
+                SELECT * FROM unnest(
+                    CAST(:s3_key AS TEXT[]),
+                    CAST(:source_filename AS TEXT[]),
+                    CAST(:checksum AS TEXT[]),
+                    CAST(:etag AS TEXT[]),
+                    CAST(:byte_size AS BIGINT[])
+                )
                 ON CONFLICT (s3_key)
                 DO UPDATE SET
                     source_filename = EXCLUDED.source_filename,
@@ -88,14 +175,33 @@ def upsert_s3_manifest(
                     uploaded_at = now();
                 """
             ),
+            {
+                col: [r[col] for r in rows]
+                for col in ("s3_key", "source_filename", "checksum", "etag", "byte_size")
+            },
+        )
+
+
+def upsert_s3_manifest(
+    engine: Engine,
+    s3_key: str,
+    source_filename: str,
+    checksum: str,
+    etag: str | None,
+    byte_size: int,
+) -> None:
+    upsert_s3_manifest_rows(
+        engine,
+        [
             {
                 "s3_key": s3_key,
                 "source_filename": source_filename,
                 "checksum": checksum,
                 "etag": etag,
                 "byte_size": byte_size,
-            },
-        )
+            }
+        ],
+    )
 
 
 def ensure_manifest_table(engine: Engine) -> None:
@@ -113,42 +219,43 @@ def file_checksum(path: Path) -> str:
     return h.hexdigest()
 
 
-def get_manifest_row(engine: Engine, source_filename: str) -> dict | None:
-    """Return the latest manifest row for source_filename, or None."""
+def get_manifest_rows(engine: Engine, source_filenames: list[str]) -> dict[str, dict]:
+    """Return {source_filename: row} for every filename present in the manifest (one query)."""
+    if not source_filenames:
+        return {}
     with engine.connect() as conn:
-        row = conn.execute(
+        rows = conn.execute(
             text(
-                f"SELECT source_filename, checksum, ingested_at, row_count, status "
-                f"FROM {OPS_SCHEMA}.{MANIFEST_TABLE} WHERE source_filename = :fn"
+                f"SELECT {', '.join(_MANIFEST_COLUMNS)} "
+                f"FROM {OPS_SCHEMA}.{MANIFEST_TABLE} WHERE source_filename = ANY(:fns)"
             ),
-            {"fn": source_filename},
-        ).fetchone()
-    if row is None:
-        return None
-    return {
-        "source_filename": row[0],
-        "checksum": row[1],
-        "ingested_at": row[2],
-        "row_count": row[3],
-        "status": row[4],
-    }
+            {"fns": list(source_filenames)},
+        ).fetchall()
+    return {row[0]: dict(zip(_MANIFEST_COLUMNS, row)) for row in rows}
 
 
-def upsert_manifest(
-    engine: Engine,
-    source_filename: str,
-    checksum: str,
-    row_count: int,
-    status: str = "success",
-) -> None:
-    """Insert or update manifest row for this file."""
+def get_manifest_row(engine: Engine, source_filename: str) -> dict | None:
+    """Return the latest manifest row for source_filename, or None."""
+    return get_manifest_rows(engine, [source_filename]).get(source_filename)
+
+
+def upsert_manifest_rows(engine: Engine, rows: list[dict]) -> None:
+    """Upsert many manifest rows (keys: source_filename, checksum, row_count, status) in one transaction."""
+    rows = _dedupe_last(rows, "source_filename")
+    if not rows:
+        return
     with engine.begin() as conn:
         conn.execute(
             text(
                 f"""
                 INSERT INTO {OPS_SCHEMA}.{MANIFEST_TABLE}
                     (source_filename, checksum, row_count, status)
-                VALUES (:fn, :checksum, :row_count, :status)
+                SELECT * FROM unnest(
+                    CAST(:source_filename AS TEXT[]),
+                    CAST(:checksum AS TEXT[]),
+                    CAST(:row_count AS INTEGER[]),
+                    CAST(:status AS TEXT[])
+                )
                 ON CONFLICT (source_filename)
                 DO UPDATE SET
                     checksum = EXCLUDED.checksum,
@@ -158,9 +265,181 @@ def upsert_manifest(
                 """
             ),
             {
-                "fn": source_filename,
+                col: [r[col] for r in rows]
+                for col in ("source_filename", "checksum", "row_count", "status")
+            },
+        )
+
+
+def upsert_manifest(
+    engine: Engine,
+    source_filename: str,
+    checksum: str,
+    row_count: int,
+    status: str = "success",
+) -> None:
+    """Insert or update manifest row for this file."""
+    upsert_manifest_rows(
+        engine,
+        [
+            {
+                "source_filename": source_filename,
                 "checksum": checksum,
                 "row_count": row_count,
                 "status": status,
-            },
+            }
+        ],
+    )
+
+
+def ensure_staging_load_table(engine: Engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text(DDL_STAGING_LOAD_STATE))
+
+
+def get_staging_load_rows(engine: Engine, schema_name: str, table_name: str) -> dict[str, dict]:
+    """Return {s3_key: {version, row_count}} for every lake object last loaded into schema_name.table_name."""
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text(
+                f"SELECT s3_key, version, row_count FROM {OPS_SCHEMA}.{STAGING_LOAD_TABLE} "
+                "WHERE schema_name = :s AND table_name = :t"
+            ),
+            {"s": schema_name, "t": table_name},
+        ).fetchall()
+    return {row[0]: {"version": row[1], "row_count": row[2]} for row in rows}
+
+
+def get_staging_row_total(engine: Engine, schema_name: str, table_name: str) -> int:
+    """Rows currently staged in schema_name.table_name, from load state rather than a table scan."""
+    with engine.connect() as conn:
+        return conn.execute(
+            text(
+                f"SELECT coalesce(sum(row_count), 0) FROM {OPS_SCHEMA}.{STAGING_LOAD_TABLE} "
+                "WHERE schema_name = :s AND table_name = :t"
+            ),
+            {"s": schema_name, "t": table_name},
+        ).scalar_one()
+
+
+def replace_staging_load_rows(
+    conn,
+    schema_name: str,
+    table_name: str,
+    rows: list[dict],
+    forget_keys: list[str] | None = None,
+) -> None:
+    """Record objects loaded into schema_name.table_name (keys: s3_key, version, row_count) in the caller's transaction.
+
+    forget_keys=None clears every row for that table first (full refresh); otherwise only those keys.
+    """
+    if forget_keys is None:
+        conn.execute(
+            text(f"DELETE FROM {OPS_SCHEMA}.{STAGING_LOAD_TABLE} WHERE schema_name = :s AND table_name = :t"),
+            {"s": schema_name, "t": table_name},
         )
+    elif forget_keys:
+        conn.execute(
+            text(f"DELETE FROM {OPS_SCHEMA}.{STAGING_LOAD_TABLE} WHERE schema_name = :s AND s3_key = ANY(:keys)"),
+            {"s": schema_name, "keys": list(forget_keys)},
+        )
+    rows = _dedupe_last(rows, "s3_key")
+    if not rows:
+        return
+    conn.execute(
+        text(
+            f"""
+            INSERT INTO {OPS_SCHEMA}.{STAGING_LOAD_TABLE} (schema_name, s3_key, table_name, version, row_count)
+            SELECT :s, s3_key, :t, version, row_count FROM unnest(
+                CAST(:s3_key AS TEXT[]),
+                CAST(:version AS TEXT[]),
+                CAST(:row_count AS INTEGER[])
+            ) AS r(s3_key, version, row_count)
+            ON CONFLICT (schema_name, s3_key)
+            DO UPDATE SET
+                table_name = EXCLUDED.table_name,
+                version = EXCLUDED.version,
+                row_count = EXCLUDED.row_count,
+                loaded_at = now();
+            """
+        ),
+        {
+            "s": schema_name,
+            "t": table_name,
+            **{col: [r[col] for r in rows] for col in ("s3_key", "version", "row_count")},
+        },
+    )
+
+
+def ensure_compaction_table(engine: Engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text(DDL_LAKE_COMPACTION))
+
+
+def get_compaction_lineage(engine: Engine, prefix: str) -> dict[str, dict[str, str]]:
+    """Return {compacted_key: {source_key: source_version}} for compacted objects under prefix."""
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text(
+                f"SELECT compacted_key, source_key, source_version FROM {OPS_SCHEMA}.{COMPACTION_TABLE} "
+                "WHERE starts_with(compacted_key, :p)"
+            ),
+            {"p": prefix},
+        ).fetchall()
+    lineage: dict[str, dict[str, str]] = {}
+    for compacted_key, source_key, source_version in rows:
+        lineage.setdefault(compacted_key, {})[source_key] = source_version
+    return lineage
+
+
+def record_compaction(
+    conn,
+    compacted_key: str,
+    sources: dict[str, str],
+    replaces: list[str] | None = None,
+) -> None:
+    """Record compacted_key's {source_key: version} lineage, dropping that of the objects it replaces."""
+    conn.execute(
+        text(f"DELETE FROM {OPS_SCHEMA}.{COMPACTION_TABLE} WHERE compacted_key = ANY(:keys)"),
+        {"keys": [compacted_key, *(replaces or [])]},
+    )
+    conn.execute(
+        text(
+            f"""
+            INSERT INTO {OPS_SCHEMA}.{COMPACTION_TABLE} (compacted_key, source_key, source_version)
+            SELECT :c, source_key, source_version FROM unnest(
+                CAST(:source_key AS TEXT[]),
+                CAST(:source_version AS TEXT[])
+            ) AS r(source_key, source_version)
+            """
+        ),
+        {"c": compacted_key, "source_key": list(sources), "source_version": list(sources.values())},
+    )
+
+
+class ManifestBatch:
+    """Collect manifest rows (possibly from worker threads) and upsert them in batched transactions."""
+
+    def __init__(
+        self,
+        engine: Engine,
+        upsert: Callable[[Engine, list[dict]], None],
+        flush_size: int = 500,
+    ) -> None:
+        self._engine = engine
+        self._upsert = upsert
+        self._flush_size = flush_size
+        self._rows: list[dict] = []
+        self._lock = threading.Lock()
+
+    def add(self, row: dict) -> None:
+        with self._lock:
+            self._rows.append(row)
+            ready = len(self._rows) >= self._flush_size
+        if ready:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            rows, self._rows = self._rows, []
+        self._upsert(self._engine, rows)
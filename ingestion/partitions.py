@@ -0,0 +1,131 @@
+"""Monthly range-partitioned staging tables keyed on the lake partition date."""
+
+from __future__ import annotations
+
+from datetime import date
+
+import pandas as pd
+from sqlalchemy import Date, text
+
+from ingestion.schemas import date_columns, sql_dtypes
+from ingestion.table_swap import SHADOW_SUFFIX, SWAP_LOCK_TIMEOUT, rename_shadow_indexes, table_exists
+
+# Lineage column: the lake object each row was loaded from.
+SOURCE_KEY_COLUMN = "_source_key"
+# Partition key: the date=YYYY-MM-DD of the lake object each row came from.
+PARTITION_COLUMN = "_partition_date"
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def next_month(month: date) -> date:
+    return date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def is_partitioned(conn, schema: str, table: str) -> bool:
+    return bool(
+        conn.execute(
+            text(
+                "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+                "JOIN pg_namespace n ON n.oid = c.relnamespace WHERE n.nspname = :s AND c.relname = :t"
+            ),
+            {"s": schema, "t": table},
+        ).first()
+    )
+
+
+def index_columns(columns) -> tuple[str, ...]:
+    """Columns indexed on every partition: the lineage key and the dataset's own date column.
+
+    Rows are partitioned on their object's date= segment, which in whole-file mode is only the
+    file's earliest date, so filters on ActivityDate/SleepDay cannot prune and use this index.
+    """
+    return (SOURCE_KEY_COLUMN, *date_columns(columns))
+
+
+def ensure_indexes(conn, schema: str, table: str, columns) -> None:
+    """Create any index_columns() index a partitioned table predates; existing partitions get it too."""
+    for column in index_columns(columns):
+        conn.execute(
+            text(f'CREATE INDEX IF NOT EXISTS "{table}_{column}_idx" ON "{schema}"."{table}" ("{column}")')
+        )
+
+
+def create_partitioned_table(conn, df: pd.DataFrame, schema: str, table: str) -> None:
+    """Create an empty parent partitioned by month on PARTITION_COLUMN, typed from df's columns."""
+    ddl = pd.io.sql.get_schema(
+        df.head(0), table, con=conn, schema=schema, dtype={**sql_dtypes(df), PARTITION_COLUMN: Date()}
+    )
+    conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{schema}"'))
+    conn.exec_driver_sql(f'{ddl.rstrip()} PARTITION BY RANGE ("{PARTITION_COLUMN}")')
+
+
+def ensure_partition(conn, schema: str, table: str, month: date) -> str:
+    name = partition_name(table, month)
+    conn.execute(
+        text(
+            f'CREATE TABLE IF NOT EXISTS "{schema}"."{name}" PARTITION OF "{schema}"."{table}" '
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month(month):%Y-%m-%d}')"
+        )
+    )
+    return name
+
+
+def build_partition_shadow(
+    conn,
+    schema: str,
+    table: str,
+    month: date,
+    drop_source_keys: list[str],
+) -> str:
+    """Create a standalone copy of one month's partition minus rows from drop_source_keys.
+
+    The caller appends replacement rows, then swap_partition() attaches it in place of the original.
+    """
+    live = partition_name(table, month)
+    shadow = f"{live}{SHADOW_SUFFIX}"
+    conn.execute(text(f'DROP TABLE IF EXISTS "{schema}"."{shadow}"'))
+    conn.execute(
+        text(f'CREATE TABLE "{schema}"."{shadow}" (LIKE "{schema}"."{table}" INCLUDING DEFAULTS)')
+    )
+    # Matching CHECK lets ATTACH PARTITION skip its validation scan under the exclusive lock.
+    conn.execute(
+        text(
+            f'ALTER TABLE "{schema}"."{shadow}" ADD CONSTRAINT "{shadow}_range" CHECK '
+            f"(\"{PARTITION_COLUMN}\" IS NOT NULL AND \"{PARTITION_COLUMN}\" >= '{month:%Y-%m-%d}' "
+            f"AND \"{PARTITION_COLUMN}\" < '{next_month(month):%Y-%m-%d}')"
+        )
+    )
+    if table_exists(conn, schema, live):
+        conn.execute(
+            text(
+                f'INSERT INTO "{schema}"."{shadow}" SELECT * FROM "{schema}"."{live}" '
+                f'WHERE "{SOURCE_KEY_COLUMN}" IS NULL OR "{SOURCE_KEY_COLUMN}" <> ALL(:keys)'
+            ),
+            {"keys": list(drop_source_keys)},
+        )
+    return shadow
+
+
+def swap_partition(conn, schema: str, table: str, month: date, shadow: str) -> None:
+    """Detach and drop one month's partition and attach its rebuilt shadow, in the caller's transaction."""
+    live = partition_name(table, month)
+    conn.execute(text(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'"))
+    if table_exists(conn, schema, live):
+        conn.execute(text(f'ALTER TABLE "{schema}"."{table}" DETACH PARTITION "{schema}"."{live}"'))
+        conn.execute(text(f'DROP TABLE "{schema}"."{live}"'))
+    conn.execute(text(f'ALTER TABLE "{schema}"."{shadow}" RENAME TO "{live}"'))
+    conn.execute(
+        text(
+            f'ALTER TABLE "{schema}"."{table}" ATTACH PARTITION "{schema}"."{live}" '
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month(month):%Y-%m-%d}')"
+        )
+    )
+    conn.execute(text(f'ALTER TABLE "{schema}"."{live}" DROP CONSTRAINT "{shadow}_range"'))
+    rename_shadow_indexes(conn, schema, live, shadow)
@@ -0,0 +1,132 @@
+"""Flag hot mart queries the planner can only answer with a sequential scan (EXPLAIN, no index path)."""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from datetime import date
+from pathlib import Path
+
+_REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(_REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(_REPO_ROOT))
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from ingestion import db
+from ingestion.config import get_logger
+from ingestion.table_swap import table_exists
+
+log = get_logger(__name__)
+
+# How the dashboard and the incremental marts read each mart: name -> (mart, query). {schema} is
+# the dbt target schema. Only the plan's shape matters, so the parameters are fixed placeholders.
+HOT_QUERIES: dict[str, tuple[str, str]] = {
+    "dashboard date bounds": (
+        "mart_cohort_daily_deviation",
+        "select min(activity_date), max(activity_date) from {schema}.mart_cohort_daily_deviation",
+    ),
+    **{
+        f"dashboard {period} series": (
+            table,
+            f"select * from {{schema}}.{table} "
+            f"where {column} >= :start_date and {column} <= :end_date "
+            "and min_baseline_days = :min_baseline_days",
+        )
+        for period, table, column in (
+            ("daily", "mart_cohort_daily_deviation", "activity_date"),
+            ("weekly", "mart_cohort_weekly_deviation", "week_start"),
+            ("monthly", "mart_cohort_monthly_deviation", "month_start"),
+        )
+    },
+    "deviation by date range and baseline days": (
+        "user_activity_deviation",
+        "select user_id, activity_date, steps_pct_of_baseline from {schema}.user_activity_deviation "
+        "where activity_date between :start_date and :end_date and baseline_active_days >= :min_baseline_days",
+    ),
+    **{
+        f"{table} lookback window": (
+            table,
+            f"select * from {{schema}}.{table} where activity_date >= :start_date",
+        )
+        for table in ("user_daily_activity", "daily_user_summary", "mart_daily_health_metrics")
+    },
+    "user_daily_activity user-day lookup": (
+        "user_daily_activity",
+        "select * from {schema}.user_daily_activity where user_id = :user_id and activity_date = :end_date",
+    ),
+    **{
+        f"{view} date range": (
+            view,
+            f"select * from {{schema}}.{view} where {column} between :start_date and :end_date",
+        )
+        for view, column in (("stg_daily_activity", "activity_date"), ("stg_sleep", "sleep_date"))
+    },
+    "user_baseline_activity by user": (
+        "user_baseline_activity",
+        "select * from {schema}.user_baseline_activity where user_id = :user_id",
+    ),
+}
+PARAMS = {"start_date": date(2026, 1, 1), "end_date": date(2026, 1, 31), "min_baseline_days": 7, "user_id": 1}
+
+
+def _seq_scanned(plan: dict) -> list[str]:
+    """Relations read by Seq Scan nodes anywhere in an EXPLAIN (FORMAT JSON) plan tree."""
+    found = [plan["Relation Name"]] if plan.get("Node Type") == "Seq Scan" else []
+    for child in plan.get("Plans", []):
+        found.extend(_seq_scanned(child))
+    return found
+
+
+def seq_scans(conn, sql: str, params: dict | None = None) -> list[str]:
+    """Tables this query can only read sequentially.
+
+    Sequential scans are disabled for the plan, so the planner picks any usable index however small
+    the table; a Seq Scan left in the plan means no index can serve the query. Needs a transaction.
+    """
+    conn.execute(text("SET LOCAL enable_seqscan = off"))
+    plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params or {}).scalar_one()
+    return _seq_scanned(plan[0]["Plan"])
+
+
+def check_query_plans(engine, schema: str, queries: dict[str, tuple[str, str]] = HOT_QUERIES) -> dict[str, list[str]]:
+    """Hot queries whose plans still sequentially scan a table, with those tables; missing marts are skipped."""
+    flagged: dict[str, list[str]] = {}
+    with engine.connect() as conn, conn.begin() as trans:
+        for name, (table, sql) in queries.items():
+            if not table_exists(conn, schema, table):
+                log.warning("Skipping %s: %s.%s does not exist (run dbt first)", name, schema, table)
+                continue
+            tables = seq_scans(conn, sql.format(schema=schema), PARAMS)
+            if tables:
+                log.warning("%s: sequential scan on %s", name, ", ".join(sorted(set(tables))))
+                flagged[name] = tables
+            else:
+                log.info("%s: index scan", name)
+        trans.rollback()
+    return flagged
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Flag hot mart queries whose plans need a sequential scan.")
+    parser.add_argument(
+        "--schema",
+        default=os.getenv("DBT_SCHEMA") or "public",
+        help="Schema dbt builds the marts into.",
+    )
+    args = parser.parse_args()
+    try:
+        flagged = check_query_plans(db.get_engine(), args.schema)
+    except OperationalError as e:
+        log.error("Postgres required to EXPLAIN the mart queries: %s", e)
+        return 1
+    if flagged:
+        log.error("%s of %s hot queries have no index path; declare one under meta.indexes", len(flagged), len(HOT_QUERIES))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -75,6 +75,33 @@ def end_run(
         )
 
 
+def record_run(
+    engine: Engine,
+    started_at: datetime,
+    status: str,
+    error_summary: str | None = None,
+) -> str:
+    """Insert an already-finished run (e.g. from an orchestrator that tracks steps itself); return run_id."""
+    ensure_pipeline_runs_table(engine)
+    run_id = str(uuid.uuid4())
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                f"INSERT INTO {OPS_SCHEMA}.{PIPELINE_RUNS_TABLE} "
+                "(run_id, started_at, finished_at, status, error_summary) "
+                "VALUES (:run_id, :started_at, :finished_at, :status, :error_summary)"
+            ),
+            {
+                "run_id": run_id,
+                "started_at": started_at,
+                "finished_at": datetime.now(timezone.utc),
+                "status": status,
+                "error_summary": error_summary,
+            },
+        )
+    return run_id
+
+
 @contextmanager
 def tracked_run(engine: Engine) -> Generator[str, None, None]:
     """Context manager: ensure table, start run, yield run_id, then end run on exit (caller sets status)."""
@@ -3,15 +3,25 @@
 from __future__ import annotations
 
 import os
-from typing import Iterator
+import shutil
+import tempfile
+from typing import BinaryIO, Iterator
 
 import boto3
 from botocore.client import BaseClient
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+from ingestion.compression import decompress, open_decoded
 
-def get_s3_client() -> BaseClient:
+_SPOOL_CHUNK = 1024 * 1024
+
+
+def get_s3_client(max_pool_connections: int | None = None) -> BaseClient:
+    """Build a client; size max_pool_connections to the number of threads sharing it."""
     kwargs: dict = {}
+    if max_pool_connections:
+        kwargs["config"] = Config(max_pool_connections=max_pool_connections)
     endpoint = (os.getenv("S3_ENDPOINT_URL") or "").strip()
     if endpoint:
         kwargs["endpoint_url"] = endpoint
@@ -56,17 +66,30 @@ def put_object_with_checksum(
     body: bytes,
     checksum_sha256: str,
     log,
+    encoding: str | None = None,
+    source: str | None = None,
 ) -> str | None:
+    """PUT body with the uncompressed SHA-256 (and content encoding, source file, if any) in its metadata."""
+    extra: dict = {}
+    metadata = {"sha256": checksum_sha256}
+    if source:
+        metadata["source"] = source
+    if encoding and encoding != "none":
+        metadata["encoding"] = encoding
+        extra["ContentEncoding"] = encoding
     resp = client.put_object(
         Bucket=bucket,
         Key=key,
         Body=body,
-        Metadata={"sha256": checksum_sha256},
+        Metadata=metadata,
+        **extra,
     )
     etag = resp.get("ETag")
     if isinstance(etag, str):
         etag = etag.strip('"')
-    log.info("Uploaded s3://%s/%s (%s bytes, etag=%s)", bucket, key, len(body), etag)
+    log.info(
+        "Uploaded s3://%s/%s (%s bytes, encoding=%s, etag=%s)", bucket, key, len(body), encoding or "none", etag
+    )
     return etag
 
 
@@ -90,10 +113,54 @@ def iter_objects_under(
             yield obj
 
 
+def list_object_index(client: BaseClient, bucket: str, prefix: str) -> tuple[dict[str, dict], int]:
+    """Return ({key: {"Size", "ETag"}} for every object under prefix, list pages requested)."""
+    index: dict[str, dict] = {}
+    pages = 0
+    paginator = client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        pages += 1
+        for obj in page.get("Contents") or []:
+            index[obj["Key"]] = {
+                "Size": int(obj.get("Size") or 0),
+                "ETag": (obj.get("ETag") or "").strip('"'),
+            }
+    return index, pages
+
+
+def _object_encoding(resp: dict) -> str | None:
+    return (resp.get("Metadata") or {}).get("encoding")
+
+
 def download_object_bytes(client: BaseClient, bucket: str, key: str) -> bytes:
+    """Return the object's decoded bytes (compressed objects are decompressed)."""
     resp = client.get_object(Bucket=bucket, Key=key)
     body = resp["Body"]
     try:
-        return body.read()
+        return decompress(body.read(), _object_encoding(resp))
+    finally:
+        body.close()
+
+
+def open_object_stream(client: BaseClient, bucket: str, key: str):
+    """Return a stream of the object's decoded bytes; caller reads it incrementally and must close it."""
+    resp = client.get_object(Bucket=bucket, Key=key)
+    return open_decoded(resp["Body"], _object_encoding(resp))
+
+
+def spool_object(client: BaseClient, bucket: str, key: str) -> BinaryIO:
+    """Copy the object's decoded bytes to a temporary file and return it rewound; caller must close it.
+
+    For readers that need to seek (Parquet footers and row groups) without holding the object in memory.
+    """
+    body = open_object_stream(client, bucket, key)
+    spool = tempfile.TemporaryFile()
+    try:
+        shutil.copyfileobj(body, spool, _SPOOL_CHUNK)
+        spool.seek(0)
+    except BaseException:
+        spool.close()
+        raise
     finally:
         body.close()
+    return spool
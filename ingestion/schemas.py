@@ -0,0 +1,197 @@
+"""Known columns of each wearable dataset with compact dtypes, and the CSV reader that applies them.
+
+CSVs parse through pyarrow's multithreaded reader straight into these types. Without pyarrow, or
+when a file's values do not fit them, pandas parses it and known columns are cast where they can
+be. Date text is parsed once per distinct value into datetimes, so staging lands native DATE and
+INTEGER columns (typed from the same registry) and dbt never re-parses text.
+"""
+
+from __future__ import annotations
+
+import io
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy.types import BigInteger, Date, Float, Integer, TypeEngine
+
+from ingestion.config import get_logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:  # pragma: no cover
+    pa = pacsv = None
+
+log = get_logger(__name__)
+
+# Column kinds: user id (dictionary-encoded: few users, many rows), whole-number counts and
+# minutes, distances, and calendar dates (read as dictionary-encoded text, one value per day).
+_PANDAS_DTYPES = {"id": "category", "int": "Int32", "float": "float32", "date": "datetime64[ns]"}
+_SQL_TYPES: dict[str, TypeEngine] = {
+    "id": BigInteger(),
+    "int": Integer(),
+    "float": Float(precision=53),
+    "date": Date(),
+}
+# information_schema.columns.data_type of each kind in a staging table.
+STAGING_TYPE_NAMES = {"id": "bigint", "int": "integer", "float": "double precision", "date": "date"}
+_DICTIONARY_KINDS = ("id", "date")
+# Text layout of each date column in the drops; times (always midnight for SleepDay) are dropped.
+DATE_FORMATS = {"ActivityDate": "%m/%d/%Y", "SleepDay": "%m/%d/%Y %I:%M:%S %p"}
+
+DATASET_SCHEMAS: dict[str, dict[str, str]] = {
+    "daily_activity": {
+        "Id": "id",
+        "ActivityDate": "date",
+        "TotalSteps": "int",
+        "TotalDistance": "float",
+        "TrackerDistance": "float",
+        "LoggedActivitiesDistance": "float",
+        "VeryActiveDistance": "float",
+        "ModeratelyActiveDistance": "float",
+        "LightActiveDistance": "float",
+        "SedentaryActiveDistance": "float",
+        "VeryActiveMinutes": "int",
+        "FairlyActiveMinutes": "int",
+        "LightlyActiveMinutes": "int",
+        "SedentaryMinutes": "int",
+        "Calories": "int",
+    },
+    "sleep": {
+        "Id": "id",
+        "SleepDay": "date",
+        "TotalSleepRecords": "int",
+        "TotalMinutesAsleep": "int",
+        "TotalTimeInBed": "int",
+    },
+}
+# Column names do not clash across datasets, so one lookup serves every file.
+COLUMN_KINDS: dict[str, str] = {c: k for schema in DATASET_SCHEMAS.values() for c, k in schema.items()}
+
+
+def pyarrow_csv_available() -> bool:
+    return pacsv is not None
+
+
+def _arrow_type(kind: str):
+    return {"id": pa.int64(), "int": pa.int32(), "float": pa.float32(), "date": pa.string()}[kind]
+
+
+def date_columns(columns) -> list[str]:
+    """The registered calendar-date columns among `columns` (ActivityDate, SleepDay)."""
+    return [c for c in columns if COLUMN_KINDS.get(c) == "date"]
+
+
+def _fits_kind(dtype, kind: str) -> bool:
+    """Whether values held as dtype load into kind's staging type."""
+    if kind == "id":
+        if isinstance(dtype, pd.CategoricalDtype):
+            dtype = dtype.categories.dtype
+        return pd.api.types.is_integer_dtype(dtype)
+    if kind == "int":
+        return pd.api.types.is_integer_dtype(dtype) and dtype.itemsize <= 4
+    if kind == "float":
+        return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+    return pd.api.types.is_datetime64_any_dtype(dtype)
+
+
+def sql_dtypes(df: pd.DataFrame) -> dict[str, TypeEngine]:
+    """Staging column types for df's registered columns (for to_sql / get_schema).
+
+    A column apply_schema left in another dtype (its values do not fit, e.g. fractional Calories)
+    gets no entry, so to_sql infers its type from the values instead of failing on the write.
+    """
+    dtypes = {}
+    for column, dtype in df.dtypes.items():
+        kind = COLUMN_KINDS.get(column)
+        if kind is None:
+            continue
+        if _fits_kind(dtype, kind):
+            dtypes[column] = _SQL_TYPES[kind]
+        else:
+            log.warning("Staging %s as inferred from %s: values do not fit %s", column, dtype, STAGING_TYPE_NAMES[kind])
+    return dtypes
+
+
+def stale_staging_columns(column_types: dict[str, str]) -> list[str]:
+    """Registered columns of a staging table ({column: data_type}) not of their registry type."""
+    return sorted(
+        c for c, t in column_types.items() if c in COLUMN_KINDS and t != STAGING_TYPE_NAMES[COLUMN_KINDS[c]]
+    )
+
+
+def parse_date_series(values: pd.Series, column: str) -> pd.Series:
+    """Parse a date column's text with its registered format; each distinct value is parsed once.
+
+    Values that do not parse become NaT.
+    """
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object), format=DATE_FORMATS[column], errors="coerce")
+    days = pd.DatetimeIndex(parsed).normalize().take(codes, allow_fill=True, fill_value=pd.NaT)
+    return pd.Series(days, index=values.index, name=values.name)
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast registered columns to their compact dtypes in place; a column whose values do not fit keeps its dtype."""
+    for column in df.columns:
+        kind = COLUMN_KINDS.get(column)
+        if kind is None or str(df[column].dtype) == _PANDAS_DTYPES[kind]:
+            continue
+        if kind == "date":
+            if not pd.api.types.is_datetime64_any_dtype(df[column]):
+                df[column] = parse_date_series(df[column], column)
+            continue
+        try:
+            df[column] = df[column].astype(_PANDAS_DTYPES[kind])
+        except (TypeError, ValueError, OverflowError):
+            log.debug("Keeping %s as %s: values do not fit %s", column, df[column].dtype, _PANDAS_DTYPES[kind])
+    return df
+
+
+def _read_arrow(source, usecols: list[str] | None) -> pd.DataFrame:
+    convert = pacsv.ConvertOptions(
+        column_types={c: _arrow_type(k) for c, k in COLUMN_KINDS.items()},
+        strings_can_be_null=True,
+        include_columns=usecols,
+    )
+    table = pacsv.read_csv(source, read_options=pacsv.ReadOptions(use_threads=True), convert_options=convert)
+    for i, name in enumerate(table.column_names):
+        if COLUMN_KINDS.get(name) in _DICTIONARY_KINDS:
+            table = table.set_column(i, name, table.column(i).dictionary_encode())
+    return apply_schema(table.to_pandas(types_mapper={pa.int32(): pd.Int32Dtype()}.get))
+
+
+def _rewind(source) -> bool:
+    if isinstance(source, (str, Path)):
+        return True
+    if isinstance(source, io.IOBase) and source.seekable():
+        source.seek(0)
+        return True
+    return False
+
+
+def read_csv(source, usecols: list[str] | None = None) -> pd.DataFrame:
+    """Parse a whole CSV (path or binary file object) into registry dtypes.
+
+    pyarrow parses with all cores; if the file does not fit the registered types (or pyarrow is
+    missing) pandas parses it instead, provided the source can be read again.
+    """
+    if pacsv is not None:
+        try:
+            return _read_arrow(source, usecols)
+        except pa.ArrowInvalid as e:
+            if not _rewind(source):
+                raise
+            log.debug("pyarrow could not parse with the registered types (%s); using pandas", e)
+    return apply_schema(pd.read_csv(source, usecols=usecols))
+
+
+def read_column_arrow(source, column: str) -> pd.Series | None:
+    """One column of a CSV via pyarrow, in its registry dtype; None if absent.
+
+    Reads the source to the end. Raises pyarrow.ArrowInvalid (a ValueError) if it does not parse.
+    """
+    try:
+        return _read_arrow(source, [column])[column]
+    except KeyError:
+        return None
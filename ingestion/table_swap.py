@@ -0,0 +1,174 @@
+"""Shadow-table builds swapped in by rename, so readers never see a missing or half-loaded table."""
+
+from __future__ import annotations
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from ingestion.config import get_logger
+from ingestion.schemas import stale_staging_columns
+
+log = get_logger(__name__)
+
+SHADOW_SUFFIX = "__shadow"
+_RETIRED_SUFFIX = "__retired"
+# How long the swap waits for readers' locks before giving up (the live table is left untouched).
+SWAP_LOCK_TIMEOUT = "10s"
+
+
+def shadow_name(table: str) -> str:
+    return f"{table}{SHADOW_SUFFIX}"
+
+
+def _qualified(schema: str, table: str) -> str:
+    return f'"{schema}"."{table}"'
+
+
+def table_exists(conn, schema: str, table: str) -> bool:
+    return conn.execute(
+        text("SELECT to_regclass(:name) IS NOT NULL"),
+        {"name": _qualified(schema, table)},
+    ).scalar_one()
+
+
+def column_types(conn, schema: str, table: str) -> dict[str, str]:
+    """{column: information_schema data_type} of schema.table."""
+    return dict(
+        conn.execute(
+            text(
+                "SELECT column_name, data_type FROM information_schema.columns "
+                "WHERE table_schema = :s AND table_name = :t"
+            ),
+            {"s": schema, "t": table},
+        ).fetchall()
+    )
+
+
+def views_to_rebuild(conn, schema: str, table: str) -> tuple[str, ...]:
+    """dbt's stg_<table> view while schema.table still has pre-registry column types.
+
+    That view parses the old text columns and cannot be re-pointed at the retyped table, so this
+    one-time migration drops it (pass the result as swap_in_shadow's drop_views) for the next dbt
+    run to rebuild. Any other view must still fit.
+    """
+    if stale_staging_columns(column_types(conn, schema, table)):
+        return (f"stg_{table}",)
+    return ()
+
+
+def prepare_shadow(conn, schema: str, table: str) -> str:
+    """Create the schema and drop any shadow left by an earlier failed load; return the shadow name."""
+    shadow = shadow_name(table)
+    conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{schema}"'))
+    conn.execute(text(f"DROP TABLE IF EXISTS {_qualified(schema, shadow)}"))
+    return shadow
+
+
+def finalize_shadow(conn, schema: str, shadow: str, index_columns: tuple[str, ...] = ()) -> None:
+    """Index and ANALYZE the shadow so it is query-ready the moment it is swapped in."""
+    for column in index_columns:
+        conn.execute(
+            text(
+                f'CREATE INDEX IF NOT EXISTS "{shadow}_{column}_idx" '
+                f'ON {_qualified(schema, shadow)} ("{column}")'
+            )
+        )
+    conn.execute(text(f"ANALYZE {_qualified(schema, shadow)}"))
+
+
+def _dependent_views(conn, schema: str, table: str) -> list[tuple[str, str, str]]:
+    """(qualified view name, view name, definition) for views that read the table directly."""
+    rows = conn.execute(
+        text(
+            """
+            SELECT DISTINCT v.oid::regclass::text, v.relname, pg_get_viewdef(v.oid)
+            FROM pg_depend d
+            JOIN pg_rewrite r ON r.oid = d.objid
+            JOIN pg_class v ON v.oid = r.ev_class
+            WHERE d.refobjid = to_regclass(:name)
+              AND v.oid <> d.refobjid
+              AND v.relkind = 'v'
+            """
+        ),
+        {"name": _qualified(schema, table)},
+    ).fetchall()
+    return [(row[0], row[1], row[2]) for row in rows]
+
+
+def swap_in_shadow(conn, schema: str, table: str, shadow: str, drop_views: tuple[str, ...] = ()) -> None:
+    """Replace the live table with its shadow inside the caller's (short) transaction.
+
+    Views reading the live table are re-pointed with CREATE OR REPLACE VIEW, which keeps their
+    identity, so views and grants built on top of them survive the swap. A view whose body no
+    longer fits the shadow's columns fails the swap, leaving the live table as it was. Views
+    named in drop_views are dropped instead, without CASCADE, for dbt to rebuild.
+    """
+    conn.execute(text(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'"))
+    if not table_exists(conn, schema, table):
+        conn.execute(text(f'ALTER TABLE {_qualified(schema, shadow)} RENAME TO "{table}"'))
+        _rename_shadow_children(conn, schema, table, shadow)
+        return
+
+    views = []
+    for view, name, definition in _dependent_views(conn, schema, table):
+        if name in drop_views:
+            log.warning("Dropping view %s; rebuild it with dbt run", view)
+            conn.exec_driver_sql(f"DROP VIEW {view}")
+        else:
+            views.append((view, definition))
+    retired = f"{table}{_RETIRED_SUFFIX}"
+    conn.execute(text(f"DROP TABLE IF EXISTS {_qualified(schema, retired)}"))
+    conn.execute(text(f'ALTER TABLE {_qualified(schema, table)} RENAME TO "{retired}"'))
+    conn.execute(text(f'ALTER TABLE {_qualified(schema, shadow)} RENAME TO "{table}"'))
+    for view, definition in views:
+        try:
+            # Driver-level execute: view bodies may contain ':' or '%' that bind-param parsing would mangle.
+            conn.exec_driver_sql(f"CREATE OR REPLACE VIEW {view} AS {definition.rstrip().rstrip(';')}")
+        except DBAPIError as e:
+            log.error(
+                "View %s does not fit the new %s.%s; the swap is rolled back: %s",
+                view,
+                schema,
+                table,
+                str(e.orig).strip().splitlines()[0],
+            )
+            raise
+    # No CASCADE: anything still bound to the old table aborts the swap instead of being dropped.
+    conn.execute(text(f"DROP TABLE {_qualified(schema, retired)}"))
+    _rename_shadow_children(conn, schema, table, shadow)
+
+
+def _rename_shadow_children(conn, schema: str, table: str, shadow: str) -> None:
+    """Give a swapped-in table's partitions and indexes the names the live table's had."""
+    partitions = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:name)"
+        ),
+        {"name": _qualified(schema, table)},
+    ).scalars()
+    for name in list(partitions):
+        if name.startswith(shadow):
+            renamed = f"{table}{name[len(shadow):]}"
+            conn.execute(text(f'ALTER TABLE {_qualified(schema, name)} RENAME TO "{renamed}"'))
+            rename_shadow_indexes(conn, schema, renamed, shadow, prefix=table)
+    rename_shadow_indexes(conn, schema, table, shadow)
+
+
+def rename_shadow_indexes(
+    conn,
+    schema: str,
+    table: str,
+    shadow: str,
+    prefix: str | None = None,
+) -> None:
+    """Rename table's indexes named <shadow>... to <prefix or table>..."""
+    names = conn.execute(
+        text("SELECT indexname FROM pg_indexes WHERE schemaname = :s AND tablename = :t"),
+        {"s": schema, "t": table},
+    ).scalars()
+    for name in list(names):
+        if name.startswith(shadow):
+            conn.execute(
+                text(f'ALTER INDEX "{schema}"."{name}" RENAME TO "{prefix or table}{name[len(shadow):]}"')
+            )
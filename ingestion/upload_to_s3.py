@@ -1,10 +1,14 @@
-"""Upload local CSV drops to S3 with date partitioning and idempotent manifest."""
+"""Upload local CSV drops to S3 (as CSV or Parquet) with date partitioning and idempotent manifest."""
 
 from __future__ import annotations
 
 import argparse
+import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Callable
 
 _REPO_ROOT = Path(__file__).resolve().parent.parent
 if str(_REPO_ROOT) not in sys.path:
@@ -13,14 +17,38 @@ if str(_REPO_ROOT) not in sys.path:
 from sqlalchemy.exc import OperationalError
 from sqlalchemy import text
 
+from ingestion.compression import COMPRESSIONS, DEFAULT_COMPRESSION, compress, default_compression
 from ingestion.config import data_drop_dir, get_logger
-from ingestion.csv_partition import build_s3_key, list_candidate_files
+from ingestion.csv_partition import (
+    build_s3_key,
+    fingerprint_file,
+    is_split_key,
+    list_candidate_files,
+    split_by_date,
+    split_by_date_default,
+    split_s3_key,
+)
 from ingestion import db
+from ingestion.fingerprint_cache import prime_fingerprints
+from ingestion.lake_format import (
+    DEFAULT_LAKE_FORMAT,
+    LAKE_FORMATS,
+    csv_to_parquet_bytes,
+    default_lake_format,
+    format_of_key,
+    frame_to_parquet_bytes,
+    keep_raw_csv_default,
+    object_name,
+)
 from ingestion.manifest import (
+    ManifestBatch,
+    delete_s3_manifest_rows,
     ensure_s3_manifest_table,
-    file_checksum,
     get_s3_manifest_row,
+    get_s3_manifest_rows,
+    get_s3_manifest_rows_by_source,
     upsert_s3_manifest,
+    upsert_s3_manifest_rows,
 )
 from ingestion.s3io import (
     bucket_name,
@@ -33,21 +61,49 @@ from ingestion.s3io import (
 
 log = get_logger(__name__)
 
+DEFAULT_WORKERS = 8
+
+
+def _record_upload(
+    engine,
+    manifest_batch: ManifestBatch | None,
+    key: str,
+    source_filename: str,
+    checksum: str,
+    etag: str | None,
+    byte_size: int,
+) -> None:
+    if manifest_batch is None:
+        upsert_s3_manifest(engine, key, source_filename, checksum, etag, byte_size)
+        return
+    manifest_batch.add(
+        {
+            "s3_key": key,
+            "source_filename": source_filename,
+            "checksum": checksum,
+            "etag": etag,
+            "byte_size": byte_size,
+        }
+    )
 
-def upload_one(
+
+def _put_if_changed(
     path: Path,
+    key: str,
+    checksum: str,
+    read_body: Callable[[], bytes],
     engine,
     client,
     bucket: str,
-    prefix: str,
-) -> tuple[bool, str]:
-    """Returns (uploaded_or_skipped_needs_db, s3_key)."""
-    key = build_s3_key(prefix, path)
-    checksum = file_checksum(path)
-    row = get_s3_manifest_row(engine, key)
+    manifest_rows: dict[str, dict] | None,
+    manifest_batch: ManifestBatch | None,
+    encoding: str = "none",
+) -> bool:
+    """Upload read_body(), compressed with encoding, to key unless the manifest or object metadata already has checksum."""
+    row = manifest_rows.get(key) if manifest_rows is not None else get_s3_manifest_row(engine, key)
     if row and row["checksum"] == checksum:
         log.info("Skip upload (idempotent manifest): s3://%s/%s", bucket, key)
-        return False, key
+        return False
 
     head = head_object_meta(client, bucket, key)
     if head:
@@ -57,54 +113,298 @@ def upload_one(
             if isinstance(etag, str):
                 etag = etag.strip('"')
             sz = int(head.get("ContentLength") or path.stat().st_size)
-            upsert_s3_manifest(engine, key, path.name, checksum, etag, sz)
+            _record_upload(engine, manifest_batch, key, path.name, checksum, etag, sz)
             log.info("Skip upload (S3 metadata matches): s3://%s/%s", bucket, key)
-            return False, key
+            return False
+
+    body = compress(read_body(), encoding)
+    etag = put_object_with_checksum(client, bucket, key, body, checksum, log, encoding=encoding, source=path.name)
+    _record_upload(engine, manifest_batch, key, path.name, checksum, etag, len(body))
+    return True
+
+
+def lake_formats_for(lake_format: str, keep_csv: bool) -> list[str]:
+    """Object formats written per drop file: lake_format, plus the raw CSV when kept for audit."""
+    return [lake_format, "csv"] if keep_csv and lake_format != "csv" else [lake_format]
+
+
+def split_objects_current(recorded: dict[str, dict], checksum: str, formats: list[str]) -> bool:
+    """True if a drop file's recorded objects are per-date splits of this checksum in every format."""
+    return (
+        bool(recorded)
+        and all(is_split_key(k) and row["checksum"] == checksum for k, row in recorded.items())
+        and set(formats) <= {format_of_key(k) for k in recorded}
+    )
+
+
+def _retire_superseded(
+    engine,
+    client,
+    bucket: str,
+    recorded: dict[str, dict] | None,
+    current_keys: set[str],
+    checksum: str,
+) -> None:
+    """Delete objects an earlier upload of the same drop file wrote under keys no longer produced.
 
-    body = path.read_bytes()
-    etag = put_object_with_checksum(client, bucket, key, body, checksum, log)
-    upsert_s3_manifest(engine, key, path.name, checksum, etag, len(body))
-    return True, key
+    A CSV of this same content beside a current Parquet object is a keep_csv audit copy: the loader
+    never reads it, so it stays after keep_csv is turned off.
+    """
+    stale = sorted(
+        key
+        for key, row in (recorded or {}).items()
+        if key not in current_keys
+        and not (
+            format_of_key(key) == "csv"
+            and object_name(key, "parquet") in current_keys
+            and row["checksum"] == checksum
+        )
+    )
+    for key in stale:
+        client.delete_object(Bucket=bucket, Key=key)
+        log.info("Deleted superseded s3://%s/%s", bucket, key)
+    delete_s3_manifest_rows(engine, stale)
 
 
-def run_upload(data_dir: Path | None = None) -> int:
+def _split_targets(path: Path, prefix: str, formats: list[str], compression: str) -> dict[str, tuple]:
+    """{key: (read_body, encoding)} for one object per calendar date and format."""
+    targets: dict[str, tuple] = {}
+    for lake_format in formats:
+        if lake_format == "parquet":
+            for day, frame in split_by_date(path, typed=True).items():
+                targets[split_s3_key(prefix, path, day, lake_format)] = (
+                    lambda frame=frame: frame_to_parquet_bytes(frame),
+                    "none",
+                )
+        else:
+            for day, frame in split_by_date(path).items():
+                targets[split_s3_key(prefix, path, day, lake_format)] = (
+                    lambda frame=frame: frame.to_csv(index=False, lineterminator="\n").encode(),
+                    compression,
+                )
+    return targets
+
+
+def upload_file(
+    path: Path,
+    engine,
+    client,
+    bucket: str,
+    prefix: str,
+    manifest_rows: dict[str, dict] | None = None,
+    manifest_batch: ManifestBatch | None = None,
+    lake_format: str = DEFAULT_LAKE_FORMAT,
+    keep_csv: bool = False,
+    compression: str = DEFAULT_COMPRESSION,
+    split: bool = False,
+    recorded: dict[str, dict] | None = None,
+) -> tuple[bool, list[str]]:
+    """Returns (uploaded_or_skipped_needs_db, every key the drop file is now stored under).
+
+    manifest_rows: prefetched {s3_key: row}; manifest_batch: defer manifest upserts to a batched writer.
+    Every object's manifest checksum and sha256 metadata is the source CSV's SHA-256, so a Parquet
+    object is skipped exactly when its drop file is unchanged. keep_csv also uploads the raw CSV
+    beside a Parquet object, for audit. CSV bodies are compressed with `compression`; Parquet is
+    already compressed internally and is stored as written.
+
+    split writes one object per calendar date in the file instead (<stem>.<date>.<ext> under that
+    date's partition). recorded: the manifest rows already recorded for this drop file, used to
+    skip unchanged splits and to delete objects an earlier upload wrote under keys no longer produced.
+    """
+    checksum = fingerprint_file(path).sha256
+    formats = lake_formats_for(lake_format, keep_csv)
+    if split:
+        if split_objects_current(recorded or {}, checksum, formats):
+            log.info("Skip upload (idempotent manifest): %s per-date objects of %s", len(recorded), path.name)
+            return False, sorted(recorded)
+        targets = _split_targets(path, prefix, formats, compression)
+        rows = recorded or {}
+    else:
+        targets = {}
+        for object_format in formats:
+            if object_format == "parquet":
+                targets[build_s3_key(prefix, path, object_format)] = (lambda: csv_to_parquet_bytes(path), "none")
+            else:
+                targets[build_s3_key(prefix, path, object_format)] = (path.read_bytes, compression)
+        rows = manifest_rows
+
+    uploaded = False
+    for key, (read_body, encoding) in targets.items():
+        uploaded |= _put_if_changed(
+            path, key, checksum, read_body, engine, client, bucket, rows, manifest_batch, encoding
+        )
+    _retire_superseded(engine, client, bucket, recorded, set(targets), checksum)
+    return uploaded, list(targets)
+
+
+def upload_one(path: Path, *args, **kwargs) -> tuple[bool, str]:
+    """upload_file, returning the first key written (the lake_format object) for logging."""
+    uploaded, keys = upload_file(path, *args, **kwargs)
+    return uploaded, keys[0]
+
+
+def run_upload(
+    data_dir: Path | None = None,
+    workers: int = DEFAULT_WORKERS,
+    verify: bool = False,
+    fast_hash: bool = False,
+    lake_format: str = DEFAULT_LAKE_FORMAT,
+    keep_csv: bool = False,
+    compression: str = DEFAULT_COMPRESSION,
+    split: bool = False,
+) -> int:
     root = data_dir or data_drop_dir()
     files = list_candidate_files(root)
     if not files:
         log.warning("No wearable CSV files found under %s", root)
         return 0
 
+    workers = max(1, workers)
     try:
-        engine = db.get_engine()
+        # Every worker may look up or record manifest rows at the same time.
+        engine = db.get_engine(min_connections=workers + 1)
         with engine.connect() as conn:
             conn.execute(text("SELECT 1"))
     except OperationalError as e:
         log.error("Postgres required for S3 upload manifest: %s", e)
         return 1
 
+    prime_fingerprints(files, root, verify=verify, use_fast_hash=fast_hash, workers=workers)
     ensure_s3_manifest_table(engine)
-    client = get_s3_client()
+    client = get_s3_client(max_pool_connections=workers)
     bucket = bucket_name()
     ensure_bucket(client, bucket, log)
     prefix = s3_prefix()
 
+    keys: list[str] = []
+    for path in files if not split else []:
+        try:
+            keys.extend(build_s3_key(prefix, path, f) for f in lake_formats_for(lake_format, keep_csv))
+        except ValueError:
+            continue  # reported per file by upload_one
+    manifest_rows = get_s3_manifest_rows(engine, keys)
+    recorded = get_s3_manifest_rows_by_source(engine, [p.name for p in files], prefix)
+    manifest_batch = ManifestBatch(engine, upsert_s3_manifest_rows)
+
     uploaded = 0
-    for path in files:
-        did_upload, key = upload_one(path, engine, client, bucket, prefix)
-        if did_upload:
-            uploaded += 1
-        log.info("Processed %s -> s3://%s/%s", path.name, bucket, key)
+    uploaded_bytes = 0
+    failed: list[str] = []
+    t0 = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload") as pool:
+            futures = {
+                pool.submit(
+                    upload_one,
+                    path,
+                    engine,
+                    client,
+                    bucket,
+                    prefix,
+                    manifest_rows,
+                    manifest_batch,
+                    lake_format,
+                    keep_csv,
+                    compression,
+                    split,
+                    recorded.get(path.name, {}),
+                ): path
+                for path in files
+            }
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    did_upload, key = future.result()
+                except Exception as e:  # noqa: BLE001
+                    log.error("Upload failed for %s: %s", path.name, e)
+                    failed.append(path.name)
+                    continue
+                if did_upload:
+                    uploaded += 1
+                    uploaded_bytes += path.stat().st_size
+                log.info("Processed %s -> s3://%s/%s", path.name, bucket, key)
+    finally:
+        # Record every object that did upload, even if the run is cut short.
+        manifest_batch.flush()
+    elapsed = time.perf_counter() - t0
 
-    log.info("Upload complete: %s file(s) newly uploaded, %s total candidates", uploaded, len(files))
+    processed = len(files) - len(failed)
+    mb = uploaded_bytes / (1024 * 1024)
+    log.info(
+        "Upload complete: %s file(s) newly uploaded (%.2f MB), %s failed, %s total candidates "
+        "in %.2fs with %s worker(s): %.1f files/s, %.2f MB/s (format=%s, compression=%s, split=%s)",
+        uploaded,
+        mb,
+        len(failed),
+        len(files),
+        elapsed,
+        workers,
+        processed / elapsed if elapsed > 0 else float(processed),
+        mb / elapsed if elapsed > 0 else mb,
+        lake_format,
+        compression,
+        split,
+    )
+    if failed:
+        log.error("Failed uploads: %s", failed)
+        return 1
     return 0
 
 
 def main() -> int:
     parser = argparse.ArgumentParser(description="Upload CSV drops to S3 (partitioned, idempotent).")
     parser.add_argument("--data-dir", default=None, help="Override DATA_DROP_DIR")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("UPLOAD_WORKERS") or DEFAULT_WORKERS),
+        help="Files uploaded in parallel (shares one S3 client sized to match).",
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Ignore the fingerprint cache and re-hash every candidate.",
+    )
+    parser.add_argument(
+        "--fast-hash",
+        action="store_true",
+        help="When a file's stat changed, reuse its cached fingerprint if a whole-file BLAKE2b still matches.",
+    )
+    parser.add_argument(
+        "--format",
+        default=default_lake_format(),
+        choices=LAKE_FORMATS,
+        help="Lake object format: csv as dropped (default) or typed Parquet converted on upload.",
+    )
+    parser.add_argument(
+        "--keep-csv",
+        action="store_true",
+        default=keep_raw_csv_default(),
+        help="With --format parquet, also upload the raw CSV beside each Parquet object for audit.",
+    )
+    parser.add_argument(
+        "--compression",
+        default=default_compression(),
+        choices=COMPRESSIONS,
+        help="Content encoding for CSV objects (Parquet is compressed internally).",
+    )
+    parser.add_argument(
+        "--split-by-date",
+        action="store_true",
+        default=split_by_date_default(),
+        help="Write one object per calendar date in each file instead of filing it under its earliest date.",
+    )
     args = parser.parse_args()
     data = Path(args.data_dir) if args.data_dir else data_drop_dir()
-    return run_upload(data_dir=data)
+    return run_upload(
+        data_dir=data,
+        workers=args.workers,
+        verify=args.verify,
+        fast_hash=args.fast_hash,
+        lake_format=args.format,
+        keep_csv=args.keep_csv,
+        compression=args.compression,
+        split=args.split_by_date,
+    )
 
 
 if __name__ == "__main__":
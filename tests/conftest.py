@@ -30,6 +30,12 @@ def _make_engine() -> Engine:
     return create_engine(url)
 
 
+@pytest.fixture(autouse=True)
+def _fingerprint_cache_in_tmp(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Keep fingerprint caches written by code under test out of the checkout and the user's cache dir."""
+    monkeypatch.setenv("FINGERPRINT_CACHE_PATH", str(tmp_path / "fingerprints.sqlite"))
+
+
 @pytest.fixture(scope="session")
 def engine() -> Engine:
     """Postgres engine; skip if DB is not reachable."""
@@ -0,0 +1,66 @@
+"""Bulk loader: COPY and INSERT paths land identical rows."""
+
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from ingestion.bulk_load import rows_per_second, write_frame
+
+SCHEMA = "test_bulk_load"
+
+
+def _frame() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "Id": [1001, 1002, 1003],
+            "ActivityDate": ["01/20/2026", "01/21/2026", None],
+            "TotalDistance": [6.2, None, 3.5],
+            "Note": ['has "quotes", commas', "", "plain"],
+        }
+    )
+
+
+def test_rows_per_second_handles_zero_elapsed() -> None:
+    assert rows_per_second(100, 2.0) == 50.0
+    assert rows_per_second(100, 0.0) == 100.0
+
+
+@pytest.mark.parametrize("loader", ["copy", "insert"])
+def test_write_frame_round_trip(engine: "pytest.fixture", loader: str) -> None:
+    df = _frame()
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}"))
+        conn.execute(text(f"DROP TABLE IF EXISTS {SCHEMA}.frame_{loader}"))
+        written = write_frame(conn, df, SCHEMA, f"frame_{loader}", loader=loader, batch_size=2)
+    assert written == len(df)
+
+    loaded = pd.read_sql(f'SELECT * FROM {SCHEMA}.frame_{loader} ORDER BY "Id"', engine)
+    assert loaded["Id"].tolist() == [1001, 1002, 1003]
+    assert loaded["ActivityDate"].isna().tolist() == [False, False, True]
+    assert loaded["TotalDistance"].isna().tolist() == [False, True, False]
+    assert loaded["Note"].tolist() == ['has "quotes", commas', "", "plain"]
+
+
+def test_copy_and_insert_store_the_same_float32_values(engine: "pytest.fixture") -> None:
+    df = _frame().drop(columns="Note")
+    df["TotalDistance"] = df["TotalDistance"].astype("float32")
+    df.loc[1, "TotalDistance"] = 5.63
+    stored = {}
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}"))
+        for loader in ("copy", "insert"):
+            conn.execute(text(f"DROP TABLE IF EXISTS {SCHEMA}.float_{loader}"))
+            write_frame(conn, df, SCHEMA, f"float_{loader}", loader=loader)
+            stored[loader] = conn.execute(
+                text(f'SELECT "TotalDistance" FROM {SCHEMA}.float_{loader} ORDER BY "Id"')
+            ).scalars().all()
+    assert stored["insert"] == stored["copy"] == [6.2, 5.63, 3.5]
+    assert df["TotalDistance"].dtype == "float32"
+
+
+def test_write_frame_rejects_unknown_loader(engine: "pytest.fixture") -> None:
+    with engine.begin() as conn:
+        with pytest.raises(ValueError):
+            write_frame(conn, _frame(), SCHEMA, "frame_bad", loader="bogus")
@@ -0,0 +1,126 @@
+"""Lake compaction helpers, and compaction followed by loads against a fake S3 client."""
+
+from __future__ import annotations
+
+import hashlib
+import io
+
+import pytest
+from sqlalchemy import text
+
+from ingestion import load_s3_to_staging
+from ingestion.compact import compact_dataset, compaction_digest, merge_csv_bodies
+from ingestion.manifest import (
+    ensure_compaction_table,
+    ensure_manifest_table,
+    ensure_s3_manifest_table,
+    ensure_staging_load_table,
+    get_staging_load_rows,
+)
+
+PREFIX = "test-compact"
+SCHEMA = "test_compact"
+TABLE = "compact_events"
+PARTITION = f"{PREFIX}/events/date=2026-01-20"
+
+
+class FakeLake:
+    """In-memory bucket with listing, GETs (counted) and ETags that change with the body."""
+
+    def __init__(self) -> None:
+        self.objects: dict[str, tuple[bytes, dict]] = {}
+        self.gets: list[str] = []
+
+    def get_paginator(self, name: str) -> "FakeLake":
+        return self
+
+    def paginate(self, Bucket: str, Prefix: str):  # noqa: N803
+        yield {
+            "Contents": [
+                {"Key": k, "Size": len(body), "ETag": f'"{hashlib.md5(body).hexdigest()}"'}
+                for k, (body, _) in sorted(self.objects.items())
+                if k.startswith(Prefix)
+            ]
+        }
+
+    def get_object(self, Bucket: str, Key: str) -> dict:  # noqa: N803
+        self.gets.append(Key)
+        body, metadata = self.objects[Key]
+        return {"Body": io.BytesIO(body), "Metadata": metadata}
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes, Metadata: dict | None = None, **kwargs) -> dict:  # noqa: N803
+        self.objects[Key] = (Body, Metadata or {})
+        return {"ETag": f'"{hashlib.md5(Body).hexdigest()}"'}
+
+    def delete_object(self, Bucket: str, Key: str) -> dict:  # noqa: N803
+        self.objects.pop(Key, None)
+        return {}
+
+
+def test_merge_csv_bodies_keeps_one_header_and_every_row() -> None:
+    merged = merge_csv_bodies([b"Id,Steps\n1,10\n", b"Id,Steps\r\n2,20", b"Id,Steps\n"])
+    assert merged == b"Id,Steps\n1,10\n2,20\n"
+
+
+def test_merge_csv_bodies_rejects_mismatched_headers() -> None:
+    with pytest.raises(ValueError, match="header mismatch"):
+        merge_csv_bodies([b"Id,Steps\n1,10\n", b"Id,Calories\n2,2000\n"])
+
+
+def test_compaction_digest_depends_on_sources_and_versions_only() -> None:
+    a = {"raw/x/date=2026-01-01/a.csv": "v1", "raw/x/date=2026-01-01/b.csv": "v2"}
+    assert compaction_digest(a) == compaction_digest(dict(reversed(list(a.items()))))
+    assert compaction_digest(a) != compaction_digest({**a, "raw/x/date=2026-01-01/b.csv": "v3"})
+
+
+def test_loads_read_compacted_objects_until_a_source_changes(
+    engine: "pytest.fixture", monkeypatch: pytest.MonkeyPatch
+) -> None:
+    for ensure in (ensure_manifest_table, ensure_s3_manifest_table, ensure_staging_load_table, ensure_compaction_table):
+        ensure(engine)
+    monkeypatch.setattr(load_s3_to_staging, "dataset_folder", lambda table: "events")
+    lake = FakeLake()
+    sources = [f"{PARTITION}/{name}.csv" for name in "abc"]
+    for i, key in enumerate(sources):
+        lake.put_object("bucket", key, f"Id,ActivityDate,TotalSteps\n{i},01/20/2026,{100 * i}\n".encode())
+
+    def compact() -> dict[str, int]:
+        return compact_dataset(engine, lake, "bucket", PREFIX, TABLE, 2, "csv", "none", 2)
+
+    def load() -> tuple[list[str], list[tuple]]:
+        lake.gets.clear()
+        load_s3_to_staging._load_table(
+            engine, lake, "bucket", PREFIX, SCHEMA, TABLE, False, "copy", 1000, False, 1 << 20, 2, False
+        )
+        with engine.connect() as conn:
+            rows = conn.execute(text(f'SELECT "Id", "TotalSteps" FROM {SCHEMA}.{TABLE} ORDER BY 1')).fetchall()
+        assert sorted(get_staging_load_rows(engine, SCHEMA, TABLE)) == sorted(lake.gets)
+        return sorted(lake.gets), rows
+
+    def compacted_keys() -> list[str]:
+        return [k for k in lake.objects if k not in sources]
+
+    def cleanup() -> None:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            conn.execute(text("DELETE FROM ops.staging_load_state WHERE table_name = :t"), {"t": TABLE})
+            conn.execute(text("DELETE FROM ops.lake_compaction WHERE starts_with(compacted_key, :p)"), {"p": PREFIX})
+
+    cleanup()
+    try:
+        assert compact()["compacted"] == 1
+        first = compacted_keys()
+        assert load() == (first, [(0, 0), (1, 100), (2, 200)])
+
+        # An edited source invalidates the compacted object: the next load reads the originals.
+        lake.put_object("bucket", sources[1], b"Id,ActivityDate,TotalSteps\n1,01/20/2026,150\n")
+        assert load() == (sources, [(0, 0), (1, 150), (2, 200)])
+
+        # Recompaction replaces the stale compacted object and loads read it again.
+        assert compact()["compacted"] == 1
+        second = compacted_keys()
+        assert len(second) == 1 and second != first
+        assert load() == (second, [(0, 0), (1, 150), (2, 200)])
+        assert compact() == {"compacted": 0, "up_to_date": 1, "skipped": 0, "source_objects": 0}
+    finally:
+        cleanup()
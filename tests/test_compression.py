@@ -0,0 +1,47 @@
+"""Lake object content encodings."""
+
+from __future__ import annotations
+
+import io
+
+import pandas as pd
+import pytest
+
+from ingestion.compression import compress, decompress, open_decoded
+
+BODY = b"Id,ActivityDate,TotalSteps\n" + b"".join(
+    f"{1000 + i},01/{i % 28 + 1:02d}/2026,{8000 + i}\n".encode() for i in range(2000)
+)
+
+
+class _Source(io.BytesIO):
+    """Stands in for a StreamingBody: records whether the reader closed it."""
+
+    closed_by_reader = False
+
+    def close(self) -> None:
+        self.closed_by_reader = True
+        super().close()
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_streamed_decode_round_trips_and_closes_source(encoding: str) -> None:
+    if encoding == "zstd":
+        pytest.importorskip("zstandard")
+    packed = compress(BODY, encoding)
+    assert len(packed) < len(BODY) / 3
+    assert decompress(packed, encoding) == BODY
+
+    source = _Source(packed)
+    stream = open_decoded(source, encoding)
+    frame = pd.read_csv(stream)
+    stream.close()
+    assert len(frame) == 2000
+    assert source.closed_by_reader
+
+
+def test_unencoded_objects_pass_through() -> None:
+    assert compress(BODY, "none") == BODY
+    assert decompress(BODY, None) == BODY
+    source = io.BytesIO(BODY)
+    assert open_decoded(source, None) is source
@@ -0,0 +1,103 @@
+"""Unit tests for single-pass file fingerprinting and partition dates."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from ingestion.csv_partition import (
+    build_s3_key,
+    fingerprint_file,
+    is_split_key,
+    partition_date_for_file,
+    partition_date_from_key,
+    split_by_date,
+    split_s3_key,
+)
+from ingestion.manifest import file_checksum
+
+ACTIVITY = (
+    b"Id,ActivityDate,TotalSteps\n"
+    b"1001,01/22/2026,8450\n"
+    b"1001,01/20/2026,9000\n"
+    b"1002,not-a-date,10\n"
+    b"1002,01/25/2026,7000\n"
+)
+
+
+def test_fingerprint_matches_checksum_and_dates(tmp_path: Path) -> None:
+    path = tmp_path / "daily_activity_week.csv"
+    path.write_bytes(ACTIVITY)
+    fp = fingerprint_file(path)
+    assert fp.sha256 == file_checksum(path)
+    assert fp.md5 == hashlib.md5(ACTIVITY).hexdigest()
+    assert fp.table == "daily_activity"
+    assert fp.row_count == 4
+    assert fp.min_date == date(2026, 1, 20)
+    assert fp.max_date == date(2026, 1, 25)
+    assert partition_date_for_file(path) == "2026-01-20"
+    assert build_s3_key("raw", path) == "raw/activity/date=2026-01-20/daily_activity_week.csv"
+
+
+def test_fingerprint_memoized_until_file_changes(tmp_path: Path) -> None:
+    path = tmp_path / "sleep.csv"
+    path.write_bytes(b"Id,SleepDay\n1001,01/20/2026 12:00:00 AM\n")
+    first = fingerprint_file(path)
+    assert fingerprint_file(path) is first
+
+    path.write_bytes(b"Id,SleepDay\n1001,01/19/2026 12:00:00 AM\n1002,01/21/2026 12:00:00 AM\n")
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    second = fingerprint_file(path)
+    assert second is not first
+    assert second.sha256 == file_checksum(path)
+    assert second.row_count == 2
+    assert second.min_date == date(2026, 1, 19)
+
+
+def test_fingerprint_unclassified_file_only_hashes(tmp_path: Path) -> None:
+    path = tmp_path / "daily_user_summary.csv"
+    path.write_bytes(b"user_id,activity_date\n1001,2026-01-20\n")
+    fp = fingerprint_file(path)
+    assert fp.table is None
+    assert fp.row_count is None
+    assert fp.sha256 == file_checksum(path)
+
+
+def test_partition_date_missing_column(tmp_path: Path) -> None:
+    path = tmp_path / "daily_activity_bad.csv"
+    path.write_bytes(b"Id,Foo\n1,2\n")
+    with pytest.raises(ValueError, match="missing ActivityDate column"):
+        partition_date_for_file(path)
+
+
+def test_partition_date_from_key_round_trips_build_s3_key() -> None:
+    assert partition_date_from_key("raw/sleep/date=2026-01-20/sleep.csv") == date(2026, 1, 20)
+    with pytest.raises(ValueError):
+        partition_date_from_key("raw/sleep/sleep.csv")
+
+
+def test_split_by_date_groups_rows_per_day_verbatim(tmp_path: Path) -> None:
+    path = tmp_path / "daily_activity_week.csv"
+    path.write_bytes(ACTIVITY)
+    days = split_by_date(path)
+    assert sorted(days) == [date(2026, 1, 20), date(2026, 1, 22), date(2026, 1, 25)]
+    # The unparseable row stays with the earliest date, where whole-file mode files it.
+    assert days[date(2026, 1, 20)]["Id"].tolist() == ["1001", "1002"]
+    assert days[date(2026, 1, 22)].to_csv(index=False, lineterminator="\n") == (
+        "Id,ActivityDate,TotalSteps\n1001,01/22/2026,8450\n"
+    )
+    assert split_by_date(path, typed=True)[date(2026, 1, 25)]["TotalSteps"].tolist() == [7000]
+
+
+def test_split_s3_keys(tmp_path: Path) -> None:
+    path = tmp_path / "daily activity.csv"
+    key = split_s3_key("raw/", path, date(2026, 1, 22), "parquet")
+    assert key == "raw/activity/date=2026-01-22/daily_activity.2026-01-22.parquet"
+    assert is_split_key(key)
+    assert not is_split_key("raw/activity/date=2026-01-22/daily_activity.csv")
+    assert not is_split_key("raw/activity/date=2026-01-22/daily_activity.2026-01-21.csv")
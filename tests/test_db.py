@@ -0,0 +1,72 @@
+"""Engine registry and pool settings."""
+
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.pool import NullPool, QueuePool
+
+from ingestion import db
+
+_URL = "postgresql+psycopg2://u:p@db.invalid:5432/wearable"
+
+
+@pytest.fixture(autouse=True)
+def _clean_registry(monkeypatch: pytest.MonkeyPatch):
+    for name in ("DB_POOL_SIZE", "DB_POOL_MAX_OVERFLOW", "DB_POOL_PRE_PING", "DB_POOL_RECYCLE",
+                 "DB_STATEMENT_TIMEOUT_MS", "DB_PGBOUNCER"):
+        monkeypatch.delenv(name, raising=False)
+    db.dispose_engines()
+    yield
+    db.dispose_engines()
+
+
+def test_get_engine_reuses_one_engine_per_url() -> None:
+    first = db.get_engine(_URL)
+    assert db.get_engine(_URL) is first
+    assert db.get_engine(_URL.replace("db.invalid", "other.invalid")) is not first
+
+
+def test_pool_settings_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("DB_POOL_SIZE", "3")
+    monkeypatch.setenv("DB_POOL_MAX_OVERFLOW", "2")
+    monkeypatch.setenv("DB_STATEMENT_TIMEOUT_MS", "30000")
+    engine = db.get_engine(_URL)
+    assert isinstance(engine.pool, QueuePool)
+    assert engine.pool.size() == 3
+    assert engine.pool._max_overflow == 2
+    assert engine.pool._pre_ping is True
+    assert db.engine_options()["connect_args"] == {"options": "-c statement_timeout=30000"}
+
+
+def test_pool_grows_to_cover_worker_threads(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("DB_POOL_SIZE", "3")
+    monkeypatch.setenv("DB_POOL_MAX_OVERFLOW", "2")
+    small = db.get_engine(_URL)
+    assert db.get_engine(_URL, min_connections=5) is small
+    large = db.get_engine(_URL, min_connections=17)
+    assert large is not small
+    assert (large.pool.size(), large.pool._max_overflow) == (3, 14)
+    assert db.get_engine(_URL) is large
+
+
+def test_replaced_engine_releases_its_pool(monkeypatch: pytest.MonkeyPatch) -> None:
+    small = db.get_engine(_URL)
+    disposed = []
+    monkeypatch.setattr(small, "dispose", lambda close=True: disposed.append(close))
+    db.get_engine(_URL, min_connections=50)
+    assert disposed == [True]
+
+
+def test_pgbouncer_mode_keeps_no_client_pool(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("DB_PGBOUNCER", "1")
+    monkeypatch.setenv("DB_STATEMENT_TIMEOUT_MS", "30000")
+    assert db.engine_options() == {"poolclass": NullPool}
+    assert isinstance(db.get_engine(_URL).pool, NullPool)
+
+
+def test_statement_timeout_applies_to_sessions(engine: "pytest.fixture", monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("DB_STATEMENT_TIMEOUT_MS", "1234")
+    pooled = db.get_engine(engine.url.render_as_string(hide_password=False))
+    with pooled.connect() as conn:
+        assert conn.execute(text("SHOW statement_timeout")).scalar_one() == "1234ms"
@@ -0,0 +1,161 @@
+"""Integration test: incremental marts after two loads equal a full refresh over the same staging data."""
+
+from __future__ import annotations
+
+import os
+import shutil
+import subprocess
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from ingestion.query_plans import HOT_QUERIES, check_query_plans
+
+_REPO_ROOT = Path(__file__).resolve().parent.parent
+_DBT_DIR = _REPO_ROOT / "dbt"
+
+STAGING = "test_incr_staging"
+INCREMENTAL = "test_incr"
+FULL = "test_incr_full"
+MARTS = (
+    "user_daily_activity",
+    "daily_user_summary",
+    "mart_daily_health_metrics",
+    "user_baseline_activity",
+    "user_activity_deviation",
+    "mart_cohort_daily_deviation",
+    "mart_cohort_weekly_deviation",
+    "mart_cohort_monthly_deviation",
+)
+
+
+def _activity(user_id: int, days: range, steps: int = 8000) -> list[dict]:
+    rows = []
+    for d in days:
+        day = date(2026, 1, 1) + timedelta(days=d)
+        rows.append(
+            {
+                "Id": user_id,
+                "ActivityDate": day,
+                # Every fifth day is inactive so baselines skip it.
+                "TotalSteps": 0 if d % 5 == 4 else steps + 37 * d,
+                "TotalDistance": round(5 + d / 10, 2),
+                "VeryActiveMinutes": 20,
+                "FairlyActiveMinutes": 10,
+                "LightlyActiveMinutes": 200,
+                "SedentaryMinutes": 700,
+                "Calories": 2100 + d,
+            }
+        )
+    return rows
+
+
+def _sleep(user_id: int, days: range) -> list[dict]:
+    return [
+        {
+            "Id": user_id,
+            "SleepDay": date(2026, 1, 1) + timedelta(days=d),
+            "TotalSleepRecords": 1,
+            "TotalMinutesAsleep": 400 + d,
+            "TotalTimeInBed": 450 + d,
+        }
+        for d in days
+    ]
+
+
+def _append(engine, table: str, rows: list[dict]) -> None:
+    with engine.begin() as conn:
+        pd.DataFrame(rows).to_sql(table, conn, schema=STAGING, if_exists="append", index=False)
+
+
+def _dbt(target_schema: str, tmp_path: Path, *args: str) -> None:
+    env = {**os.environ, "DBT_SCHEMA": target_schema, "STAGING_SCHEMA": STAGING}
+    cmd = [
+        "dbt",
+        "run",
+        "--project-dir",
+        str(_DBT_DIR),
+        "--profiles-dir",
+        str(_DBT_DIR),
+        "--target-path",
+        str(tmp_path / "target"),
+        "--log-path",
+        str(tmp_path / "logs"),
+        "--select",
+        *(f"+{m}" for m in MARTS),
+        *args,
+    ]
+    result = subprocess.run(cmd, cwd=_DBT_DIR, capture_output=True, text=True, env=env)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+
+def _drop_schemas(engine) -> None:
+    with engine.begin() as conn:
+        for schema in (STAGING, INCREMENTAL, FULL):
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+
+
+def test_incremental_marts_match_full_refresh(engine: "pytest.fixture", tmp_path: Path) -> None:
+    if shutil.which("dbt") is None:
+        pytest.skip("dbt not installed")
+    _drop_schemas(engine)
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA {STAGING}"))
+    try:
+        # First load: user 1 has 16 days (sleep only through day 12), user 2 has 3, and user 4's
+        # 14-day baseline closes on day 16.
+        _append(
+            engine,
+            "daily_activity",
+            _activity(1, range(0, 16)) + _activity(2, range(10, 13), 5000) + _activity(4, range(0, 17), 7000),
+        )
+        _append(engine, "sleep", _sleep(1, range(0, 13)))
+        _dbt(INCREMENTAL, tmp_path)
+
+        # Second load, every date within 3 days of the latest built day (16): new days, late sleep
+        # rows, a user whose baseline is still filling up (older rows must pick up the new
+        # baseline), and a new user.
+        _append(
+            engine,
+            "daily_activity",
+            _activity(1, range(16, 21)) + _activity(2, range(13, 16), 5000) + _activity(3, range(18, 21), 9000),
+        )
+        _append(engine, "sleep", _sleep(1, range(13, 21)) + _sleep(3, range(18, 21)))
+        # A corrected row inside user 4's (already complete) baseline window.
+        with engine.begin() as conn:
+            conn.execute(
+                text(
+                    f'UPDATE {STAGING}.daily_activity SET "TotalSteps" = 12000 '
+                    f"WHERE \"Id\" = 4 AND \"ActivityDate\" = '2026-01-16'"
+                )
+            )
+            # A baseline mart built before baseline_steps_total existed still runs incrementally.
+            conn.execute(text(f"ALTER TABLE {INCREMENTAL}.user_baseline_activity DROP COLUMN baseline_steps_total"))
+        _dbt(INCREMENTAL, tmp_path)
+
+        _dbt(FULL, tmp_path, "--full-refresh")
+
+        with engine.connect() as conn:
+            for mart in MARTS:
+                rows = conn.execute(text(f"SELECT count(*) FROM {FULL}.{mart}")).scalar_one()
+                assert rows > 0, mart
+                diff = conn.execute(
+                    text(
+                        f"SELECT count(*) FROM ("
+                        f"(SELECT * FROM {INCREMENTAL}.{mart} EXCEPT ALL SELECT * FROM {FULL}.{mart}) "
+                        f"UNION ALL "
+                        f"(SELECT * FROM {FULL}.{mart} EXCEPT ALL SELECT * FROM {INCREMENTAL}.{mart})"
+                        f") d"
+                    )
+                ).scalar_one()
+                assert diff == 0, f"{mart}: incremental differs from full refresh by {diff} rows"
+        # Declared indexes exist after incremental runs and full builds alike.
+        mart_queries = {name: q for name, q in HOT_QUERIES.items() if q[0] in MARTS}
+        assert mart_queries
+        for schema in (INCREMENTAL, FULL):
+            assert check_query_plans(engine, schema, mart_queries) == {}, schema
+    finally:
+        _drop_schemas(engine)
@@ -0,0 +1,116 @@
+"""Detect's list-based remote comparison (fake S3 client, no network)."""
+
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+
+import pytest
+
+from ingestion.detect import RemoteIndex, needs_s3_upload
+
+BODY = b"Id,ActivityDate\n1001,01/20/2026\n"
+KEY = "raw/activity/date=2026-01-20/daily_activity.csv"
+
+
+class _Paginator:
+    def __init__(self, objects: list[dict]) -> None:
+        self.objects = objects
+
+    def paginate(self, Bucket: str, Prefix: str):  # noqa: N803
+        matched = [o for o in self.objects if o["Key"].startswith(Prefix)]
+        for i in range(0, max(len(matched), 1), 2):
+            yield {"Contents": matched[i : i + 2]}
+
+
+class FakeS3:
+    def __init__(self, objects: list[dict], metadata: dict[str, str] | None = None) -> None:
+        self.objects = objects
+        self.metadata = metadata or {}
+        self.heads: list[str] = []
+
+    def get_paginator(self, name: str) -> _Paginator:
+        assert name == "list_objects_v2"
+        return _Paginator(self.objects)
+
+    def head_object(self, Bucket: str, Key: str) -> dict:  # noqa: N803
+        self.heads.append(Key)
+        return {"Metadata": self.metadata, "ETag": '"x-2"', "ContentLength": len(BODY)}
+
+
+class _Rows(list):
+    add = list.append
+
+
+@pytest.fixture
+def drop(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setenv("S3_PREFIX", "raw")
+    path = tmp_path / "daily_activity.csv"
+    path.write_bytes(BODY)
+    return path
+
+
+def _obj(key: str, body: bytes, etag: str | None = None) -> dict:
+    return {"Key": key, "Size": len(body), "ETag": f'"{etag or hashlib.md5(body).hexdigest()}"'}
+
+
+def test_listed_etag_match_syncs_manifest_without_head(drop: Path) -> None:
+    client = FakeS3([_obj(KEY, BODY), _obj("raw/activity/date=2026-01-21/other.csv", b"x")])
+    remote = RemoteIndex(client, "bucket")
+    batch = _Rows()
+    assert needs_s3_upload(drop, None, manifest_rows={}, manifest_batch=batch, remote=remote) is False
+    assert [r["s3_key"] for r in batch] == [KEY]
+    assert client.heads == []
+    assert remote.requests == {"list_objects_v2": 1, "head_object": 0}
+
+
+def test_listing_decides_missing_and_changed_objects(drop: Path) -> None:
+    missing = RemoteIndex(FakeS3([]), "bucket")
+    assert needs_s3_upload(drop, None, manifest_rows={}, manifest_batch=_Rows(), remote=missing) is True
+
+    changed = FakeS3([_obj(KEY, b"Id,ActivityDate\n1001,01/21/2026\n")])
+    remote = RemoteIndex(changed, "bucket")
+    assert needs_s3_upload(drop, None, manifest_rows={}, manifest_batch=_Rows(), remote=remote) is True
+    assert changed.heads == []
+
+
+def test_multipart_etag_falls_back_to_head(drop: Path) -> None:
+    client = FakeS3(
+        [_obj(KEY, BODY, etag="abc-2")],
+        metadata={"sha256": hashlib.sha256(BODY).hexdigest()},
+    )
+    remote = RemoteIndex(client, "bucket")
+    assert needs_s3_upload(drop, None, manifest_rows={}, manifest_batch=_Rows(), remote=remote) is False
+    assert client.heads == [KEY]
+    assert remote.requests["head_object"] == 1
+
+
+def test_parquet_object_is_matched_on_sha256_metadata(drop: Path) -> None:
+    parquet_key = KEY.replace(".csv", ".parquet")
+    client = FakeS3(
+        [_obj(parquet_key, b"PAR1...PAR1")],
+        metadata={"sha256": hashlib.sha256(BODY).hexdigest()},
+    )
+    remote = RemoteIndex(client, "bucket")
+    batch = _Rows()
+    assert (
+        needs_s3_upload(
+            drop, None, manifest_rows={}, manifest_batch=batch, remote=remote, lake_format="parquet"
+        )
+        is False
+    )
+    assert client.heads == [parquet_key]
+    assert [r["s3_key"] for r in batch] == [parquet_key]
+
+
+def test_split_mode_is_current_only_when_every_recorded_split_matches(drop: Path) -> None:
+    checksum = hashlib.sha256(BODY).hexdigest()
+    split_key = "raw/activity/date=2026-01-20/daily_activity.2026-01-20.csv"
+    current = {split_key: {"checksum": checksum}}
+    assert needs_s3_upload(drop, None, split=True, recorded=current) is False
+    assert needs_s3_upload(drop, None, split=True, recorded={}) is True
+    # Still filed as a whole file, or split from an older version of the drop.
+    assert needs_s3_upload(drop, None, split=True, recorded={KEY: {"checksum": checksum}}) is True
+    assert needs_s3_upload(drop, None, split=True, recorded={split_key: {"checksum": "old"}}) is True
+    # Recorded splits only exist as Parquet.
+    assert needs_s3_upload(drop, None, split=True, recorded=current, lake_format="parquet") is True
@@ -0,0 +1,100 @@
+"""Pipelined ingestion engine: stage plumbing and per-file staging writes."""
+
+from __future__ import annotations
+
+import queue
+import threading
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from ingestion.engine import FileWork, Stage, _drain, _feed, write_file
+from ingestion.manifest import ensure_staging_load_table, get_staging_load_rows
+from ingestion.partitions import create_partitioned_table
+
+SCHEMA = "test_engine"
+TABLE = "engine_events"
+
+
+def test_stages_pass_items_drop_none_and_record_failures() -> None:
+    def work(item: FileWork) -> FileWork | None:
+        if item.path.name == "bad.csv":
+            raise ValueError("boom")
+        return None if item.path.name == "skip.csv" else item
+
+    inbox: queue.Queue = queue.Queue(maxsize=1)
+    middle: queue.Queue = queue.Queue(maxsize=1)
+    outbox: queue.Queue = queue.Queue(maxsize=1)
+    failed: list[str] = []
+    names = [f"{i}.csv" for i in range(20)] + ["bad.csv", "skip.csv"]
+    _feed(inbox, [FileWork(Path(n), "sleep") for n in names])
+    Stage("first", work, inbox, middle, 3, failed).start()
+    Stage("second", lambda item: item, middle, outbox, 2, failed).start()
+    out = sorted(item.path.name for item in _drain(outbox))
+    assert out == sorted(f"{i}.csv" for i in range(20))
+    assert failed == ["bad.csv"]
+
+
+def test_full_queue_holds_back_the_stage_feeding_it() -> None:
+    inbox: queue.Queue = queue.Queue(maxsize=1)
+    outbox: queue.Queue = queue.Queue(maxsize=1)
+    seen: list[str] = []
+    lock = threading.Lock()
+    second = threading.Event()
+
+    def work(item: FileWork) -> FileWork:
+        with lock:
+            seen.append(item.path.name)
+            if len(seen) == 2:
+                second.set()
+        return item
+
+    _feed(inbox, [FileWork(Path(f"{i}.csv"), "sleep") for i in range(10)])
+    Stage("only", work, inbox, outbox, 1, []).start()
+    # Nothing drains outbox: one item fills it and the worker blocks holding the next.
+    assert second.wait(timeout=10)
+    threading.Event().wait(0.05)
+    assert len(seen) == 2
+    assert len(list(_drain(outbox))) == 10
+
+
+def test_write_file_replaces_a_files_rows_and_load_state(engine: "pytest.fixture") -> None:
+    ensure_staging_load_table(engine)
+    keys = [f"{SCHEMA}/date=2026-01-0{d}/a.2026-01-0{d}.csv" for d in (1, 2)]
+    old_key = f"{SCHEMA}/date=2026-01-01/a.csv"
+
+    def frame(key: str, ids: list[int]) -> pd.DataFrame:
+        day = key.split("date=", 1)[1][:10]
+        return pd.DataFrame({"Id": ids, "_source_key": key, "_partition_date": day})
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        create_partitioned_table(conn, frame(old_key, [1]), SCHEMA, TABLE)
+    try:
+        # First as one whole-file object, then split per date: the old object's rows go.
+        whole = FileWork(Path("a.csv"), TABLE, keys=[old_key], version="v1", frames={old_key: frame(old_key, [1, 2])})
+        with engine.begin() as conn:
+            assert write_file(conn, whole, SCHEMA, "copy", 1000) == 2
+        split = FileWork(
+            Path("a.csv"),
+            TABLE,
+            keys=keys,
+            drop_keys=[old_key],
+            version="v2",
+            frames={keys[0]: frame(keys[0], [1]), keys[1]: frame(keys[1], [2, 3])},
+        )
+        with engine.begin() as conn:
+            assert write_file(conn, split, SCHEMA, "copy", 1000) == 3
+        with engine.connect() as conn:
+            rows = conn.execute(text(f'SELECT "Id", _source_key FROM {SCHEMA}.{TABLE} ORDER BY 1')).fetchall()
+        assert rows == [(1, keys[0]), (2, keys[1]), (3, keys[1])]
+        assert get_staging_load_rows(engine, SCHEMA, TABLE) == {
+            keys[0]: {"version": "v2", "row_count": 1},
+            keys[1]: {"version": "v2", "row_count": 2},
+        }
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            conn.execute(text("DELETE FROM ops.staging_load_state WHERE table_name = :t"), {"t": TABLE})
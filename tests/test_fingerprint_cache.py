@@ -0,0 +1,104 @@
+"""Unit tests for the persistent stat-keyed fingerprint cache."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pytest
+
+import ingestion.fingerprint_cache as fingerprint_cache
+from ingestion.fingerprint_cache import FingerprintCache, default_cache_path
+from ingestion.manifest import file_checksum
+
+
+@pytest.fixture
+def hashed(monkeypatch: pytest.MonkeyPatch) -> list[Path]:
+    """Record every full fingerprint computation the cache falls through to."""
+    calls: list[Path] = []
+    real = fingerprint_cache.fingerprint_file
+
+    def counting(path: Path, force: bool = False):
+        calls.append(path)
+        return real(path, force=True)
+
+    monkeypatch.setattr(fingerprint_cache, "fingerprint_file", counting)
+    return calls
+
+
+def _bump_mtime(path: Path) -> None:
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_default_cache_path_is_in_the_user_cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("FINGERPRINT_CACHE_PATH", raising=False)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    first = default_cache_path(tmp_path / "a" / "drops")
+    second = default_cache_path(tmp_path / "b" / "drops")
+    assert first.parent == tmp_path / "cache" / "wearable-ingest"
+    assert first.name.startswith("drops-") and first.name.endswith(".fingerprints.sqlite")
+    assert first != second
+    FingerprintCache(first).close()
+    assert first.exists()
+
+
+def test_cache_skips_rehash_until_stat_changes(tmp_path: Path, hashed: list[Path]) -> None:
+    path = tmp_path / "daily_activity.csv"
+    path.write_bytes(b"Id,ActivityDate\n1001,01/20/2026\n")
+    cache = FingerprintCache(tmp_path / "cache.sqlite")
+    try:
+        first = cache.fingerprint(path)
+        assert cache.fingerprint(path).sha256 == first.sha256
+        assert len(hashed) == 1
+
+        path.write_bytes(b"Id,ActivityDate\n1001,01/21/2026\n")
+        _bump_mtime(path)
+        second = cache.fingerprint(path)
+        assert len(hashed) == 2
+        assert second.sha256 == file_checksum(path)
+        assert second.min_date.isoformat() == "2026-01-21"
+    finally:
+        cache.close()
+
+    reopened = FingerprintCache(tmp_path / "cache.sqlite")
+    try:
+        assert reopened.fingerprint(path).sha256 == second.sha256
+        assert len(hashed) == 2
+    finally:
+        reopened.close()
+
+
+def test_fast_hash_reuses_sha_for_touched_file(tmp_path: Path, hashed: list[Path]) -> None:
+    path = tmp_path / "sleep.csv"
+    path.write_bytes(b"Id,SleepDay\n1001,01/20/2026 12:00:00 AM\n")
+    cache = FingerprintCache(tmp_path / "cache.sqlite")
+    try:
+        cache.fingerprint(path, use_fast_hash=True)
+        _bump_mtime(path)
+        cache.fingerprint(path, use_fast_hash=True)
+        assert len(hashed) == 1
+
+        cache.fingerprint(path, verify=True)
+        assert len(hashed) == 2
+    finally:
+        cache.close()
+
+
+def test_fast_hash_catches_same_size_edit_in_the_middle(tmp_path: Path, hashed: list[Path]) -> None:
+    path = tmp_path / "daily_activity.csv"
+    rows = "".join(f"{1000 + i},01/20/2026,{8000 + i}\n" for i in range(20_000))
+    path.write_text("Id,ActivityDate,TotalSteps\n" + rows)
+    cache = FingerprintCache(tmp_path / "cache.sqlite")
+    try:
+        first = cache.fingerprint(path, use_fast_hash=True)
+        body = path.read_bytes()
+        middle = body.index(b"11000,01/20/2026,18000")
+        path.write_bytes(body[:middle] + b"11000,01/20/2026,18001" + body[middle + 22 :])
+        _bump_mtime(path)
+        assert path.stat().st_size == first.size
+        second = cache.fingerprint(path, use_fast_hash=True)
+        assert len(hashed) == 2
+        assert second.sha256 == file_checksum(path) != first.sha256
+    finally:
+        cache.close()
@@ -0,0 +1,28 @@
+"""Dashboard granularity: the finest rollup that keeps a range within MAX_CHART_POINTS."""
+
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+import pytest
+
+from dashboards.granularity import MAX_CHART_POINTS, pick_granularity
+
+START = date(2026, 1, 1)
+
+
+@pytest.mark.parametrize(
+    ("days", "expected"),
+    [
+        (1, "daily"),
+        (MAX_CHART_POINTS, "daily"),
+        (MAX_CHART_POINTS + 1, "weekly"),
+        (MAX_CHART_POINTS * 7, "weekly"),
+        (MAX_CHART_POINTS * 7 + 1, "monthly"),
+        (MAX_CHART_POINTS * 30, "monthly"),
+        # Past the monthly limit there is nothing coarser; monthly it stays.
+        (MAX_CHART_POINTS * 30 + 1, "monthly"),
+    ],
+)
+def test_pick_granularity_boundaries(days: int, expected: str) -> None:
+    assert pick_granularity(START, START + timedelta(days=days - 1)) == expected
@@ -0,0 +1,40 @@
+"""CSV -> Parquet lake conversion and the loader's object selection."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from ingestion.lake_format import (
+    csv_to_parquet_bytes,
+    format_of_key,
+    iter_parquet_frames,
+    object_name,
+    read_parquet_bytes,
+)
+from ingestion.schemas import read_csv
+
+
+def test_parquet_round_trip_matches_registry_read(tmp_path: Path) -> None:
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "daily_activity.csv"
+    path.write_text(
+        "Id,ActivityDate,TotalSteps,TotalDistance\n"
+        "1001,01/20/2026,8000,5.2\n"
+        "1002,01/20/2026,,3.1\n"
+        "1003,01/21/2026,120,0.1\n"
+    )
+    data = csv_to_parquet_bytes(path)
+    pd.testing.assert_frame_equal(read_parquet_bytes(data), read_csv(path))
+    frames = list(iter_parquet_frames(data, 2))
+    assert [len(f) for f in frames] == [2, 1]
+    assert frames[0]["TotalSteps"].dtype == "Int32"
+
+
+def test_object_names_and_formats() -> None:
+    assert object_name("raw/activity/date=2026-01-20/a.csv", "parquet") == "raw/activity/date=2026-01-20/a.parquet"
+    assert format_of_key("raw/a.PARQUET") == "parquet"
+    assert format_of_key("raw/a.csv") == "csv"
+    assert format_of_key("raw/a.json") is None
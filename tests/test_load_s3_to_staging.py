@@ -0,0 +1,128 @@
+"""Unit tests for load_s3_to_staging helpers (no S3 or Postgres required)."""
+
+from __future__ import annotations
+
+import io
+import random
+import time
+
+import pandas as pd
+import pytest
+
+from ingestion import load_s3_to_staging
+from ingestion.lake_format import frame_to_parquet_bytes
+from ingestion.load_s3_to_staging import (
+    _apply_compaction,
+    _iter_prefetched,
+    _list_lake_objects,
+    _plan_incremental,
+    _rows_within_budget,
+    _write_streaming,
+)
+
+
+def test_iter_prefetched_preserves_key_order() -> None:
+    keys = [f"raw/activity/date=2026-01-{d:02d}/f.csv" for d in range(1, 21)]
+
+    def fetch(key: str) -> str:
+        time.sleep(random.uniform(0, 0.01))
+        return key.upper()
+
+    out = list(_iter_prefetched(keys, fetch, workers=6))
+    assert [k for k, _ in out] == keys
+    assert [v for _, v in out] == [k.upper() for k in keys]
+
+
+def test_iter_prefetched_serial_when_one_worker() -> None:
+    assert list(_iter_prefetched(["a", "b"], str.upper, workers=1)) == [("a", "A"), ("b", "B")]
+
+
+def test_rows_within_budget_scales_with_budget() -> None:
+    chunk = pd.DataFrame({"Id": range(1000), "ActivityDate": ["01/20/2026"] * 1000})
+    small = _rows_within_budget(chunk, 1024 * 1024)
+    large = _rows_within_budget(chunk, 64 * 1024 * 1024)
+    assert 1 <= small < large
+
+
+def test_plan_incremental_loads_new_and_changed_and_drops_removed() -> None:
+    versions = {"a.csv": "v1", "b.csv": "v2-new", "c.csv": "v1"}
+    loaded = {
+        "a.csv": {"version": "v1", "row_count": 10},
+        "b.csv": {"version": "v2", "row_count": 10},
+        "gone.csv": {"version": "v1", "row_count": 5},
+    }
+    to_load, stale = _plan_incremental(versions, loaded)
+    assert to_load == ["b.csv", "c.csv"]
+    assert stale == ["b.csv", "gone.csv"]
+    assert _plan_incremental(versions, {k: {"version": v} for k, v in versions.items()}) == ([], [])
+
+
+def test_list_lake_objects_prefers_parquet_over_kept_csv() -> None:
+    class _Client:
+        def get_paginator(self, name: str):
+            return self
+
+        def paginate(self, Bucket: str, Prefix: str):  # noqa: N803
+            keys = [
+                "raw/activity/date=2026-01-20/a.csv",
+                "raw/activity/date=2026-01-20/a.parquet",
+                "raw/activity/date=2026-01-21/b.csv",
+                "raw/activity/date=2026-01-21/notes.txt",
+                "raw/activity/c.parquet",
+            ]
+            yield {"Contents": [{"Key": k, "Size": 1, "ETag": '"e"'} for k in keys]}
+
+    assert sorted(_list_lake_objects(_Client(), "bucket", "raw/activity/")) == [
+        "raw/activity/date=2026-01-20/a.parquet",
+        "raw/activity/date=2026-01-21/b.csv",
+    ]
+
+
+def test_apply_compaction_reads_valid_compacted_objects_instead_of_sources() -> None:
+    part = "raw/activity/date=2026-01-20"
+    versions = {
+        f"{part}/a.csv": "v1",
+        f"{part}/b.csv": "v2",
+        f"{part}/c.csv": "v3",
+        f"{part}/compacted-0001.csv": "etag:x",
+    }
+    lineage = {f"{part}/compacted-0001.csv": {f"{part}/a.csv": "v1", f"{part}/b.csv": "v2"}}
+    assert sorted(_apply_compaction(versions, lineage)) == [f"{part}/c.csv", f"{part}/compacted-0001.csv"]
+
+    # A source changed since compaction: fall back to the sources.
+    changed = {**versions, f"{part}/b.csv": "v9"}
+    assert sorted(_apply_compaction(changed, lineage)) == [f"{part}/a.csv", f"{part}/b.csv", f"{part}/c.csv"]
+
+    # No lineage for a compacted-looking object: never read it.
+    assert f"{part}/compacted-0001.csv" not in _apply_compaction(versions, {})
+
+
+def test_stream_decodes_parquet_from_a_spool_in_budget_sized_batches(monkeypatch) -> None:
+    pytest.importorskip("pyarrow")
+    key = "raw/activity/date=2026-01-20/a.parquet"
+    df = pd.DataFrame({"Id": range(5000), "ActivityDate": ["01/20/2026"] * 5000, "TotalSteps": range(5000)})
+    data = frame_to_parquet_bytes(df)
+
+    class _Client:
+        def get_object(self, Bucket: str, Key: str):  # noqa: N803
+            return {"Body": io.BytesIO(data), "Metadata": {}}
+
+    def no_whole_download(*args, **kwargs):
+        raise AssertionError("--stream must not buffer a whole Parquet object")
+
+    written: list[pd.DataFrame] = []
+
+    def capture(conn, frame, schema, table, loader, batch_size):
+        written.append(frame.copy())
+        return len(frame)
+
+    monkeypatch.setattr(load_s3_to_staging, "download_object_bytes", no_whole_download)
+    monkeypatch.setattr(load_s3_to_staging, "write_frame", capture)
+    per_key = _write_streaming(
+        None, _Client(), "bucket", [key], "staging", "daily_activity", "copy", 1000, 2, 64 * 1024
+    )
+
+    assert per_key == {key: 5000}
+    assert len(written) > 1
+    assert sum(len(f) for f in written) == 5000
+    assert list(pd.concat(written)["TotalSteps"]) == list(range(5000))
@@ -6,12 +6,25 @@ import tempfile
 from pathlib import Path
 
 import pytest
+from sqlalchemy import text
 
 from ingestion.manifest import (
+    ManifestBatch,
+    delete_s3_manifest_rows,
     ensure_manifest_table,
+    ensure_s3_manifest_table,
+    ensure_staging_load_table,
     file_checksum,
     get_manifest_row,
+    get_manifest_rows,
+    get_s3_manifest_rows,
+    get_s3_manifest_rows_by_source,
+    get_staging_load_rows,
+    get_staging_row_total,
+    replace_staging_load_rows,
     upsert_manifest,
+    upsert_manifest_rows,
+    upsert_s3_manifest_rows,
 )
 
 
@@ -78,3 +91,88 @@ def test_manifest_idempotent_skip_when_same_checksum(engine: "pytest.fixture") -
     row_after = get_manifest_row(engine, "idempotent.csv")
     assert row_before["checksum"] == row_after["checksum"]
     assert row_after["row_count"] == 5
+
+
+def test_manifest_bulk_get_and_upsert(engine: "pytest.fixture") -> None:
+    ensure_manifest_table(engine)
+    upsert_manifest_rows(
+        engine,
+        [
+            {"source_filename": "bulk_a.csv", "checksum": "a1", "row_count": 1, "status": "success"},
+            {"source_filename": "bulk_b.csv", "checksum": "b1", "row_count": 2, "status": "success"},
+            {"source_filename": "bulk_a.csv", "checksum": "a2", "row_count": 3, "status": "success"},
+        ],
+    )
+    rows = get_manifest_rows(engine, ["bulk_a.csv", "bulk_b.csv", "bulk_missing.csv"])
+    assert set(rows) == {"bulk_a.csv", "bulk_b.csv"}
+    assert rows["bulk_a.csv"]["checksum"] == "a2"
+    assert rows["bulk_a.csv"]["row_count"] == 3
+    assert get_manifest_rows(engine, []) == {}
+
+
+def test_s3_manifest_batch_flushes_in_one_upsert(engine: "pytest.fixture") -> None:
+    ensure_s3_manifest_table(engine)
+    batch = ManifestBatch(engine, upsert_s3_manifest_rows, flush_size=2)
+    for i in range(3):
+        batch.add(
+            {
+                "s3_key": f"raw/activity/date=2026-01-2{i}/bulk_{i}.csv",
+                "source_filename": f"bulk_{i}.csv",
+                "checksum": f"c{i}",
+                "etag": None,
+                "byte_size": 10 + i,
+            }
+        )
+    batch.flush()
+    keys = [f"raw/activity/date=2026-01-2{i}/bulk_{i}.csv" for i in range(3)]
+    rows = get_s3_manifest_rows(engine, keys)
+    assert [rows[k]["checksum"] for k in keys] == ["c0", "c1", "c2"]
+    assert rows[keys[2]]["byte_size"] == 12
+
+
+def test_s3_manifest_rows_by_source_are_scoped_to_the_prefix(engine: "pytest.fixture") -> None:
+    ensure_s3_manifest_table(engine)
+    keys = [
+        "raw/activity/date=2026-01-20/scoped.2026-01-20.csv",
+        "raw-other/activity/date=2026-01-20/scoped.2026-01-20.csv",
+    ]
+    rows = [
+        {"s3_key": k, "source_filename": "scoped.csv", "checksum": "c", "etag": None, "byte_size": 1} for k in keys
+    ]
+    upsert_s3_manifest_rows(engine, rows)
+    try:
+        assert set(get_s3_manifest_rows_by_source(engine, ["scoped.csv"], "raw")["scoped.csv"]) == {keys[0]}
+        assert set(get_s3_manifest_rows_by_source(engine, ["scoped.csv"], "/raw-other/")["scoped.csv"]) == {keys[1]}
+        assert set(get_s3_manifest_rows_by_source(engine, ["scoped.csv"])["scoped.csv"]) == set(keys)
+    finally:
+        delete_s3_manifest_rows(engine, keys)
+
+
+def test_staging_load_state_is_kept_per_schema(engine: "pytest.fixture") -> None:
+    ensure_staging_load_table(engine)
+    table = "test_manifest_events"
+    key = "raw/events/date=2026-01-20/a.csv"
+
+    def cleanup() -> None:
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM ops.staging_load_state WHERE table_name = :t"), {"t": table})
+
+    cleanup()
+    try:
+        with engine.begin() as conn:
+            replace_staging_load_rows(conn, "schema_a", table, [{"s3_key": key, "version": "v1", "row_count": 3}])
+            replace_staging_load_rows(conn, "schema_b", table, [{"s3_key": key, "version": "v2", "row_count": 5}])
+        assert get_staging_load_rows(engine, "schema_a", table) == {key: {"version": "v1", "row_count": 3}}
+        assert get_staging_row_total(engine, "schema_b", table) == 5
+
+        # A full refresh and a forgotten key in one schema leave the other schema's state alone.
+        with engine.begin() as conn:
+            replace_staging_load_rows(conn, "schema_a", table, [])
+            replace_staging_load_rows(conn, "schema_b", table, [], forget_keys=["other"])
+        assert get_staging_load_rows(engine, "schema_a", table) == {}
+        assert get_staging_load_rows(engine, "schema_b", table) == {key: {"version": "v2", "row_count": 5}}
+        with engine.begin() as conn:
+            replace_staging_load_rows(conn, "schema_a", table, [], forget_keys=[key])
+        assert get_staging_row_total(engine, "schema_b", table) == 5
+    finally:
+        cleanup()
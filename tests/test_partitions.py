@@ -0,0 +1,112 @@
+"""Monthly staging partitions: naming and partition-level replace."""
+
+from __future__ import annotations
+
+from datetime import date
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from ingestion.partitions import (
+    build_partition_shadow,
+    create_partitioned_table,
+    ensure_indexes,
+    ensure_partition,
+    index_columns,
+    next_month,
+    partition_name,
+    swap_partition,
+)
+from ingestion.query_plans import seq_scans
+from ingestion.table_swap import finalize_shadow
+
+SCHEMA = "test_partitions"
+
+
+def test_month_helpers() -> None:
+    assert next_month(date(2026, 1, 1)) == date(2026, 2, 1)
+    assert next_month(date(2025, 12, 1)) == date(2026, 1, 1)
+    assert partition_name("sleep", date(2026, 3, 1)) == "sleep_p2026_03"
+
+
+def _rows(conn) -> list[tuple]:
+    return conn.execute(
+        text(f'SELECT tableoid::regclass::text, "Id", _source_key FROM {SCHEMA}.events ORDER BY "Id"')
+    ).fetchall()
+
+
+def test_swap_partition_replaces_one_month(engine: "pytest.fixture") -> None:
+    frame = pd.DataFrame(
+        {
+            "Id": [1, 2, 3],
+            "_source_key": ["jan/a.csv", "jan/b.csv", "feb/c.csv"],
+            "_partition_date": ["2026-01-05", "2026-01-06", "2026-02-01"],
+        }
+    )
+    jan, feb = date(2026, 1, 1), date(2026, 2, 1)
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        create_partitioned_table(conn, frame, SCHEMA, "events")
+        ensure_partition(conn, SCHEMA, "events", jan)
+        ensure_partition(conn, SCHEMA, "events", feb)
+        frame.to_sql("events", conn, schema=SCHEMA, if_exists="append", index=False)
+
+    with engine.begin() as conn:
+        shadow = build_partition_shadow(conn, SCHEMA, "events", jan, ["jan/b.csv"])
+        conn.execute(
+            text(f"INSERT INTO {SCHEMA}.{shadow} VALUES (4, 'jan/b.csv', '2026-01-06')")
+        )
+        finalize_shadow(conn, SCHEMA, shadow, index_columns=("_source_key",))
+    with engine.begin() as conn:
+        swap_partition(conn, SCHEMA, "events", jan, shadow)
+
+    with engine.connect() as conn:
+        assert _rows(conn) == [
+            (f"{SCHEMA}.events_p2026_01", 1, "jan/a.csv"),
+            (f"{SCHEMA}.events_p2026_02", 3, "feb/c.csv"),
+            (f"{SCHEMA}.events_p2026_01", 4, "jan/b.csv"),
+        ]
+        indexes = conn.execute(
+            text("SELECT indexname FROM pg_indexes WHERE schemaname = :s"), {"s": SCHEMA}
+        ).scalars().all()
+        conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+        conn.commit()
+    assert indexes == ["events_p2026_01__source_key_idx"]
+
+
+def test_date_column_is_indexed_on_every_partition(engine: "pytest.fixture") -> None:
+    frame = pd.DataFrame(
+        {
+            "Id": [1, 2],
+            "ActivityDate": pd.to_datetime(["2026-01-05", "2026-02-03"]),
+            "_source_key": ["jan/a.csv", "feb/b.csv"],
+            "_partition_date": ["2026-01-05", "2026-02-01"],
+        }
+    )
+    assert index_columns(frame.columns) == ("_source_key", "ActivityDate")
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        create_partitioned_table(conn, frame, SCHEMA, "events")
+        ensure_partition(conn, SCHEMA, "events", date(2026, 1, 1))
+        # A table from before the date index: adding it covers existing and later partitions.
+        ensure_indexes(conn, SCHEMA, "events", frame.columns)
+        ensure_indexes(conn, SCHEMA, "events", frame.columns)
+        ensure_partition(conn, SCHEMA, "events", date(2026, 2, 1))
+        frame.to_sql("events", conn, schema=SCHEMA, if_exists="append", index=False)
+    try:
+        with engine.connect() as conn, conn.begin() as trans:
+            indexed = conn.execute(
+                text(
+                    "SELECT tablename FROM pg_indexes WHERE schemaname = :s AND indexdef LIKE '%(\"ActivityDate\")'"
+                    " ORDER BY 1"
+                ),
+                {"s": SCHEMA},
+            ).scalars().all()
+            assert indexed == ["events", "events_p2026_01", "events_p2026_02"]
+            sql = f'SELECT * FROM {SCHEMA}.events WHERE "ActivityDate" BETWEEN :a AND :b'
+            assert seq_scans(conn, sql, {"a": date(2026, 1, 1), "b": date(2026, 1, 31)}) == []
+            trans.rollback()
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
@@ -0,0 +1,41 @@
+"""EXPLAIN check: Seq Scan nodes are found anywhere in a plan, and only when no index can serve the query."""
+
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import text
+
+from ingestion.query_plans import _seq_scanned, check_query_plans, seq_scans
+
+SCHEMA = "test_query_plans"
+
+
+def test_seq_scanned_walks_nested_plans() -> None:
+    plan = {
+        "Node Type": "Hash Join",
+        "Plans": [
+            {"Node Type": "Seq Scan", "Relation Name": "a"},
+            {"Node Type": "Hash", "Plans": [{"Node Type": "Index Scan", "Relation Name": "b"}]},
+        ],
+    }
+    assert _seq_scanned(plan) == ["a"]
+
+
+def test_seq_scans_flags_queries_without_an_index_path(engine: "pytest.fixture") -> None:
+    queries = {"by date": ("events", "select * from {schema}.events where activity_date >= :start_date")}
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        conn.execute(text(f"CREATE TABLE {SCHEMA}.events (user_id bigint, activity_date date)"))
+    try:
+        with engine.begin() as conn:
+            sql = f"select * from {SCHEMA}.events where user_id = 1"
+            assert seq_scans(conn, sql) == ["events"]
+        assert check_query_plans(engine, SCHEMA, queries) == {"by date": ["events"]}
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE INDEX ON {SCHEMA}.events USING brin (activity_date)"))
+        assert check_query_plans(engine, SCHEMA, queries) == {}
+        assert check_query_plans(engine, SCHEMA, {"missing": ("nope", "select 1")}) == {}
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
@@ -0,0 +1,24 @@
+"""ops.pipeline_runs helpers."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+
+from ingestion.run_tracker import record_run
+
+
+def test_record_run_inserts_finished_row(engine: "pytest.fixture") -> None:
+    started = datetime.now(timezone.utc) - timedelta(minutes=5)
+    run_id = record_run(engine, started, "success")
+    with engine.begin() as conn:
+        row = conn.execute(
+            text("SELECT status, started_at, finished_at FROM ops.pipeline_runs WHERE run_id = :r"),
+            {"r": run_id},
+        ).one()
+        conn.execute(text("DELETE FROM ops.pipeline_runs WHERE run_id = :r"), {"r": run_id})
+    assert row[0] == "success"
+    assert row[1] == started
+    assert row[2] >= started
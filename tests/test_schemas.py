@@ -0,0 +1,149 @@
+"""Dataset schema registry: compact dtypes, pyarrow/pandas parsing, parsed dates and typed staging DDL."""
+
+from __future__ import annotations
+
+import io
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from ingestion import schemas
+from ingestion.bulk_load import write_frame
+from ingestion.csv_partition import _compute_fingerprint
+
+ACTIVITY = (
+    "Id,ActivityDate,TotalSteps,TotalDistance,Note\n"
+    "1001,01/22/2026,8450,6.2,a\n"
+    "8877689391,01/20/2026,,7.8,\n"
+    "1001,01/20/2026,3,0.1,b\n"
+)
+COMPACT = {
+    "Id": "category",
+    "ActivityDate": "datetime64[ns]",
+    "TotalSteps": "Int32",
+    "TotalDistance": "float32",
+    "Note": "object",
+}
+
+SCHEMA = "test_schemas"
+
+
+def _dtypes(df: pd.DataFrame) -> dict[str, str]:
+    return {c: str(t) for c, t in df.dtypes.items()}
+
+
+@pytest.mark.parametrize("use_pyarrow", [True, False])
+def test_read_csv_uses_registry_dtypes(use_pyarrow: bool, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    if use_pyarrow:
+        pytest.importorskip("pyarrow")
+    else:
+        monkeypatch.setattr(schemas, "pacsv", None)
+    path = tmp_path / "daily_activity.csv"
+    path.write_text(ACTIVITY)
+    df = schemas.read_csv(path)
+    assert _dtypes(df) == COMPACT
+    assert df["Id"].tolist() == [1001, 8877689391, 1001]
+    assert df["TotalSteps"].isna().tolist() == [False, True, False]
+    assert df["TotalDistance"].to_csv(index=False, header=False).split() == ["6.2", "7.8", "0.1"]
+    assert df["ActivityDate"].dt.strftime("%Y-%m-%d").tolist() == ["2026-01-22", "2026-01-20", "2026-01-20"]
+
+
+def test_values_that_do_not_fit_fall_back_to_inference(engine: "pytest.fixture") -> None:
+    pytest.importorskip("pyarrow")
+    df = schemas.read_csv(
+        io.BytesIO(b"Id,ActivityDate,TotalSteps,Calories\n1001,01/20/2026,n/a steps,2000.5\n")
+    )
+    assert _dtypes(df) == {
+        "Id": "category",
+        "ActivityDate": "datetime64[ns]",
+        "TotalSteps": "object",
+        "Calories": "float64",
+    }
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    try:
+        with engine.begin() as conn:
+            assert write_frame(conn, df, SCHEMA, "daily_activity") == 1
+            types = dict(
+                conn.execute(
+                    text(
+                        "SELECT column_name, data_type FROM information_schema.columns "
+                        "WHERE table_schema = :s AND table_name = 'daily_activity'"
+                    ),
+                    {"s": SCHEMA},
+                ).fetchall()
+            )
+            row = conn.execute(text(f'SELECT "TotalSteps", "Calories" FROM {SCHEMA}.daily_activity')).one()
+        assert types == {
+            "Id": "bigint",
+            "ActivityDate": "date",
+            "TotalSteps": "text",
+            "Calories": "double precision",
+        }
+        assert tuple(row) == ("n/a steps", 2000.5)
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+
+
+def test_parse_date_series_drops_times_and_nulls_bad_values() -> None:
+    values = pd.Series(["1/5/2026 12:00:00 AM", "not-a-date", None, "1/5/2026 12:00:00 AM"], index=[3, 4, 5, 6])
+    days = schemas.parse_date_series(values, "SleepDay")
+    assert days.index.tolist() == [3, 4, 5, 6]
+    assert days.isna().tolist() == [False, True, True, False]
+    assert str(days[3]) == str(days[6]) == "2026-01-05 00:00:00"
+
+
+def test_stale_staging_columns_flags_registered_columns_with_old_types() -> None:
+    current = {"Id": "bigint", "ActivityDate": "date", "TotalSteps": "integer", "Note": "text"}
+    assert schemas.stale_staging_columns(current) == []
+    old = {**current, "ActivityDate": "text", "TotalSteps": "bigint"}
+    assert schemas.stale_staging_columns(old) == ["ActivityDate", "TotalSteps"]
+
+
+def test_fingerprint_dates_match_pandas_scan(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "daily_activity.csv"
+    path.write_text(ACTIVITY + "1002,not-a-date,1,1.0,c\n")
+    st = path.stat()
+    arrow = _compute_fingerprint(path, st.st_size, st.st_mtime_ns)
+    monkeypatch.setattr("ingestion.csv_partition.pyarrow_csv_available", lambda: False)
+    assert _compute_fingerprint(path, st.st_size, st.st_mtime_ns) == arrow
+    assert (arrow.row_count, str(arrow.min_date), str(arrow.max_date)) == (4, "2026-01-20", "2026-01-22")
+
+
+def test_compact_frames_land_typed_staging_columns(engine: "pytest.fixture", tmp_path: Path) -> None:
+    path = tmp_path / "daily_activity.csv"
+    path.write_text(ACTIVITY)
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    try:
+        with engine.begin() as conn:
+            assert write_frame(conn, schemas.read_csv(path), SCHEMA, "daily_activity") == 3
+            types = dict(
+                conn.execute(
+                    text(
+                        "SELECT column_name, data_type FROM information_schema.columns "
+                        "WHERE table_schema = :s AND table_name = 'daily_activity'"
+                    ),
+                    {"s": SCHEMA},
+                ).fetchall()
+            )
+            rows = conn.execute(
+                text(f'SELECT "Id", "TotalSteps", "TotalDistance" FROM {SCHEMA}.daily_activity ORDER BY 1, 2')
+            ).fetchall()
+        assert types == {
+            "Id": "bigint",
+            "ActivityDate": "date",
+            "TotalSteps": "integer",
+            "TotalDistance": "double precision",
+            "Note": "text",
+        }
+        assert rows == [(1001, 3, 0.1), (1001, 8450, 6.2), (8877689391, None, 7.8)]
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
@@ -0,0 +1,156 @@
+"""Shadow-table swap keeps dependent views bound and never exposes a partial table."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from ingestion.ingest import _ingest_csv
+from ingestion.table_swap import finalize_shadow, prepare_shadow, swap_in_shadow
+
+SCHEMA = "test_table_swap"
+
+
+def _view_oid(conn) -> int:
+    return conn.execute(text(f"SELECT '{SCHEMA}.v_events'::regclass::oid")).scalar_one()
+
+
+def test_swap_replaces_rows_and_keeps_dependent_views(engine: "pytest.fixture") -> None:
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        conn.execute(text(f'CREATE TABLE {SCHEMA}.events ("Id" bigint, "Day" text)'))
+        conn.execute(text(f"INSERT INTO {SCHEMA}.events VALUES (1, '01/20/2026')"))
+        conn.execute(
+            text(
+                f"CREATE VIEW {SCHEMA}.v_events AS "
+                f"""SELECT "Id" AS user_id, to_date("Day", 'MM/DD/YYYY') AS day FROM {SCHEMA}.events"""
+            )
+        )
+        before = _view_oid(conn)
+
+    with engine.begin() as conn:
+        shadow = prepare_shadow(conn, SCHEMA, "events")
+        conn.execute(text(f'CREATE TABLE {SCHEMA}.{shadow} ("Id" bigint, "Day" text)'))
+        conn.execute(text(f"INSERT INTO {SCHEMA}.{shadow} VALUES (2, '01/21/2026'), (3, '01/22/2026')"))
+        finalize_shadow(conn, SCHEMA, shadow, index_columns=("Id",))
+    with engine.begin() as conn:
+        swap_in_shadow(conn, SCHEMA, "events", shadow)
+
+    with engine.connect() as conn:
+        assert _view_oid(conn) == before
+        assert conn.execute(text(f"SELECT count(*) FROM {SCHEMA}.v_events")).scalar_one() == 2
+        tables = conn.execute(
+            text("SELECT tablename FROM pg_tables WHERE schemaname = :s"), {"s": SCHEMA}
+        ).scalars().all()
+        indexes = conn.execute(
+            text("SELECT indexname FROM pg_indexes WHERE schemaname = :s"), {"s": SCHEMA}
+        ).scalars().all()
+    assert tables == ["events"]
+    assert indexes == ["events_Id_idx"]
+
+
+def test_swap_creates_table_on_first_load(engine: "pytest.fixture") -> None:
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        shadow = prepare_shadow(conn, SCHEMA, "fresh")
+        conn.execute(text(f"CREATE TABLE {SCHEMA}.{shadow} AS SELECT 1 AS x"))
+    with engine.begin() as conn:
+        swap_in_shadow(conn, SCHEMA, "fresh", shadow)
+        assert conn.execute(text(f"SELECT x FROM {SCHEMA}.fresh")).scalar_one() == 1
+
+
+def _retyped_shadow(engine, extra_views: list[str]) -> str:
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        conn.execute(text(f'CREATE TABLE {SCHEMA}.events ("Id" bigint, "Day" text)'))
+        conn.execute(text(f"INSERT INTO {SCHEMA}.events VALUES (1, '01/20/2026')"))
+        conn.execute(
+            text(
+                f"CREATE VIEW {SCHEMA}.stg_events AS "
+                f"""SELECT "Id" AS user_id, to_date("Day", 'MM/DD/YYYY') AS day FROM {SCHEMA}.events"""
+            )
+        )
+        conn.execute(text(f'CREATE VIEW {SCHEMA}.v_raw AS SELECT "Id" FROM {SCHEMA}.events'))
+        for view in extra_views:
+            conn.execute(text(view))
+        shadow = prepare_shadow(conn, SCHEMA, "events")
+        conn.execute(text(f'CREATE TABLE {SCHEMA}.{shadow} ("Id" bigint, "Day" date)'))
+        conn.execute(text(f"INSERT INTO {SCHEMA}.{shadow} VALUES (2, '2026-01-21')"))
+    return shadow
+
+
+def _views(conn) -> list[str]:
+    return sorted(
+        conn.execute(text("SELECT viewname FROM pg_views WHERE schemaname = :s"), {"s": SCHEMA}).scalars()
+    )
+
+
+def test_swap_fails_when_a_view_no_longer_fits_retyped_columns(engine: "pytest.fixture") -> None:
+    shadow = _retyped_shadow(engine, [])
+    try:
+        with pytest.raises(DBAPIError):
+            with engine.begin() as conn:
+                swap_in_shadow(conn, SCHEMA, "events", shadow)
+        # Rolled back: the live table and every view are as they were.
+        with engine.connect() as conn:
+            assert _views(conn) == ["stg_events", "v_raw"]
+            assert conn.execute(text(f'SELECT "Day" FROM {SCHEMA}.events')).scalar_one() == "01/20/2026"
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+
+
+def test_swap_drops_only_the_named_views_and_never_cascades(engine: "pytest.fixture") -> None:
+    on_stg = f"CREATE VIEW {SCHEMA}.v_ids AS SELECT user_id FROM {SCHEMA}.stg_events"
+    shadow = _retyped_shadow(engine, [on_stg])
+    try:
+        # A view built on the dropped one blocks the drop rather than going with it.
+        with pytest.raises(DBAPIError):
+            with engine.begin() as conn:
+                swap_in_shadow(conn, SCHEMA, "events", shadow, drop_views=("stg_events",))
+        with engine.connect() as conn:
+            assert _views(conn) == ["stg_events", "v_ids", "v_raw"]
+
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP VIEW {SCHEMA}.v_ids"))
+            swap_in_shadow(conn, SCHEMA, "events", shadow, drop_views=("stg_events",))
+        with engine.connect() as conn:
+            assert _views(conn) == ["v_raw"]
+            assert conn.execute(text(f'SELECT "Day" FROM {SCHEMA}.events')).scalar_one().isoformat() == "2026-01-21"
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+
+
+def test_ingest_replace_migrates_a_legacy_text_table(engine: "pytest.fixture", tmp_path: Path) -> None:
+    path = tmp_path / "daily_activity.csv"
+    path.write_text("Id,ActivityDate,TotalSteps\n1001,01/21/2026,8450\n")
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        conn.execute(
+            text(f'CREATE TABLE {SCHEMA}.daily_activity ("Id" bigint, "ActivityDate" text, "TotalSteps" bigint)')
+        )
+        conn.execute(text(f"INSERT INTO {SCHEMA}.daily_activity VALUES (1001, '01/20/2026', 9000)"))
+        conn.execute(
+            text(
+                f"CREATE VIEW {SCHEMA}.stg_daily_activity AS SELECT \"Id\" AS user_id, "
+                f"""to_date("ActivityDate", 'MM/DD/YYYY') AS activity_date FROM {SCHEMA}.daily_activity"""
+            )
+        )
+        conn.execute(text(f'CREATE VIEW {SCHEMA}.v_raw AS SELECT "Id" FROM {SCHEMA}.daily_activity'))
+    try:
+        assert _ingest_csv(path, SCHEMA, "replace", use_manifest=False, engine=engine)
+        with engine.connect() as conn:
+            # dbt's stg view is left for the next dbt run; views that still fit are re-pointed.
+            assert _views(conn) == ["v_raw"]
+            day = conn.execute(text(f'SELECT "ActivityDate" FROM {SCHEMA}.daily_activity')).scalar_one()
+            assert day.isoformat() == "2026-01-21"
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
@@ -0,0 +1,157 @@
+"""Concurrent uploads against a fake S3 client: per-file failures, exit code and summary counts."""
+
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+
+import pytest
+from botocore.exceptions import ClientError
+
+from ingestion import upload_to_s3
+from ingestion.manifest import delete_s3_manifest_rows, get_s3_manifest_rows_by_source
+
+PREFIX = "test-upload"
+
+
+class FakeS3:
+    """In-memory bucket; PUTs of keys containing fail_on raise."""
+
+    def __init__(self, fail_on: str | None = None) -> None:
+        self.objects: dict[str, bytes] = {}
+        self.fail_on = fail_on
+        self.lock = threading.Lock()
+
+    def head_bucket(self, Bucket: str) -> dict:  # noqa: N803
+        return {}
+
+    def head_object(self, Bucket: str, Key: str) -> dict:  # noqa: N803
+        raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes, **kwargs) -> dict:  # noqa: N803
+        if self.fail_on and self.fail_on in Key:
+            raise ConnectionError(f"PUT {Key} reset")
+        with self.lock:
+            self.objects[Key] = Body
+        return {"ETag": '"etag"'}
+
+    def delete_object(self, Bucket: str, Key: str) -> dict:  # noqa: N803
+        with self.lock:
+            self.objects.pop(Key, None)
+        return {}
+
+
+def _drops(root: Path, count: int) -> list[str]:
+    names = []
+    for i in range(count):
+        name = f"daily_activity_upload_{i}.csv"
+        (root / name).write_text(f"Id,ActivityDate,TotalSteps\n{i},01/2{i}/2026,100\n")
+        names.append(name)
+    return names
+
+
+@pytest.fixture
+def s3_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("S3_BUCKET", "test-bucket")
+    monkeypatch.setenv("S3_PREFIX", PREFIX)
+
+
+def _forget(engine, names: list[str]) -> None:
+    recorded = get_s3_manifest_rows_by_source(engine, names, PREFIX)
+    delete_s3_manifest_rows(engine, [k for rows in recorded.values() for k in rows])
+
+
+def test_one_failed_file_does_not_stop_the_others(
+    engine: "pytest.fixture",
+    s3_env: None,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    names = _drops(tmp_path, 4)
+    fake = FakeS3(fail_on="daily_activity_upload_2")
+    monkeypatch.setattr(upload_to_s3, "get_s3_client", lambda **_: fake)
+    _forget(engine, names)
+    try:
+        with caplog.at_level("INFO"):
+            assert upload_to_s3.run_upload(data_dir=tmp_path, workers=3) == 1
+        assert sorted(Path(k).name for k in fake.objects) == sorted(n for n in names if "_2" not in n)
+        recorded = get_s3_manifest_rows_by_source(engine, names, PREFIX)
+        assert sorted(recorded) == sorted(n for n in names if "_2" not in n)
+        assert "3 file(s) newly uploaded" in caplog.text
+        assert "1 failed, 4 total candidates" in caplog.text
+
+        # The retry uploads only the file that failed.
+        fake.fail_on = None
+        caplog.clear()
+        assert upload_to_s3.run_upload(data_dir=tmp_path, workers=3) == 0
+        assert len(fake.objects) == 4
+        assert "1 file(s) newly uploaded" in caplog.text
+    finally:
+        _forget(engine, names)
+
+
+def test_interrupted_run_still_records_finished_uploads(
+    engine: "pytest.fixture",
+    s3_env: None,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    names = _drops(tmp_path, 3)
+    fake = FakeS3()
+    monkeypatch.setattr(upload_to_s3, "get_s3_client", lambda **_: fake)
+    upload_one = upload_to_s3.upload_one
+
+    def interrupted(path: Path, *args, **kwargs):
+        result = upload_one(path, *args, **kwargs)
+        if path.name == names[1]:
+            raise KeyboardInterrupt
+        return result
+
+    monkeypatch.setattr(upload_to_s3, "upload_one", interrupted)
+    _forget(engine, names)
+    try:
+        with pytest.raises(KeyboardInterrupt):
+            upload_to_s3.run_upload(data_dir=tmp_path, workers=1)
+        # Manifest rows are deferred to a batch; the ones already uploaded are still written.
+        recorded = get_s3_manifest_rows_by_source(engine, names, PREFIX)
+        assert sorted(recorded) == sorted(Path(k).name for k in fake.objects)
+        assert names[1] in recorded
+    finally:
+        _forget(engine, names)
+
+
+@pytest.mark.parametrize("split", [False, True])
+def test_turning_keep_csv_off_keeps_current_audit_copies(
+    engine: "pytest.fixture",
+    s3_env: None,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    split: bool,
+) -> None:
+    pytest.importorskip("pyarrow")
+    names = _drops(tmp_path, 2)
+    fake = FakeS3()
+    monkeypatch.setattr(upload_to_s3, "get_s3_client", lambda **_: fake)
+
+    def upload(keep_csv: bool) -> None:
+        assert upload_to_s3.run_upload(data_dir=tmp_path, lake_format="parquet", keep_csv=keep_csv, split=split) == 0
+
+    _forget(engine, names)
+    try:
+        upload(keep_csv=True)
+        with_csv = set(fake.objects)
+        assert sorted(Path(k).suffix for k in with_csv) == [".csv", ".csv", ".parquet", ".parquet"]
+
+        upload(keep_csv=False)
+        assert set(fake.objects) == with_csv
+        assert sum(len(rows) for rows in get_s3_manifest_rows_by_source(engine, names, PREFIX).values()) == 4
+
+        # Once the drop file changes, its CSV copy no longer matches the Parquet object and goes.
+        (tmp_path / names[0]).write_text("Id,ActivityDate,TotalSteps\n0,01/20/2026,12345\n")
+        upload(keep_csv=False)
+        assert sorted(Path(k).name for k in fake.objects if k.endswith(".csv")) == [
+            Path(k).name for k in with_csv if k.endswith(".csv") and names[1].split(".")[0] in k
+        ]
+    finally:
+        _forget(engine, names)